@@ -0,0 +1,98 @@
+# Measures how long a worker spends discovering tasks before it can bind its
+# sockets, scanning a large task package compared to reading a manifest, and
+# the cost of the first lookup which imports the task's module lazily.
+#
+# Every module of the generated package sleeps on import to stand in for
+# heavy dependencies (ORMs, SDKs, ...) real task modules pull in.
+#
+# Usage:
+#     python benchmarks/discovery_startup.py [number_of_modules] [import_seconds]
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(ROOT)
+
+MODULE_SOURCE = """import time
+
+from zebrok import app
+
+time.sleep({import_seconds})
+{tasks}
+"""
+
+TASK_SOURCE = """
+
+@app.Task
+def task_{module}_{task}():
+    return {task}
+"""
+
+
+def write_package(
+    directory: str,
+    number_of_modules: int,
+    import_seconds: float,
+) -> None:
+    package = os.path.join(directory, "bench_tasks")
+    os.mkdir(package)
+    open(os.path.join(package, "__init__.py"), "w").close()
+    for module in range(number_of_modules):
+        tasks = "".join(
+            TASK_SOURCE.format(module=module, task=task) for task in range(10)
+        )
+        source = MODULE_SOURCE.format(import_seconds=import_seconds, tasks=tasks)
+        with open(os.path.join(package, f"module_{module}.py"), "w") as f:
+            f.write(source)
+
+
+def measure() -> None:
+    from zebrok.discovery import discover_tasks
+    from zebrok.discovery import get_discovered_task_by_name
+
+    started = time.perf_counter()
+    discover_tasks()
+    discovered = time.perf_counter()
+    get_discovered_task_by_name("task_0_0")
+    looked_up = time.perf_counter()
+    print(f"{(discovered - started) * 1000:.1f} {(looked_up - discovered) * 1000:.1f}")
+
+
+def run(env: dict) -> list:
+    completed = subprocess.run(
+        [sys.executable, __file__, "measure"],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return completed.stdout.split()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["measure"]:
+        measure()
+        sys.exit(0)
+
+    number_of_modules = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    import_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 0.01
+    with tempfile.TemporaryDirectory() as directory:
+        write_package(directory, number_of_modules, import_seconds)
+        manifest = os.path.join(directory, "manifest.json")
+        pythonpath = os.pathsep.join([directory, ROOT])
+        env = dict(os.environ, PYTHONPATH=pythonpath, TASK_MODULES="bench_tasks")
+        subprocess.run(
+            [sys.executable, "-m", "zebrok.discovery", manifest],
+            env=env,
+            check=True,
+            capture_output=True,
+        )
+        for mode, mode_env in (
+            ("scan", env),
+            ("manifest", dict(env, TASK_MANIFEST=manifest)),
+        ):
+            startup, first_lookup = run(mode_env)
+            print(f"{mode:<9} startup={startup}ms first_lookup={first_lookup}ms")
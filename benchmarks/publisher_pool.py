@@ -0,0 +1,69 @@
+# Compares tasks/sec of publishing through a fresh TaskPublisher per call
+# against the process wide publisher pool used by Task.run
+#
+# Usage:
+#     python benchmarks/publisher_pool.py [number_of_tasks]
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import zmq  # noqa: E402
+
+from zebrok import app  # noqa: E402
+from zebrok.utils import get_worker_port_and_host  # noqa: E402
+
+
+@app.Task
+def noop(value: int) -> None:
+    pass
+
+
+def drain(context: zmq.Context, expected: int, ready: threading.Event) -> None:
+    port, _ = get_worker_port_and_host()
+    socket = context.socket(zmq.PULL)
+    socket.bind(f"tcp://127.0.0.1:{port}")
+    ready.set()
+    for _ in range(expected):
+        socket.recv()
+    socket.close()
+
+
+def measure(label: str, publish, number_of_tasks: int) -> float:
+    context = zmq.Context()
+    ready = threading.Event()
+    sink = threading.Thread(target=drain, args=(context, number_of_tasks, ready))
+    sink.start()
+    ready.wait()
+
+    started = time.perf_counter()
+    for i in range(number_of_tasks):
+        publish(i)
+    sink.join()
+    elapsed = time.perf_counter() - started
+
+    context.term()
+    rate = number_of_tasks / elapsed
+    print(
+        f"{label:<24} {number_of_tasks} tasks in {elapsed:.3f}s -> {rate:,.0f} tasks/sec",
+    )
+    return rate
+
+
+def publish_with_fresh_publisher(value: int) -> None:
+    with app.TaskPublisher() as publisher:
+        publisher.publish_task(noop.get_task_object(), value=value)
+
+
+def publish_with_pool(value: int) -> None:
+    noop.run(value=value)
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("WORKER_HOST", "127.0.0.1")
+    number_of_tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    before = measure("fresh publisher", publish_with_fresh_publisher, number_of_tasks)
+    after = measure("pooled publisher", publish_with_pool, number_of_tasks)
+    print(f"speedup: {after / before:.1f}x")
@@ -0,0 +1,62 @@
+# Measures queueing latency (publish to start) of a mixed workload (mostly short tasks with
+# some long ones) dispatched by a master to its slave workers, comparing a
+# prefetch limit of 1 against a large prefetch which lets short tasks queue
+# up behind long ones in a busy slave's buffer
+#
+# Usage:
+#     python benchmarks/slave_scheduling.py [number_of_tasks]
+import os
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from zebrok import app  # noqa: E402
+from zebrok.worker import WorkerInitializer  # noqa: E402
+
+latencies = []
+finished = threading.Event()
+
+
+@app.Task
+def mixed_task(published_at: float, duration: float, last: bool) -> None:
+    latencies.append(time.time() - published_at)
+    time.sleep(duration)
+    if last:
+        finished.set()
+
+
+def run(prefetch: int, number_of_tasks: int) -> None:
+    worker = WorkerInitializer(number_of_slaves=4, prefetch=prefetch)
+    worker.register_task(mixed_task)
+    threading.Thread(target=worker.start, daemon=True).start()
+    time.sleep(0.5)
+
+    for i in range(number_of_tasks):
+        duration = 0.1 if i % 20 == 0 else 0.002
+        mixed_task.run(published_at=time.time(), duration=duration, last=False)
+        time.sleep(0.002)
+    mixed_task.run(published_at=time.time(), duration=0, last=True)
+    finished.wait(60)
+    time.sleep(0.5)
+
+    ordered = sorted(latencies)
+    p50 = ordered[len(ordered) // 2] * 1000
+    p99 = ordered[int(len(ordered) * 0.99)] * 1000
+    print(f"prefetch={prefetch:<5} p50={p50:.1f}ms p99={p99:.1f}ms", flush=True)
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    number_of_tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    if len(sys.argv) > 2:
+        run(int(sys.argv[2]), number_of_tasks)
+    env = dict(os.environ, WORKER_HOST="127.0.0.1")
+    for prefetch in (1000, 1):
+        subprocess.run(
+            [sys.executable, __file__, str(number_of_tasks), str(prefetch)],
+            env=env,
+            check=True,
+        )
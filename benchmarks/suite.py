@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from typing import Any
+from typing import Dict
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(ROOT)
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("LOG_FILE", "")
+
+from zebrok import app  # noqa: E402
+from zebrok.connection import ConnectionFactory  # noqa: E402
+from zebrok.connection import ConnectionType  # noqa: E402
+from zebrok.connection import SocketType  # noqa: E402
+from zebrok.serializers import SerializerFactory  # noqa: E402
+from zebrok.serializers import msgpack  # noqa: E402
+from zebrok.task_runner import DefaultTaskRunner  # noqa: E402
+
+DESCRIPTION = """
+Benchmark suite measuring throughput and latency of zebrok's hot paths
+over loopback, writing results as JSON so regressions can be tracked:
+
+    runner      DefaultTaskRunner.execute alone
+    publisher   TaskPublisher sending to a socket drained by a thread
+    end_to_end  publish -> master -> slaves -> task, varying one of
+                payload size, number of slaves, serializer and transport
+                at a time from a baseline. Each case runs in a fresh
+                process; latency is publish to task start.
+
+Usage:
+    python benchmarks/suite.py [--tasks N] [--quick] [--output results.json]
+                               [--baseline previous.json]
+"""
+
+BASELINE = {"payload_size": 64, "slaves": 2, "serializer": "json", "transport": "tcp"}
+BASE_PORT = 7100
+SERIALIZERS = ["json", "pickle"] + (["msgpack"] if msgpack is not None else [])
+
+latencies: List[float] = []
+finished = threading.Event()
+expected_tasks = 0
+
+
+@app.Task
+def bench_task(sent: float, data: str) -> None:
+    latencies.append(time.time() - sent)
+    if len(latencies) == expected_tasks:
+        finished.set()
+
+
+def summarize(durations: List[float], elapsed: float) -> Dict[str, float]:
+    ordered = sorted(durations)
+    return {
+        "tasks_per_second": round(len(ordered) / elapsed, 1),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 4),
+        "p99_ms": round(
+            ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+            4,
+        ),
+    }
+
+
+def bench_runner(number_of_tasks: int) -> Dict[str, Any]:
+    def noop(value: int) -> int:
+        return value
+
+    runner = DefaultTaskRunner({"noop": noop})
+    durations = []
+    started = time.perf_counter()
+    for i in range(number_of_tasks):
+        call_started = time.perf_counter()
+        runner.execute("noop", value=i)
+        durations.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+    return {"benchmark": "runner", "params": {}, **summarize(durations, elapsed)}
+
+
+def bench_publisher(
+    number_of_tasks: int,
+    payload_size: int,
+    serializer: str,
+) -> Dict[str, Any]:
+    port = BASE_PORT
+    pull = ConnectionFactory.create_connection(
+        ConnectionType.zmq_bind,
+        SocketType.ZmqPull,
+        "127.0.0.1",
+        port,
+    )
+    push = ConnectionFactory.create_connection(
+        ConnectionType.zmq_connect,
+        SocketType.ZmqPush,
+        "127.0.0.1",
+        port,
+    )
+    serializer_type = SerializerFactory.get_serializer_type(serializer)
+    publisher = app.TaskPublisher(
+        push,
+        SerializerFactory.create_serializer(serializer_type),
+    )
+
+    def drain() -> None:
+        for _ in range(number_of_tasks):
+            pull.socket.recv_multipart(copy=False)
+
+    drainer = threading.Thread(target=drain)
+    drainer.start()
+    data = "x" * payload_size
+    durations = []
+    started = time.perf_counter()
+    for _ in range(number_of_tasks):
+        call_started = time.perf_counter()
+        publisher.publish_task(bench_task.get_task_object(), sent=0.0, data=data)
+        durations.append(time.perf_counter() - call_started)
+    drainer.join()
+    elapsed = time.perf_counter() - started
+    push.close()
+    pull.close()
+    params = {"payload_size": payload_size, "serializer": serializer}
+    return {"benchmark": "publisher", "params": params, **summarize(durations, elapsed)}
+
+
+def bench_end_to_end(number_of_tasks: int, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs in a child process configured through the environment by run_end_to_end
+    """
+    global expected_tasks
+    from zebrok.worker import WorkerInitializer
+
+    expected_tasks = number_of_tasks
+    worker = WorkerInitializer(number_of_slaves=params["slaves"], prefetch=100)
+    worker.register_task(bench_task)
+    threading.Thread(target=worker.start, daemon=True).start()
+    time.sleep(0.5)
+
+    data = "x" * params["payload_size"]
+    started = time.time()
+    for _ in range(number_of_tasks):
+        bench_task.run(sent=time.time(), data=data)
+    completed = finished.wait(120)
+    elapsed = time.time() - started
+    result = {"benchmark": "end_to_end", "params": params, "completed": len(latencies)}
+    if completed:
+        result.update(summarize(latencies, elapsed))
+    return result
+
+
+def run_end_to_end(
+    number_of_tasks: int,
+    params: Dict[str, Any],
+    port: int,
+) -> Dict[str, Any]:
+    env = dict(
+        os.environ,
+        WORKER_HOST="127.0.0.1",
+        WORKER_PORT=str(port),
+        SERIALIZER=params["serializer"],
+        SLAVE_TRANSPORT=params["transport"],
+    )
+    completed = subprocess.run(
+        [
+            sys.executable,
+            __file__,
+            "--child",
+            json.dumps(params),
+            "--tasks",
+            str(number_of_tasks),
+        ],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def end_to_end_cases(quick: bool) -> List[Dict[str, Any]]:
+    axes = {
+        "payload_size": [64, 4096] if quick else [64, 4096, 65536],
+        "slaves": [0, 2] if quick else [0, 1, 2, 4],
+        "serializer": SERIALIZERS,
+        "transport": ["tcp", "inproc"] if quick else ["tcp", "ipc", "inproc"],
+    }
+    cases = [dict(BASELINE)]
+    for axis, values in axes.items():
+        for value in values:
+            case = dict(BASELINE, **{axis: value})
+            if case not in cases:
+                cases.append(case)
+    return cases
+
+
+def describe(result: Dict[str, Any]) -> str:
+    params = " ".join(f"{key}={value}" for key, value in result["params"].items())
+    if "tasks_per_second" not in result:
+        return (
+            f"{result['benchmark']:<11} {params} incomplete ({result.get('completed')})"
+        )
+    return (
+        f"{result['benchmark']:<11} {params:<60} {result['tasks_per_second']:>12.1f}/s "
+        f"p50={result['p50_ms']:.3f}ms p99={result['p99_ms']:.3f}ms"
+    )
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        baseline = {
+            (result["benchmark"], json.dumps(result["params"], sort_keys=True)): result
+            for result in json.load(f)["results"]
+        }
+    for result in results:
+        previous = baseline.get(
+            (result["benchmark"], json.dumps(result["params"], sort_keys=True)),
+        )
+        if (
+            not previous
+            or "tasks_per_second" not in result
+            or "tasks_per_second" not in previous
+        ):
+            continue
+        change = result["tasks_per_second"] / previous["tasks_per_second"] - 1
+        print(f"{describe(result)} {change:+.1%} vs baseline")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--quick", action="store_true", help="fewer cases per axis")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument(
+        "--baseline",
+        help="earlier results to compare throughput against",
+    )
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(
+            json.dumps(bench_end_to_end(args.tasks, json.loads(args.child))),
+            flush=True,
+        )
+        os._exit(0)
+
+    results = [bench_runner(args.tasks * 5)]
+    print(describe(results[-1]), flush=True)
+    for payload_size in (64, 4096, 65536):
+        for serializer in SERIALIZERS:
+            results.append(bench_publisher(args.tasks, payload_size, serializer))
+            print(describe(results[-1]), flush=True)
+    for index, params in enumerate(end_to_end_cases(args.quick)):
+        results.append(run_end_to_end(args.tasks, params, BASE_PORT + 10 * (index + 1)))
+        print(describe(results[-1]), flush=True)
+
+    report = {
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "tasks": args.tasks,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
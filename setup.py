@@ -7,6 +7,11 @@ setup(
     author_email="kaypee90@yahoo.com",
     packages=["zebrok"],
     install_requires=["pyzmq==27.1.0"],
+    extras_require={
+        "msgpack": ["msgpack"],
+        "lz4": ["lz4"],
+        "zstd": ["zstandard"],
+    },
     version="0.0.1",
     license="MIT",
     description="Brokerless task queue",
@@ -1,23 +1,78 @@
+import asyncio
+import concurrent.futures
+import datetime
 import os
 import sys
 import io
+import json
+import pickle
+import tempfile
+import threading
+import time
 import unittest
+from unittest import mock
+
+import zmq
+import zmq.asyncio
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
-from zebrok.utils import get_worker_port_and_host
+from zebrok.utils import get_queue_port_and_host, get_worker_port_and_host
 from zebrok.registry import InMemoryTaskRegistry, RegistryFactory, RegistryType
 from zebrok import app
-from zebrok.task_runner import DefaultTaskRunner, BaseTaskRunner
-from zebrok.worker import WorkerInitializer
-from zebrok.logging import create_logger
-from zebrok.discovery import get_discovered_task_by_name, discover_tasks
+from zebrok.task_runner import DefaultTaskRunner, BaseTaskRunner, call_with_timeout
+from zebrok.cache import MISSING, MemoryResultCache, create_result_cache, make_cache_key
+from zebrok.worker import AsyncTaskQueueWorker, TaskQueueWorker, WorkerInitializer
+from zebrok.logging import AggregatedLog, create_logger
+from zebrok.metrics import MetricsRegistry, metrics
+from zebrok.discovery import (
+    ManifestTaskIndex,
+    TaskIndex,
+    discover_tasks,
+    get_discovered_task_by_name,
+    write_task_manifest,
+)
+from zebrok.exceptions import (
+    ZebrokInvalidArgumentsError,
+    ZebrokResultExpiredError,
+    ZebrokSerializationError,
+    ZebrokTaskError,
+    ZebrokTaskTimeoutError,
+)
+from zebrok.compression import (
+    Lz4Compressor,
+    ZlibCompressor,
+    ZstdCompressor,
+    create_compressor,
+    get_compressor_by_flags,
+    lz4_frame,
+    zstandard,
+)
+from zebrok.executors import create_task_executor
+from zebrok.idempotency import IdempotencyCache
+from zebrok.journal import TaskJournal
+from zebrok.nodes import NodeDirectory, WorkerBeacon, parse_endpoints, resolve_endpoints
+from zebrok.protocol import decode_message, encode_message, read_eta, read_key
+from zebrok.queues import TaskQueue, parse_queues
+from zebrok.results import ResultBackend, ResultSender, gather_results
+from zebrok.scheduler import DONE, READY, SlaveScheduler
+from zebrok.supervisor import SlaveProcessSupervisor
+from zebrok.timers import PeriodicTask, TimerHeap
+from zebrok.signatures import TaskSignature
+from zebrok.serializers import (
+    JsonSerializer,
+    MsgpackSerializer,
+    PickleSerializer,
+    SerializerFactory,
+    msgpack,
+)
 from zebrok.connection import (
     ConnectionType,
     ConnectionFactory,
     ZmqConnectTypeConnection,
     ZmqBindConnection,
     SocketType,
+    Transport,
 )
 
 
@@ -26,6 +81,22 @@ class TestLoggingSetup(unittest.TestCase):
         logger = create_logger(__name__)
         self.assertIsNotNone(logger)
 
+    def test_logger_writes_through_a_single_queue_handler(self):
+        logger = create_logger(__name__)
+        logger = create_logger(__name__)
+        self.assertEqual(["QueueHandler"], [type(h).__name__ for h in logger.handlers])
+
+    def test_aggregated_log_writes_one_line_per_interval(self):
+        logger = mock.Mock()
+        log = AggregatedLog(logger, "received tasks", interval=60)
+        for task_name in ("a", "b", "a"):
+            log.record(task_name)
+        logger.info.assert_not_called()
+        log.flush()
+        logger.info.assert_called_once()
+        self.assertIn("received tasks: 3", logger.info.call_args[0][0])
+        self.assertIn("a: 2, b: 1", logger.info.call_args[0][0])
+
 
 class TestDefaultTaskRunner(unittest.TestCase):
     def setUp(self):
@@ -44,6 +115,190 @@ class TestDefaultTaskRunner(unittest.TestCase):
         is_executed = runner.execute("print_name", **{"name": "Sam"})
         self.assertFalse(is_executed)
 
+    def test_retries_failed_task_with_backoff(self):
+        attempts = []
+
+        @app.Task(retries=2, retry_backoff=0.01)
+        def flaky():
+            attempts.append(time.monotonic())
+            if len(attempts) < 3:
+                raise ValueError("flaky")
+            return "done"
+
+        runner = DefaultTaskRunner({"flaky": flaky})
+        self.assertEqual("done", runner.call("flaky"))
+        self.assertEqual(3, len(attempts))
+        self.assertGreaterEqual(attempts[2] - attempts[1], 0.02)
+        self.assertEqual(0.04, runner.get_retry_delay(flaky, 3))
+
+        attempts.clear()
+        flaky.retries = 1
+        with self.assertRaises(ValueError):
+            runner.execute("flaky")
+        self.assertEqual(2, len(attempts))
+
+    def test_task_fails_after_timeout(self):
+        @app.Task(timeout=0.05)
+        def slow():
+            time.sleep(0.5)
+
+        @app.Task(timeout=0.05)
+        async def aslow():
+            await asyncio.sleep(0.5)
+
+        runner = DefaultTaskRunner({"slow": slow, "aslow": aslow})
+        for task_name in ("slow", "aslow"):
+            with self.assertRaises(ZebrokTaskTimeoutError):
+                runner.execute(task_name)
+        with self.assertRaises(ZebrokTaskTimeoutError):
+            asyncio.run(runner.acall("aslow"))
+
+    def test_timed_calls_reuse_threads(self):
+        threads = set()
+
+        def record():
+            threads.add(threading.current_thread())
+            return len(threads)
+
+        for _ in range(50):
+            call_with_timeout(record, (), {}, 5)
+        self.assertLess(len(threads), 10)
+        with self.assertRaises(ZebrokTaskTimeoutError):
+            call_with_timeout(time.sleep, (0.2,), {}, 0.01)
+        count = call_with_timeout(record, (), {}, 0.1)
+        self.assertEqual(len(threads), count)
+
+    def test_timed_out_sync_task_is_not_retried(self):
+        attempts = []
+
+        @app.Task(retries=2, retry_backoff=0.01, timeout=0.05)
+        def slow():
+            attempts.append(1)
+            time.sleep(0.2)
+
+        runner = DefaultTaskRunner({"slow": slow})
+        with self.assertRaises(ZebrokTaskTimeoutError):
+            runner.execute("slow")
+        self.assertEqual(1, len(attempts))
+
+    def test_worker_defers_retries_to_its_timers(self):
+        attempts = []
+
+        def flaky():
+            attempts.append(time.monotonic())
+            if len(attempts) < 2:
+                raise ValueError("flaky")
+
+        flaky.retries = 1
+        flaky.retry_backoff = 0.02
+        runner = DefaultTaskRunner({"flaky": flaky})
+        runner.defer_retries = True
+        worker = TaskQueueWorker(mock.Mock(), runner)
+        worker.report_done = mock.Mock()
+
+        worker.execute_frames("m1", encode_message(app.make_payload(flaky, {}), JsonSerializer()))
+        self.assertEqual(1, len(attempts))
+        self.assertEqual(1, len(worker.timers))
+        worker.report_done.assert_not_called()
+
+        time.sleep(0.03)
+        worker.pop_due_messages()
+        self.assertEqual(2, len(attempts))
+        self.assertGreaterEqual(attempts[1] - attempts[0], 0.02)
+        worker.report_done.assert_called_once_with("m1")
+
+    def test_calls_task_with_positional_arguments(self):
+        @app.Task
+        def add(a, b, *, scale=1):
+            return (a + b) * scale
+
+        runner = DefaultTaskRunner({"add": add})
+        self.assertEqual(6, runner.call("add", 1, 2, scale=2))
+        self.assertEqual(3, runner.call("add", 1, b=2))
+        self.assertIs(add.get_task_object(), runner.get_signature("add").function)
+
+    def test_invalid_arguments_are_not_retried(self):
+        attempts = []
+
+        @app.Task(retries=3, retry_backoff=0.01)
+        def greet(name):
+            attempts.append(name)
+
+        runner = DefaultTaskRunner({"greet": greet})
+        with self.assertRaises(ZebrokInvalidArgumentsError):
+            runner.execute("greet", "King", name="Pee")
+        self.assertEqual([], attempts)
+
+
+class TestResultCache(unittest.TestCase):
+    def test_cache_key_is_stable(self):
+        key = make_cache_key("render", [1], {"a": 1, "b": [2]})
+        self.assertEqual(key, make_cache_key("render", (1,), {"b": [2], "a": 1}))
+        self.assertNotEqual(key, make_cache_key("render", [2], {"a": 1, "b": [2]}))
+        self.assertIsNone(make_cache_key("render", [], {"when": datetime.date(2030, 1, 1)}))
+
+    def test_memory_cache_evicts_least_recently_used(self):
+        cache = MemoryResultCache(ttl=60, max_entries=2)
+        cache.set(b"a", 1)
+        cache.set(b"b", None)
+        self.assertEqual(1, cache.get(b"a"))
+        cache.set(b"c", 3)
+        self.assertIs(MISSING, cache.get(b"b"))
+        self.assertEqual(1, cache.get(b"a"))
+        expired = MemoryResultCache(ttl=0, max_entries=2)
+        expired.set(b"a", 1)
+        self.assertIs(MISSING, expired.get(b"a"))
+
+    def test_shared_tier_is_seen_by_other_processes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = create_result_cache(60, 10, directory)
+            other = create_result_cache(60, 10, directory)
+            cache.set(b"key", {"html": "<p>"})
+            self.assertEqual({"html": "<p>"}, other.get(b"key"))
+            self.assertIs(MISSING, other.get(b"unknown"))
+
+    def test_runner_returns_cached_value(self):
+        calls = []
+
+        @app.Task(cache=MemoryResultCache(ttl=60, max_entries=10))
+        def render(page, fail=False):
+            calls.append(page)
+            if fail:
+                raise ValueError("render failed")
+            return f"<h1>{page}</h1>"
+
+        runner = DefaultTaskRunner({"render": render})
+        self.assertEqual("<h1>home</h1>", runner.call("render", "home"))
+        self.assertEqual("<h1>home</h1>", runner.call("render", page="home"))
+        self.assertEqual("<h1>home</h1>", asyncio.run(runner.acall("render", "home")))
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                runner.call("render", "about", fail=True)
+        self.assertEqual(["home", "home", "about", "about"], calls)
+
+
+class TestTaskSignature(unittest.TestCase):
+    def test_rejects_calls_the_function_would_reject(self):
+        def task(a, b=1, /, c=2, *, d):
+            pass
+
+        signature = TaskSignature(task)
+        signature.check((1,), {"d": 4})
+        signature.check((1, 2, 3), {"d": 4})
+        for args, kwargs, error in (
+            ((1, 2, 3, 4), {"d": 4}, "takes 3 positional arguments"),
+            ((1,), {"d": 4, "e": 5}, "unexpected keyword argument 'e'"),
+            ((1, 2, 3), {"c": 3, "d": 4}, "multiple values for argument 'c'"),
+            ((), {"d": 4}, "missing required argument: 'a'"),
+            ((1,), {}, "missing required keyword-only argument: 'd'"),
+        ):
+            with self.assertRaisesRegex(ZebrokInvalidArgumentsError, error):
+                signature.check(args, kwargs)
+
+    def test_variadic_task_takes_any_arguments(self):
+        signature = TaskSignature(lambda *args, **kwargs: None)
+        signature.check((1, 2, 3), {"anything": 1})
+
 
 class TestConnectionFactory(unittest.TestCase):
     def test_create_zmq_connect_type(self):
@@ -72,6 +327,54 @@ class TestConnectionFactory(unittest.TestCase):
         self.assertEqual(connection.socket_type, SocketType.ZmqPush.value)
         connection.close()
 
+    def test_create_inproc_connections_on_shared_context(self):
+        context = zmq.Context()
+        bind = ConnectionFactory.create_connection(
+            ConnectionType.zmq_bind,
+            SocketType.ZmqPull,
+            "localhost",
+            7897,
+            context,
+            transport=Transport.inproc,
+        )
+        connect = ConnectionFactory.create_connection(
+            ConnectionType.zmq_connect,
+            SocketType.ZmqPush,
+            "localhost",
+            7897,
+            context,
+            transport=Transport.inproc,
+        )
+        self.assertEqual(bind.socket_address, "inproc://zebrok-7897")
+        connect.socket.send(b"task")
+        self.assertEqual(b"task", bind.socket.recv())
+        connect.close()
+        bind.close()
+        context.term()
+
+    @unittest.skipUnless(zmq.has("ipc"), "ipc transport not supported")
+    def test_create_ipc_connection(self):
+        connection = ConnectionFactory.create_connection(
+            ConnectionType.zmq_bind,
+            SocketType.ZmqPull,
+            "localhost",
+            7898,
+            transport=Transport.ipc,
+        )
+        self.assertTrue(connection.socket_address.startswith("ipc://"))
+        self.assertTrue(connection.socket_address.endswith("zebrok-7898.ipc"))
+        connection.close()
+
+    def test_inproc_slaves_require_threads(self):
+        with self.assertRaises(AssertionError):
+            WorkerInitializer(
+                number_of_slaves=1,
+                execution_mode="processes",
+                slave_transport=Transport.inproc,
+            )
+        initializer = WorkerInitializer(number_of_slaves=1, slave_transport="auto")
+        self.assertEqual(Transport.inproc, initializer.slave_transport)
+
 
 class TestRegistryFactory(unittest.TestCase):
     def test_create_registry(self):
@@ -91,6 +394,56 @@ class TestDiscovery(unittest.TestCase):
         number_of_tasks = discover_tasks()
         self.assertEqual(2, number_of_tasks)
 
+    def write_module(self, path, *task_names):
+        source = "from zebrok import app\n"
+        for task_name in task_names:
+            source += f"\n@app.Task\ndef {task_name}():\n    return {task_name!r}\n"
+        with open(path, "w") as f:
+            f.write(source)
+
+    def test_index_walks_packages_and_reloads_changed_modules(self):
+        with tempfile.TemporaryDirectory() as directory:
+            package = os.path.join(directory, "indexed_tasks")
+            os.mkdir(package)
+            self.write_module(os.path.join(package, "__init__.py"), "first")
+            module_path = os.path.join(package, "emails.py")
+            self.write_module(module_path, "second")
+            sys.path.insert(0, directory)
+            try:
+                index = TaskIndex(["indexed_tasks"])
+                self.assertEqual({"first", "second"}, set(index.tasks))
+                self.assertIs(index.get("first"), index.get("first"))
+                self.assertIsNone(index.get("third"))
+
+                self.write_module(module_path, "second", "third")
+                stat = os.stat(module_path)
+                os.utime(module_path, (stat.st_atime, stat.st_mtime + 10))
+                self.assertEqual("third", index.get("third")())
+            finally:
+                sys.path.remove(directory)
+                for name in [name for name in sys.modules if name.startswith("indexed_tasks")]:
+                    del sys.modules[name]
+
+    def test_manifest_imports_task_module_on_first_lookup(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.write_module(os.path.join(directory, "manifest_tasks.py"), "lazy")
+            manifest = os.path.join(directory, "manifest.json")
+            sys.path.insert(0, directory)
+            try:
+                self.assertEqual(1, write_task_manifest(manifest, ["manifest_tasks"]))
+                del sys.modules["manifest_tasks"]
+
+                index = ManifestTaskIndex(manifest)
+                index.refresh()
+                self.assertEqual({"lazy": "manifest_tasks:lazy"}, index.locations)
+                self.assertNotIn("manifest_tasks", sys.modules)
+                self.assertEqual("lazy", index.get("lazy")())
+                self.assertIn("manifest_tasks", sys.modules)
+                self.assertIsNone(index.get("missing"))
+            finally:
+                sys.path.remove(directory)
+                sys.modules.pop("manifest_tasks", None)
+
 
 class TestUtils(unittest.TestCase):
     def test_get_worker_port_and_host(self):
@@ -119,6 +472,14 @@ class TestInMemoryRegistry(unittest.TestCase):
         self.assertEqual(2, len(self.registry))
         self.assertEqual(scream, self.registry["scream"])
 
+    def test_registered_task_signature_is_compiled(self):
+        signature = self.registry.get_signature("hello")
+        self.assertIs(self.registry["hello"], signature.task)
+        duration = metrics.histogram("zebrok_task_duration_seconds", task="hello")
+        self.assertIs(duration, signature.metrics.duration)
+        self.registry.unregister("hello")
+        self.assertIsNone(self.registry.get_signature("hello"))
+
     def test_unregister_task(self):
         self.registry.unregister("hello")
         self.assertEqual(0, len(self.registry))
@@ -126,6 +487,946 @@ class TestInMemoryRegistry(unittest.TestCase):
             self.registry["hello"]
 
 
+class TestPublisherPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = app.PublisherPool()
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_reuses_publisher_in_same_thread(self):
+        publisher = self.pool.get_publisher()
+        self.assertIs(publisher, self.pool.get_publisher())
+
+    def test_creates_publisher_per_thread(self):
+        publishers = []
+        thread = threading.Thread(
+            target=lambda: publishers.append(self.pool.get_publisher()),
+        )
+        thread.start()
+        thread.join()
+        self.assertIsNot(publishers[0], self.pool.get_publisher())
+        self.assertIs(publishers[0].socket.context, self.pool.get_publisher().socket.context)
+
+    def test_closes_publishers_of_exited_threads(self):
+        publishers = []
+        for _ in range(3):
+            thread = threading.Thread(
+                target=lambda: publishers.append(self.pool.get_publisher()),
+            )
+            thread.start()
+            thread.join()
+        self.pool.get_publisher()
+        self.assertEqual(1, len(self.pool._publishers))
+        self.assertTrue(all(publisher.socket.closed for publisher in publishers))
+
+    def test_pool_is_dropped_after_fork(self):
+        publisher = self.pool.get_publisher()
+        self.pool._pid = -1
+        self.assertIsNot(publisher, self.pool.get_publisher())
+        publisher.connection.close()
+        publisher.socket.context.term()
+
+
+class TestBatchPublishing(unittest.TestCase):
+    def setUp(self):
+        self.pull = ConnectionFactory.create_connection(
+            ConnectionType.zmq_bind,
+            SocketType.ZmqPull,
+            "localhost",
+            7892,
+        )
+        push = ConnectionFactory.create_connection(
+            ConnectionType.zmq_connect,
+            SocketType.ZmqPush,
+            "localhost",
+            7892,
+        )
+        self.publisher = app.TaskPublisher(push)
+
+        @app.Task
+        def greet(name):
+            return name
+
+        self.task = greet
+
+    def tearDown(self):
+        self.publisher.connection.close()
+        self.pull.close()
+
+    def receive(self):
+        return decode_message(self.pull.socket.recv_multipart())
+
+    def test_publish_batch_splits_by_batch_size(self):
+        kwargs = [{"name": str(i)} for i in range(5)]
+        published = self.publisher.publish_batch(self.task.get_task_object(), kwargs, 2)
+        self.assertEqual(5, published)
+        sizes = [len(self.receive()["batch"]) for _ in range(3)]
+        self.assertEqual([2, 2, 1], sizes)
+
+    def test_buffer_coalesces_tasks_from_threads(self):
+        buffer = app.TaskBuffer(None, 10, 100, lambda queue: self.publisher)
+        payload = app.make_payload(self.task.get_task_object(), {"name": "x"})
+        threads = [
+            threading.Thread(target=lambda: [buffer.add(payload) for _ in range(5)])
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(buffer.flush(timeout=5))
+        self.assertEqual(20, len(self.receive()["batch"]))
+        buffer.close()
+
+    def test_buffer_flushes_on_window_and_size(self):
+        with app.TaskBuffer(None, 0.01, 3, lambda queue: self.publisher) as buffer:
+            buffer.add({"task": "greet", "kwargs": {"name": "late"}})
+            self.assertTrue(self.pull.socket.poll(1000))
+            self.assertEqual("late", self.receive()["kwargs"]["name"])
+            buffer.window = 10
+            for i in range(7):
+                buffer.add({"task": "greet", "kwargs": {"name": str(i)}})
+        self.assertEqual(3, len(self.receive()["batch"]))
+        self.assertEqual(3, len(self.receive()["batch"]))
+        self.assertEqual("6", self.receive()["kwargs"]["name"])
+        buffer.close()
+
+    def test_buffer_reports_tasks_not_sent(self):
+        failing = mock.Mock()
+        failing.send.side_effect = zmq.ZMQError()
+        buffer = app.TaskBuffer(None, 10, 100, lambda queue: failing)
+        buffer.add({"task": "greet", "kwargs": {"name": "lost"}})
+        self.assertFalse(buffer.flush(timeout=5))
+        self.assertEqual((0, 1), (buffer._sent, buffer._failed))
+
+        buffer.get_publisher = lambda queue: self.publisher
+        buffer.add({"task": "greet", "kwargs": {"name": "sent"}})
+        self.assertTrue(buffer.flush(timeout=5))
+        self.assertEqual("sent", self.receive()["kwargs"]["name"])
+        buffer.close()
+
+    def test_worker_unpacks_batch(self):
+        executed = []
+
+        class RecordingRunner(BaseTaskRunner):
+            def execute(self, task_name, **kwargs):
+                executed.append((task_name, kwargs))
+
+        self.publisher.publish_batch(
+            self.task.get_task_object(),
+            [{"name": "a"}, {"name": "b"}],
+        )
+        worker = TaskQueueWorker(self.pull, RecordingRunner())
+        worker.handle_frames(self.pull.socket.recv_multipart())
+        self.assertEqual([("greet", {"name": "a"}), ("greet", {"name": "b"})], executed)
+
+
+class TestSerializers(unittest.TestCase):
+    payload = {"task": "hello", "kwargs": {"name": "KayPee", "count": 2}}
+
+    def test_json_round_trip(self):
+        frames = encode_message(self.payload, JsonSerializer())
+        self.assertEqual(2, len(frames))
+        self.assertEqual(self.payload, decode_message(frames))
+
+    def test_pickle_sends_large_buffers_out_of_band(self):
+        data = bytearray(b"x" * (PickleSerializer.out_of_band_threshold + 1))
+        payload = {"task": "hello", "kwargs": {"data": pickle.PickleBuffer(data)}}
+        frames = encode_message(payload, PickleSerializer())
+        self.assertEqual(3, len(frames))
+        message = decode_message([bytes(frame) for frame in frames])
+        self.assertEqual(bytes(data), bytes(message["kwargs"]["data"]))
+
+    @unittest.skipIf(msgpack is None, "msgpack is not installed")
+    def test_msgpack_round_trip(self):
+        payload = {"task": "hello", "kwargs": {"blob": b"\x00\x01"}}
+        frames = encode_message(payload, MsgpackSerializer())
+        self.assertEqual(payload, decode_message(frames))
+
+    def test_decodes_legacy_json_message(self):
+        frame = json.dumps(self.payload).encode("utf-8")
+        self.assertEqual(self.payload, decode_message([frame]))
+
+    def test_rejects_serializer_not_accepted(self):
+        frames = encode_message(self.payload, PickleSerializer())
+        with self.assertRaises(ZebrokSerializationError):
+            decode_message(frames, {"json"})
+
+    def test_create_serializer_from_name(self):
+        serializer_type = SerializerFactory.get_serializer_type("json")
+        serializer = SerializerFactory.create_serializer(serializer_type)
+        self.assertIsInstance(serializer, JsonSerializer)
+        with self.assertRaises(ZebrokSerializationError):
+            SerializerFactory.get_serializer_type("yaml")
+
+
+class TestCompression(unittest.TestCase):
+    def test_large_payload_is_compressed(self):
+        payload = {"task": "hello", "kwargs": {"document": "lorem ipsum " * 1000}}
+        compressor = ZlibCompressor(threshold=1024)
+        frames = encode_message(payload, JsonSerializer(), eta=1234.5, compressor=compressor)
+        self.assertLess(len(frames[1]), 1024)
+        self.assertEqual(1234.5, read_eta(frames))
+        self.assertEqual(payload, decode_message(frames))
+        small = encode_message({"task": "hello", "kwargs": {}}, JsonSerializer(), compressor=compressor)
+        self.assertEqual(JsonSerializer().dumps({"task": "hello", "kwargs": {}}), small[1:])
+
+    def test_compresses_out_of_band_buffers(self):
+        data = bytearray(b"x" * (PickleSerializer.out_of_band_threshold + 1))
+        payload = {"task": "hello", "kwargs": {"data": pickle.PickleBuffer(data)}}
+        frames = encode_message(payload, PickleSerializer(), compressor=ZlibCompressor())
+        self.assertLess(len(frames[2]), len(data))
+        message = decode_message(frames)
+        self.assertEqual(bytes(data), bytes(message["kwargs"]["data"]))
+
+    def test_incompressible_payload_is_sent_as_is(self):
+        payload = {"task": "hello", "kwargs": {"blob": os.urandom(4096)}}
+        frames = encode_message(payload, PickleSerializer(), compressor=ZlibCompressor())
+        self.assertEqual(PickleSerializer().dumps(payload), frames[1:])
+
+    def test_create_compressor_from_name(self):
+        self.assertIsNone(create_compressor(""))
+        self.assertIsInstance(create_compressor("zlib"), ZlibCompressor)
+        self.assertIsNotNone(create_compressor("auto", 10))
+        with self.assertRaises(ZebrokSerializationError):
+            create_compressor("brotli")
+
+    def test_corrupt_message_is_not_decoded(self):
+        payload = {"task": "hello", "kwargs": {"text": "a" * 4096}}
+        frames = encode_message(payload, JsonSerializer(), compressor=ZlibCompressor())
+        frames[1] = frames[1][:-10]
+        with self.assertRaises(ZebrokSerializationError):
+            decode_message(frames)
+
+    def test_decompression_is_capped(self):
+        data = b"\0" * 100000
+        compressor_classes = [ZlibCompressor]
+        if lz4_frame is not None:
+            compressor_classes.append(Lz4Compressor)
+        if zstandard is not None:
+            compressor_classes.append(ZstdCompressor)
+        for compressor_class in compressor_classes:
+            compressor = compressor_class()
+            compressed = compressor.compress(data)
+            self.assertEqual(data, compressor.decompress(compressed, len(data)))
+            with self.assertRaises(ZebrokSerializationError):
+                compressor.decompress(compressed, len(data) - 1)
+
+        payload = {"task": "hello", "kwargs": {"text": "a" * 100000}}
+        frames = encode_message(payload, JsonSerializer(), compressor=ZlibCompressor())
+        with mock.patch.object(get_compressor_by_flags(ZlibCompressor.flag), "max_size", 1000):
+            with self.assertRaises(ZebrokSerializationError):
+                decode_message(frames)
+        self.assertEqual(payload, decode_message(frames))
+
+
+class TestSlaveForwarding(unittest.TestCase):
+    def setUp(self):
+        self.connections = [
+            ConnectionFactory.create_connection(connection_type, socket_type, "localhost", port)
+            for connection_type, socket_type, port in (
+                (ConnectionType.zmq_bind, SocketType.ZmqPull, 7893),
+                (ConnectionType.zmq_connect, SocketType.ZmqPush, 7893),
+                (ConnectionType.zmq_bind, SocketType.ZmqRouter, 7894),
+                (ConnectionType.zmq_connect, SocketType.ZmqDealer, 7894),
+            )
+        ]
+        master_pull, push, router, self.dealer = self.connections
+        self.publisher = app.TaskPublisher(push, PickleSerializer())
+        self.scheduler = SlaveScheduler(router.socket, prefetch=1)
+        self.master = TaskQueueWorker(master_pull, TaskRunnerForTesting(), self.scheduler)
+
+        self.dealer.socket.send(READY)
+        self.scheduler.socket.poll(1000)
+        self.scheduler.receive_reports()
+
+    def tearDown(self):
+        for connection in self.connections:
+            connection.close()
+
+    def test_master_forwards_frames_untouched(self):
+        data = bytearray(b"x" * (PickleSerializer.out_of_band_threshold + 1))
+        payload = {"task": "hello", "kwargs": {"data": pickle.PickleBuffer(data)}}
+        self.publisher.send(payload)
+
+        frames = self.master.socket.recv_multipart(copy=False)
+        self.master.forward_frames(1, frames)
+
+        forwarded = self.dealer.socket.recv_multipart(copy=False)
+        self.assertEqual((1).to_bytes(8, "big") + frames[0].bytes, forwarded[0].bytes)
+        forwarded[0] = forwarded[0].bytes[8:]
+        self.assertEqual(
+            [frame.bytes for frame in frames],
+            [getattr(frame, "bytes", frame) for frame in forwarded],
+        )
+        message = decode_message(forwarded)
+        self.assertEqual(bytes(data), bytes(message["kwargs"]["data"]))
+
+    def test_slave_is_saturated_until_done(self):
+        self.assertEqual(1, self.master.number_of_slaves)
+        message_id = (1).to_bytes(8, "big")
+        self.scheduler.dispatch(message_id, [b"task"])
+        self.assertFalse(self.scheduler.has_capacity())
+        self.assertIsNone(self.master.get_available_slave())
+
+        self.dealer.socket.send(DONE + message_id)
+        self.scheduler.socket.poll(1000)
+        self.assertEqual([message_id], self.scheduler.receive_reports())
+        self.assertTrue(self.scheduler.has_capacity())
+
+    def test_messages_of_restarted_slave_are_redelivered(self):
+        message_id = (7).to_bytes(8, "big")
+        self.scheduler.dispatch(message_id, [b"task"])
+        self.dealer.socket.send(READY)
+        self.scheduler.socket.poll(1000)
+        self.assertEqual([], self.scheduler.receive_reports())
+        self.assertEqual([0], list(self.scheduler.in_flight.values()))
+
+        self.master.requeue_lost_messages()
+        self.assertEqual([(7, [b"task"])], list(self.master.undispatched["default"]))
+        self.assertFalse(self.scheduler.lost)
+
+    def test_worker_survives_failing_task(self):
+        runner = mock.Mock()
+        runner.execute.side_effect = ValueError("boom")
+        worker = TaskQueueWorker(mock.Mock(), runner)
+        self.assertEqual(1, worker.execute_message({"task": "boom", "kwargs": {}}))
+
+    def test_worker_drops_malformed_task(self):
+        runner = mock.Mock()
+        worker = TaskQueueWorker(mock.Mock(), runner)
+        message = {"batch": [{"task": "hello", "args": 1}, {"task": "hello", "args": [1]}]}
+        self.assertEqual(2, worker.execute_message(message))
+        runner.execute.assert_called_once_with("hello", 1)
+
+    def test_worker_drops_malformed_messages(self):
+        runner = mock.Mock()
+        worker = TaskQueueWorker(mock.Mock(), runner)
+        worker.report_done = mock.Mock()
+        messages = [
+            encode_message(payload, JsonSerializer())
+            for payload in (
+                [1],
+                "x",
+                {"batch": 5},
+                {"batch": [1]},
+                {"task": 5},
+                {"task": "hello", "reply_to": "tcp://127.0.0.1:7999"},
+                {"task": "hello", "reply_to": 123, "id": "a"},
+                {"task": "hello", "reply_to": "garbage", "id": "a"},
+                {"task": "hello", "reply_to": "tcp://127.0.0.1:7999", "id": 1},
+                {"task": "hello", "published_at": "yesterday"},
+            )
+        ]
+        serializers = [JsonSerializer(), PickleSerializer()]
+        if msgpack is not None:
+            serializers.append(MsgpackSerializer())
+        for serializer in serializers:
+            header, *_ = encode_message({"task": "hello"}, serializer)
+            messages.append([header, b"\xc1garbage"])
+        messages.append([b"not json"])
+        for token, frames in enumerate(messages):
+            worker.execute_frames(token, frames)
+            worker.report_done.assert_called_with(token)
+        self.assertEqual(len(messages), worker.report_done.call_count)
+        self.assertFalse(worker.remaining)
+        runner.execute.assert_not_called()
+
+
+class TestSlaveScheduler(unittest.TestCase):
+    def test_picks_least_busy_slave(self):
+        scheduler = SlaveScheduler(None, prefetch=3)
+        scheduler.in_flight = {b"a": 2, b"b": 0, b"c": 1}
+        self.assertEqual(b"b", scheduler.get_available_slave())
+
+    def test_forgets_unreachable_slave(self):
+        router = ConnectionFactory.create_connection(
+            ConnectionType.zmq_bind,
+            SocketType.ZmqRouter,
+            "localhost",
+            7895,
+            None,
+            {zmq.ROUTER_MANDATORY: 1},
+        )
+        scheduler = SlaveScheduler(router.socket, prefetch=1)
+        scheduler.in_flight = {b"ghost": 0}
+        self.assertIsNone(scheduler.dispatch(b"m1", [b"task"]))
+        self.assertEqual(0, scheduler.number_of_slaves)
+        router.close()
+
+    def test_no_slave_available_at_prefetch_limit(self):
+        scheduler = SlaveScheduler(None, prefetch=2)
+        scheduler.in_flight = {b"a": 2, b"b": 2}
+        self.assertIsNone(scheduler.get_available_slave())
+        self.assertFalse(scheduler.has_capacity())
+
+
+def exit_immediately(code):
+    os._exit(code)
+
+
+class TestSlaveProcessSupervisor(unittest.TestCase):
+    def test_restarts_dead_slaves(self):
+        supervisor = SlaveProcessSupervisor(exit_immediately, [(0,), (1,)])
+        supervisor.start()
+        first_processes = list(supervisor.processes)
+        for process in first_processes:
+            process.join()
+
+        self.assertEqual(2, supervisor.restart_dead_slaves())
+        self.assertEqual("zebrok-slave-1", supervisor.processes[1].name)
+        for old, new in zip(first_processes, supervisor.processes):
+            self.assertIsNot(old, new)
+        supervisor.stop()
+
+    def test_worker_rejects_unknown_execution_mode(self):
+        with self.assertRaises(AssertionError):
+            WorkerInitializer(number_of_slaves=1, execution_mode="fibers")
+
+
+class TestAsyncWorker(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.finished = asyncio.Event()
+        self.done = 0
+
+        @app.Task
+        async def fetch(url):
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(0.05)
+            self.in_flight -= 1
+            self.done += 1
+            if self.done == 6:
+                self.finished.set()
+
+        self.task = fetch
+        context = zmq.asyncio.Context()
+        self.pull = ConnectionFactory.create_connection(
+            ConnectionType.zmq_bind, SocketType.ZmqPull, "localhost", 7896, context,
+        )
+        push = ConnectionFactory.create_connection(
+            ConnectionType.zmq_connect, SocketType.ZmqPush, "localhost", 7896, context,
+        )
+        self.publisher = app.AsyncTaskPublisher(push)
+        runner = DefaultTaskRunner({"fetch": fetch})
+        self.worker = AsyncTaskQueueWorker(self.pull, runner, concurrency=3)
+
+    async def asyncTearDown(self):
+        self.publisher.connection.close()
+        self.pull.close()
+        self.pull.socket.context.term()
+
+    async def test_runs_async_tasks_concurrently_up_to_limit(self):
+        running = asyncio.ensure_future(self.worker.start())
+        await self.publisher.publish_batch(
+            self.task.get_task_object(),
+            [{"url": str(i)} for i in range(6)],
+        )
+        await asyncio.wait_for(self.finished.wait(), 5)
+        running.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await running
+        self.assertEqual(3, self.max_in_flight)
+
+    async def test_malformed_task_is_dropped(self):
+        slots = asyncio.Semaphore(1)
+        await slots.acquire()
+        self.worker.report_done = mock.Mock()
+        self.worker.remaining["m1"] = 1
+        task = {"task": "fetch", "kwargs": {"url": "x"}, "reply_to": "garbage", "id": "a"}
+        await self.worker._execute_task(task, slots, "m1")
+        self.worker.report_done.assert_called_once_with("m1")
+        self.assertEqual(0, self.done)
+
+    def test_sync_runner_runs_async_task_to_completion(self):
+        runner = DefaultTaskRunner({"fetch": self.task})
+        self.assertTrue(runner.execute("fetch", url="x"))
+        self.assertEqual(1, self.done)
+
+
+class TestTaskExecutors(unittest.TestCase):
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        def work():
+            with self.lock:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            time.sleep(0.02)
+            with self.lock:
+                self.in_flight -= 1
+
+        self.runner = DefaultTaskRunner({"work": work})
+
+    def test_thread_executor_bounds_tasks_in_flight(self):
+        executor = create_task_executor("threads", self.runner, 2)
+        for token in range(6):
+            executor.submit("work", {}, token)
+        executor.join()
+        self.assertEqual(2, self.max_in_flight)
+        self.assertEqual(list(range(6)), sorted(executor.pop_completed()))
+        executor.shutdown()
+
+    def test_inline_execution_has_no_executor(self):
+        self.assertIsNone(create_task_executor("inline", self.runner, 2))
+
+    def test_worker_hands_batch_to_executor(self):
+        executor = create_task_executor("threads", self.runner, 3)
+        worker = TaskQueueWorker(mock.Mock(), self.runner, executor=executor)
+        count = worker.execute_message({"batch": [{"task": "work", "kwargs": {}}] * 3}, "m1")
+        executor.join()
+        self.assertEqual(3, count)
+        self.assertEqual(3, self.max_in_flight)
+        self.assertEqual(["m1"] * 3, executor.pop_completed())
+        executor.shutdown()
+
+    def test_scheduler_limit_follows_slave_capacity(self):
+        scheduler = SlaveScheduler(None, prefetch=2)
+        scheduler.in_flight = {b"a": 3, b"b": 1}
+        scheduler.limits = {b"a": 8, b"b": 2}
+        self.assertEqual(b"a", scheduler.get_available_slave())
+
+
+class TestQueues(unittest.TestCase):
+    def test_parse_queues_by_weight(self):
+        queues = parse_queues("bulk:5702, high:5700:4:2,default::2", 5690)
+        self.assertEqual(["high", "default", "bulk"], [queue.name for queue in queues])
+        self.assertEqual([5700, 5690, 5702], [queue.port for queue in queues])
+        self.assertEqual([2, 0, 0], [queue.slaves for queue in queues])
+
+    def test_parse_queues_keeps_defaults_of_empty_fields(self):
+        _, high = parse_queues("high:5700::2", 5690)
+        self.assertEqual(("high", 5700, 1, 2), (high.name, high.port, high.weight, high.slaves))
+        for spec in ("high:5700:1:2:3", "high:5700:x", "high", "high::2", ":5700"):
+            with self.assertRaises(ValueError):
+                parse_queues(spec, 5690)
+
+    def test_task_is_published_to_its_queue(self):
+        with mock.patch.dict(os.environ, {"QUEUES": "high:5700:4"}):
+            self.assertEqual(5700, get_queue_port_and_host("high")[0])
+            self.assertEqual(get_worker_port_and_host(), get_queue_port_and_host())
+            with self.assertRaisesRegex(ValueError, "missing"):
+                get_queue_port_and_host("missing")
+
+    def test_reserved_slaves_only_serve_their_queue(self):
+        scheduler = SlaveScheduler(None, prefetch=2, reserved={b"urgent": "high"})
+        scheduler.in_flight = {b"urgent": 0, b"shared": 2}
+        self.assertFalse(scheduler.has_capacity())
+        self.assertIsNone(scheduler.get_available_slave())
+        self.assertEqual(b"urgent", scheduler.get_available_slave("high"))
+        scheduler.in_flight[b"shared"] = 0
+        scheduler.in_flight[b"urgent"] = 1
+        self.assertEqual(b"shared", scheduler.get_available_slave("high"))
+
+    def test_worker_drains_queues_by_weight(self):
+        connections = [
+            ConnectionFactory.create_connection(connection_type, socket_type, "localhost", port)
+            for connection_type, socket_type, port in (
+                (ConnectionType.zmq_bind, SocketType.ZmqPull, 7901),
+                (ConnectionType.zmq_connect, SocketType.ZmqPush, 7901),
+                (ConnectionType.zmq_bind, SocketType.ZmqPull, 7903),
+                (ConnectionType.zmq_connect, SocketType.ZmqPush, 7903),
+            )
+        ]
+        default_pull, default_push, high_pull, high_push = connections
+        worker = TaskQueueWorker(default_pull, TaskRunnerForTesting())
+        worker.add_queue(TaskQueue("high", 7903, weight=3), high_pull)
+        for push in (default_push, high_push):
+            for _ in range(4):
+                push.socket.send(b"task")
+        for pull in (default_pull, high_pull):
+            while pull.socket.getsockopt(zmq.EVENTS) & zmq.POLLIN == 0:
+                pull.socket.poll(100)
+
+        events = {default_pull.socket: zmq.POLLIN, high_pull.socket: zmq.POLLIN}
+        drained = [queue for _, queue, _ in worker.drain_queues(events, lambda queue: True)]
+        self.assertEqual(["high", "high", "high", "default"], drained)
+        for connection in connections:
+            connection.close()
+
+
+class TestWorkerNodes(unittest.TestCase):
+    def test_named_queue_endpoints_use_queue_port(self):
+        configured = parse_endpoints("10.0.0.1:5690, 10.0.0.2:5690")
+        discovered = (("10.0.0.2", 5690), ("10.0.0.3", 5690))
+        self.assertEqual(
+            (("10.0.0.1", 5690), ("10.0.0.2", 5690), ("10.0.0.3", 5690)),
+            resolve_endpoints(configured, discovered),
+        )
+        self.assertEqual(
+            (("10.0.0.1", 5700), ("10.0.0.2", 5700), ("10.0.0.3", 5700)),
+            resolve_endpoints(configured, discovered, 5700),
+        )
+
+    def test_publisher_spreads_tasks_over_endpoints(self):
+        pulls = [
+            ConnectionFactory.create_connection(
+                ConnectionType.zmq_bind,
+                SocketType.ZmqPull,
+                "localhost",
+                port,
+            )
+            for port in (7905, 7907)
+        ]
+        pool = app.PublisherPool()
+        endpoints = "localhost:7905,localhost:7907"
+        with mock.patch.dict(os.environ, {"WORKER_ENDPOINTS": endpoints}):
+            publisher = pool.get_publisher()
+            self.assertEqual(2, len(publisher.endpoints))
+            time.sleep(0.2)
+            for _ in range(4):
+                publisher.send({"task": "hello", "kwargs": {}})
+        for pull in pulls:
+            for _ in range(2):
+                self.assertTrue(pull.socket.poll(1000))
+                pull.socket.recv_multipart()
+            pull.close()
+        pool.close()
+
+    def test_nodes_are_discovered_and_dropped(self):
+        directory = NodeDirectory(7909, 0.05)
+        beacon = WorkerBeacon(5690, 7909, "127.0.0.1", 0.05)
+        beacon.start()
+        self.assertTrue(directory.wait(1))
+        self.assertEqual((("127.0.0.1", 5690),), directory.endpoints)
+        beacon.stop()
+        deadline = time.time() + 2
+        while directory.endpoints and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual((), directory.endpoints)
+        directory.close()
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_replays_unfinished_messages_after_restart(self):
+        journal = TaskJournal(self.path, 4096, 0.01)
+        sequences = [journal.append([b"header", body]) for body in (b"a", b"b", b"c")]
+        journal.complete(sequences[0])
+        journal.close()
+
+        journal = TaskJournal(self.path, 4096, 0.01)
+        self.assertEqual(
+            [(sequences[1], [b"header", b"b"]), (sequences[2], [b"header", b"c"])],
+            journal.pending(),
+        )
+        self.assertEqual([], journal.pending())
+        self.assertGreater(journal.append([b"d"]), sequences[2])
+        journal.close()
+
+    def test_deletes_segments_once_messages_complete(self):
+        journal = TaskJournal(self.path, 128, 0.01)
+        sequences = [journal.append([b"x" * 50]) for _ in range(10)]
+        self.assertGreater(len(os.listdir(self.path)), 1)
+        for sequence in sequences:
+            journal.complete(sequence)
+        self.assertEqual(1, len(os.listdir(self.path)))
+        self.assertEqual(0, journal.number_pending)
+        journal.close()
+
+    def test_worker_replays_journaled_message(self):
+        journal = TaskJournal(self.path, 4096, 0.01)
+        frames = encode_message({"task": "hello", "kwargs": {}}, JsonSerializer())
+        journal.append([b"default", *frames])
+        journal.close()
+
+        runner = TaskRunnerForTesting()
+        runner.execute = mock.Mock()
+        connection = mock.Mock()
+        connection.socket.recv_multipart.side_effect = KeyboardInterrupt
+        worker = TaskQueueWorker(connection, runner, journal=TaskJournal(self.path, 4096, 0.01))
+        worker.start()
+        runner.execute.assert_called_once_with("hello")
+
+        journal = TaskJournal(self.path, 4096, 0.01)
+        self.assertEqual([], journal.pending())
+        journal.close()
+
+
+class TestTimers(unittest.TestCase):
+    def setUp(self):
+        self.worker = TaskQueueWorker(mock.Mock(), TaskRunnerForTesting())
+
+    def test_timer_heap_pops_due_timers_in_order(self):
+        timers = TimerHeap()
+        for due in (3.0, 1.0, 2.0, 1.0):
+            timers.push(due, due)
+        self.assertEqual(1000, timers.get_timeout(now=0.0))
+        self.assertEqual([(1.0, 1.0), (1.0, 1.0), (2.0, 2.0)], timers.pop_due(now=2.5))
+        self.assertEqual(1, len(timers))
+        self.assertIsNone(TimerHeap().get_timeout())
+
+    def test_eta_is_read_from_header_only(self):
+        payload = {"task": "hello", "kwargs": {}}
+        frames = encode_message(payload, JsonSerializer(), eta=1234.5)
+        self.assertEqual(1234.5, read_eta(frames))
+        self.assertEqual(payload, decode_message(frames))
+        self.assertIsNone(read_eta(encode_message(payload, JsonSerializer())))
+
+    def test_countdown_resolves_to_eta(self):
+        self.assertIsNone(app.resolve_eta())
+        self.assertEqual(10.0, app.resolve_eta(eta=10))
+        self.assertAlmostEqual(time.time() + 5, app.resolve_eta(countdown=5), delta=1)
+
+    def test_worker_holds_delayed_message_until_due(self):
+        frames = encode_message({"task": "hello", "kwargs": {}}, JsonSerializer(), time.time() + 0.05)
+        self.assertTrue(self.worker.hold_delayed(1, "default", frames))
+        self.assertEqual([], self.worker.pop_due_messages())
+        time.sleep(0.06)
+        [(token, queue, held)] = self.worker.pop_due_messages()
+        self.assertEqual((1, "default"), (token, queue))
+        self.assertEqual("hello", decode_message(held)["task"])
+
+    def test_periodic_task_is_rescheduled(self):
+        def tick():
+            pass
+
+        self.worker.add_periodic_task(PeriodicTask(tick, 0.02, {"n": 1}))
+        time.sleep(0.03)
+        [(_, queue, frames)] = self.worker.pop_due_messages()
+        self.assertEqual("default", queue)
+        self.assertEqual({"n": 1}, decode_message(frames)["kwargs"])
+        self.assertEqual(1, len(self.worker.timers))
+
+
+class TestIdempotency(unittest.TestCase):
+    def test_key_is_read_from_header_only(self):
+        payload = {"task": "hello", "kwargs": {}}
+        frames = encode_message(payload, JsonSerializer(), eta=1234.5, key="order-1")
+        self.assertEqual(b"order-1", read_key(frames))
+        self.assertEqual(1234.5, read_eta(frames))
+        self.assertEqual(payload, decode_message(frames))
+        frames = encode_message(payload, JsonSerializer(), key="order-2")
+        self.assertEqual(b"order-2", read_key(frames))
+        self.assertIsNone(read_eta(frames))
+        self.assertIsNone(read_key(encode_message(payload, JsonSerializer(), eta=1234.5)))
+
+    def test_key_must_be_short_str(self):
+        payload = {"task": "hello", "kwargs": {}}
+        frames = encode_message(payload, JsonSerializer(), key="\u00e9" * 127)
+        self.assertEqual(254, len(read_key(frames)))
+        with self.assertRaises(ValueError):
+            encode_message(payload, JsonSerializer(), key="\u00e9" * 128)
+
+        @app.Task
+        def hello():
+            pass
+
+        publisher = app.TaskPublisher(mock.Mock())
+        with mock.patch.object(app.publisher_pool, "get_publisher", return_value=publisher):
+            with self.assertRaises(TypeError):
+                hello.run(idempotency_key=42)
+            with self.assertRaises(ValueError):
+                hello.run(idempotency_key="k" * 256)
+        publisher.connection.socket.send_multipart.assert_not_called()
+
+    def test_cache_forgets_expired_and_oldest_keys(self):
+        cache = IdempotencyCache(ttl=10, max_keys=2)
+        self.assertTrue(cache.add(b"a", now=0))
+        self.assertFalse(cache.add(b"a", now=5))
+        self.assertTrue(cache.add(b"a", now=10))
+        self.assertTrue(cache.add(b"b", now=11))
+        self.assertTrue(cache.add(b"c", now=12))
+        self.assertEqual(2, len(cache))
+        self.assertTrue(cache.add(b"a", now=13))
+
+    def test_worker_drops_duplicate_messages(self):
+        runner = mock.Mock()
+        worker = TaskQueueWorker(mock.Mock(), runner)
+        worker.report_done = mock.Mock()
+        hits, misses = worker.idempotency_hits.value, worker.idempotency_misses.value
+        frames = encode_message({"task": "hello", "kwargs": {}}, JsonSerializer(), key="order-1")
+        self.assertFalse(worker.hold_message(1, "default", frames))
+        self.assertTrue(worker.hold_message(2, "default", list(frames)))
+        worker.report_done.assert_called_once_with(2)
+        self.assertEqual(hits + 1, worker.idempotency_hits.value)
+        self.assertEqual(misses + 1, worker.idempotency_misses.value)
+        plain = encode_message({"task": "hello", "kwargs": {}}, JsonSerializer())
+        self.assertFalse(worker.hold_message(3, "default", plain))
+        self.assertFalse(worker.hold_message(4, "default", plain))
+
+
+class TestResults(unittest.TestCase):
+    def setUp(self):
+        self.pull = ConnectionFactory.create_connection(
+            ConnectionType.zmq_bind,
+            SocketType.ZmqPull,
+            "localhost",
+            7899,
+        )
+        push = ConnectionFactory.create_connection(
+            ConnectionType.zmq_connect,
+            SocketType.ZmqPush,
+            "localhost",
+            7899,
+        )
+        self.publisher = app.TaskPublisher(push)
+
+        def add(a, b):
+            return a + b
+
+        self.add = add
+        self.worker = TaskQueueWorker(self.pull, DefaultTaskRunner({"add": add}))
+
+    def tearDown(self):
+        self.publisher.connection.close()
+        self.pull.close()
+
+    def receive_and_execute(self):
+        self.worker.handle_frames(self.pull.socket.recv_multipart(copy=False))
+
+    def test_result_resolves_with_task_value(self):
+        result = self.publisher.publish_task_for_result(self.add, a=1, b=2)
+        self.receive_and_execute()
+        self.assertEqual(3, result.get(timeout=5))
+
+    def test_failed_task_raises_on_get(self):
+        result = self.publisher.publish_task_for_result(self.add, a=1, b="2")
+        self.receive_and_execute()
+        with self.assertRaises(ZebrokTaskError):
+            result.get(timeout=5)
+
+    def test_batch_results_gathered_in_order(self):
+        kwargs = [{"a": i, "b": i} for i in range(4)]
+        results = self.publisher.publish_batch_for_results(self.add, kwargs, 3)
+        self.receive_and_execute()
+        self.receive_and_execute()
+        self.assertEqual([0, 2, 4, 6], gather_results(results, timeout=5))
+
+    def test_executor_sends_results(self):
+        self.worker.executor = create_task_executor("threads", self.worker.runner, 2)
+        result = self.publisher.publish_task_for_result(self.add, a=2, b=2)
+        self.receive_and_execute()
+        self.assertEqual(4, result.get(timeout=5))
+        self.worker.executor.join()
+        self.worker.executor.shutdown()
+
+    def test_task_option_returns_result(self):
+        @app.Task(result=True)
+        def multiply(a, b):
+            return a * b
+
+        self.assertTrue(multiply.result)
+        self.assertEqual(6, multiply(a=2, b=3))
+        self.assertEqual("multiply", multiply.get_task_object().__name__)
+
+    def test_unanswered_results_expire(self):
+        backend = ResultBackend()
+        with mock.patch.dict(os.environ, {"RESULT_TTL": "0.05", "RESULT_MAX_PENDING": "2"}):
+            results = [backend.create_result() for _ in range(3)]
+            with self.assertRaises(ZebrokResultExpiredError):
+                results[0].get(timeout=0)
+            with self.assertRaises(ZebrokResultExpiredError):
+                results[2].get(timeout=5)
+        self.assertEqual(0, len(backend._pending))
+        backend.close()
+
+    def test_backend_drops_unaccepted_and_malformed_results(self):
+        path = os.path.join(tempfile.mkdtemp(), "pwned")
+
+        class Exploit:
+            def __reduce__(self):
+                return os.mkdir, (path,)
+
+        backend = ResultBackend()
+        result = backend.create_result()
+        push = zmq.Context.instance().socket(zmq.PUSH)
+        push.connect(result.reply_to)
+        messages = [
+            encode_message({"id": result.id, "value": Exploit()}, PickleSerializer()),
+            [b"[1, 2]"],
+            encode_message({"id": [result.id], "value": 1}, JsonSerializer()),
+            encode_message([1, 2], JsonSerializer()),
+        ]
+        for frames in messages:
+            push.send_multipart(frames)
+        with self.assertRaises(concurrent.futures.TimeoutError):
+            result.get(timeout=0.2)
+        self.assertFalse(os.path.exists(path))
+
+        push.send_multipart(encode_message({"id": result.id, "value": 3}, JsonSerializer()))
+        self.assertEqual(3, result.get(timeout=5))
+        self.assertTrue(backend._thread.is_alive())
+        push.close(linger=0)
+        backend.close()
+
+    def test_sender_closes_unused_sockets(self):
+        sender = ResultSender()
+        self.assertFalse(sender.send("garbage", "id", 1))
+        addresses = [f"tcp://127.0.0.1:{port}" for port in range(7910, 7915)]
+        with mock.patch("zebrok.results.MAX_RESULT_SOCKETS", 2):
+            for address in addresses:
+                sender.send(address, "id", 1)
+            self.assertEqual(addresses[-2:], list(sender._local.sockets))
+            self.assertEqual(2, len(sender._sockets))
+            sender.send(addresses[-2], "id", 1)
+            self.assertEqual([addresses[-1], addresses[-2]], list(sender._local.sockets))
+        with mock.patch("zebrok.results.RESULT_SOCKET_IDLE", 0):
+            sender.send(addresses[0], "id", 1)
+            self.assertEqual([addresses[0]], list(sender._local.sockets))
+            self.assertEqual(1, len(sender._sockets))
+        sender.close()
+
+
+class TestMetrics(unittest.TestCase):
+    def test_render_prometheus_text(self):
+        registry = MetricsRegistry()
+        registry.counter("jobs_total", worker="master").inc(3)
+        histogram = registry.histogram("job_seconds")
+        histogram.observe(0.002)
+        histogram.observe(100)
+        text = registry.render()
+        self.assertIn("# TYPE jobs_total counter", text)
+        self.assertIn('jobs_total{worker="master"} 3', text)
+        self.assertIn('job_seconds_bucket{le="0.001"} 0', text)
+        self.assertIn('job_seconds_bucket{le="0.0025"} 1', text)
+        self.assertIn('job_seconds_bucket{le="+Inf"} 2', text)
+        self.assertIn("job_seconds_count 2", text)
+
+    def test_runner_and_worker_are_instrumented(self):
+        def measured():
+            pass
+
+        runner = DefaultTaskRunner({"measured": measured})
+        worker = TaskQueueWorker(mock.Mock(), runner)
+        duration = metrics.histogram("zebrok_task_duration_seconds", task="measured")
+        count = duration.count
+        received = worker.received.value
+        latency = worker.queue_latency.count
+
+        frames = encode_message(app.make_payload(measured, {}), JsonSerializer())
+        worker.handle_frames(frames)
+        self.assertEqual(count + 1, duration.count)
+        self.assertEqual(received + 1, worker.received.value)
+        self.assertEqual(latency + 1, worker.queue_latency.count)
+
+    def test_queue_latency_skips_bad_publish_times(self):
+        worker = TaskQueueWorker(mock.Mock(), mock.Mock())
+        buckets = list(worker.queue_latency.counts)
+        count = worker.queue_latency.count
+        worker.observe_queue_latency({"published_at": "yesterday"})
+        self.assertEqual(count, worker.queue_latency.count)
+        worker.observe_queue_latency({"published_at": time.time() + 60})
+        self.assertEqual(count + 1, worker.queue_latency.count)
+        self.assertEqual(buckets[0] + 1, worker.queue_latency.counts[0])
+
+    def test_collectors_report_gauges(self):
+        scheduler = SlaveScheduler(None, prefetch=2)
+        scheduler.in_flight = {b"slave-7": 2}
+        self.assertIn('zebrok_slave_in_flight{slave="slave-7"} 2', metrics.render())
+
+
 class TaskRunnerForTesting(BaseTaskRunner):
     def execute(self, task_name, **kwargs):
         print(f"Received task name: {task_name} with kwargs", kwargs)
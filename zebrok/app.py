@@ -1,8 +1,147 @@
+import asyncio
+import atexit
+import contextlib
+import datetime
+import os
+import threading
+import time
+import weakref
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+import zmq.asyncio
+
+from .compression import get_default_compressor
+from .connection import BaseSocketConnection
 from .connection import ConnectionFactory
 from .connection import ConnectionType
 from .connection import SocketType
+from .logging import create_logger
+from .nodes import Endpoint
+from .nodes import get_tcp_address
+from .nodes import NODE_EXPIRY_INTERVALS
+from .protocol import check_key
+from .protocol import encode_message
+from .results import AsyncResult
+from .results import result_backend
+from .serializers import BaseSerializer
+from .serializers import get_default_serializer
+from .utils import get_batch_size
+from .utils import get_discovery_settings
+from .utils import get_high_water_mark
+from .utils import get_publish_window
+from .utils import get_queue_endpoints
 from .utils import get_worker_port_and_host
-from typing import Callable, Dict, Tuple, Any
+from .utils import uses_multiple_nodes
+
+logger = create_logger(__name__)
+
+
+def make_payload(
+    task: Callable[..., Any],
+    kwargs: Dict,
+    result: Optional[AsyncResult] = None,
+    args: Sequence[Any] = (),
+) -> Dict[str, Any]:
+    """
+    Builds the payload of a task invocation stamped with its publish
+    time, asking the worker to send the task's value back when a
+    result is given. Positional arguments are only carried when given.
+    """
+    payload = {"task": task.__name__, "kwargs": kwargs, "published_at": time.time()}
+    if args:
+        payload["args"] = list(args)
+    if result is not None:
+        payload["id"] = result.id
+        payload["reply_to"] = result.reply_to
+    return payload
+
+
+def resolve_eta(
+    countdown: Optional[float] = None,
+    eta: Optional[Union[float, datetime.datetime]] = None,
+) -> Optional[float]:
+    """
+    Time a task is due at, from a countdown in seconds or an eta given
+    as a datetime or as seconds since the epoch
+
+    Returns:
+        float : seconds since the epoch, None when neither is given
+    """
+    if eta is not None:
+        return eta.timestamp() if isinstance(eta, datetime.datetime) else float(eta)
+    if countdown is not None:
+        return time.time() + countdown
+    return None
+
+
+def get_publisher_socket_options() -> Dict[int, Any]:
+    """
+    Options of pooled publisher sockets. When tasks are spread over several
+    worker nodes messages are only queued for nodes whose connection is up,
+    and heartbeats every DISCOVERY_INTERVAL find connections to nodes which
+    went away without closing them, so no tasks are queued for dead nodes
+    """
+    options = {zmq.SNDHWM: get_high_water_mark()}
+    if uses_multiple_nodes():
+        _, _, interval = get_discovery_settings()
+        heartbeat = max(1, int(interval * 1000))
+        options[zmq.IMMEDIATE] = 1
+        options[zmq.HEARTBEAT_IVL] = heartbeat
+        options[zmq.HEARTBEAT_TIMEOUT] = heartbeat * NODE_EXPIRY_INTERVALS
+    return options
+
+
+def reconnect(
+    socket: Any,
+    connected: Tuple[Endpoint, ...],
+    endpoints: Tuple[Endpoint, ...],
+) -> None:
+    """
+    Connects a socket to the endpoints it is not connected to yet and
+    disconnects it from those no longer listed. A push socket spreads
+    messages over every worker it is connected to.
+    """
+    for endpoint in connected:
+        if endpoint not in endpoints:
+            socket.disconnect(get_tcp_address(endpoint))
+    for endpoint in endpoints:
+        if endpoint not in connected:
+            socket.connect(get_tcp_address(endpoint))
+
+
+def pack_batches(
+    task: Callable[..., Any],
+    iterable_of_kwargs: Iterable[Dict],
+    batch_size: Optional[int] = None,
+    results: Optional[List[AsyncResult]] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Groups invocations of a task into lists of at most batch_size task payloads.
+    When a results list is given a result is requested for every invocation
+    and appended to it.
+    """
+    batch_size = batch_size or get_batch_size()
+    batch = []
+    for kwargs in iterable_of_kwargs:
+        result = None
+        if results is not None:
+            result = result_backend.create_result()
+            results.append(result)
+        batch.append(make_payload(task, kwargs, result))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
 class TaskPublisher:
@@ -10,45 +149,800 @@ class TaskPublisher:
     Handles pushing of tasks to task queue
     """
 
-    def __init__(self) -> None:
-        port, host = get_worker_port_and_host()
-        settings = (
-            SocketType.ZmqPush,
-            host,
-            port,
-        )
-        self.connection = ConnectionFactory.create_connection(
-            ConnectionType.zmq_connect,
-            *settings,
-        )
+    def __init__(
+        self,
+        connection: Optional[BaseSocketConnection] = None,
+        serializer: Optional[BaseSerializer] = None,
+    ) -> None:
+        if connection is None:
+            port, host = get_worker_port_and_host()
+            settings = (
+                SocketType.ZmqPush,
+                host,
+                port,
+                None,
+                {zmq.SNDHWM: get_high_water_mark()},
+            )
+            connection = ConnectionFactory.create_connection(
+                ConnectionType.zmq_connect,
+                *settings,
+            )
+        self.connection = connection
         self.socket = self.connection.socket
+        self.serializer = serializer or get_default_serializer()
+        self.compressor = get_default_compressor()
+        self.endpoints: Tuple[Endpoint, ...] = ()
 
     def __enter__(self) -> "TaskPublisher":
         return self
 
+    def update_endpoints(self, endpoints: Tuple[Endpoint, ...]) -> None:
+        """
+        Connects the publisher to exactly the given worker endpoints
+        """
+        reconnect(self.socket, self.endpoints, endpoints)
+        self.endpoints = endpoints
+
     def __exit__(self, type: Any, value: Any, traceback: Any) -> None:
         self.connection.close()
 
     def publish_task(self, task: Callable[..., Any], *args: Tuple, **kwargs: Dict):
-        payload = {"task": task.__name__, "kwargs": kwargs}
-        self.socket.send_json(payload)
+        payload = make_payload(task, kwargs, args=args)
+        self.send(payload)
+        return True
+
+    def publish_task_for_result(
+        self,
+        task: Callable[..., Any],
+        *args: Tuple,
+        **kwargs: Dict,
+    ) -> AsyncResult:
+        """
+        Publishes a task asking the worker to send its value back
+
+        Returns:
+            AsyncResult : resolved with the task's value
+        """
+        result = result_backend.create_result()
+        self.send(make_payload(task, kwargs, result, args))
+        return result
+
+    def publish_task_at(
+        self,
+        task: Callable[..., Any],
+        eta: Optional[float],
+        kwargs: Dict,
+        result: bool = False,
+        args: Sequence[Any] = (),
+        key: Optional[str] = None,
+    ) -> Union[bool, AsyncResult]:
+        """
+        Publishes a task the worker holds until eta, in seconds since the
+        epoch, or runs as it arrives when eta is None. Workers drop the
+        task when one with the same idempotency key arrived before it.
+
+        Returns:
+            AsyncResult : resolved with the task's value when result is set
+        """
+        if key is not None:
+            check_key(key)
+        async_result = result_backend.create_result() if result else None
+        self.send(make_payload(task, kwargs, async_result, args), eta, key)
+        return async_result if async_result is not None else True
+
+    def publish_batch(
+        self,
+        task: Callable[..., Any],
+        iterable_of_kwargs: Iterable[Dict],
+        batch_size: Optional[int] = None,
+    ) -> int:
+        """
+        Packs many invocations of a task into batch messages so a single
+        frame carries up to batch_size tasks
+
+        Returns:
+            int : number of tasks published
+        """
+        published = 0
+        for batch in pack_batches(task, iterable_of_kwargs, batch_size):
+            self.send({"batch": batch})
+            published += len(batch)
+        return published
+
+    def publish_batch_for_results(
+        self,
+        task: Callable[..., Any],
+        iterable_of_kwargs: Iterable[Dict],
+        batch_size: Optional[int] = None,
+    ) -> List[AsyncResult]:
+        """
+        Packs many invocations of a task into batch messages asking
+        the worker to send the value of each of them back
+
+        Returns:
+            list : results in the order of iterable_of_kwargs
+        """
+        results: List[AsyncResult] = []
+        for batch in pack_batches(task, iterable_of_kwargs, batch_size, results):
+            self.send({"batch": batch})
+        return results
+
+    def send(
+        self,
+        payload: Dict[str, Any],
+        eta: Optional[float] = None,
+        key: Optional[str] = None,
+    ) -> None:
+        """
+        Serializes and sends a payload as one multipart message,
+        delayed until eta and carrying an idempotency key when given
+        """
+        frames = encode_message(payload, self.serializer, eta, key, self.compressor)
+        self.socket.send_multipart(frames, copy=False)
+
+
+class TaskBuffer:
+    """
+    Coalesces tasks published from every thread of a process into batch
+    messages, so high rate callers of run pay for one frame per batch
+    rather than one per task.
+
+    A background thread sends the buffered tasks once window seconds passed
+    since the first of them was buffered or max_tasks are buffered, on a
+    publisher of its own. Callers are only blocked while max_tasks are
+    waiting to be sent. flush waits until every task buffered before it
+    was sent, as does leaving the buffer used as a context manager. Tasks
+    the publisher failed to send are logged and make the next flush
+    return False.
+
+    queue = queue the tasks are published to, the default queue if None
+    window = most seconds a task waits for others to be sent with
+    max_tasks = most tasks sent in one message
+    get_publisher = returns the publisher of the calling thread for a queue
+    """
+
+    def __init__(
+        self,
+        queue: Optional[str],
+        window: float,
+        max_tasks: int,
+        get_publisher: Callable[[Optional[str]], TaskPublisher],
+    ) -> None:
+        self.queue = queue
+        self.window = window
+        self.max_tasks = max(1, max_tasks)
+        self.get_publisher = get_publisher
+        self._condition = threading.Condition()
+        self._tasks: List[Dict[str, Any]] = []
+        self._first_buffered_at = 0.0
+        self._buffered = 0
+        self._sent = 0
+        self._failed = 0
+        self._failures_reported = 0
+        self._flush_requested = False
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._send_batches,
+            name="zebrok-buffer",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def __enter__(self) -> "TaskBuffer":
+        return self
+
+    def __exit__(self, type: Any, value: Any, traceback: Any) -> None:
+        self.flush()
+
+    def add(self, payload: Dict[str, Any]) -> bool:
+        """
+        Buffers the payload of a task to be sent with others
+
+        Returns:
+            bool : True once the task is buffered
+        """
+        with self._condition:
+            while len(self._tasks) >= self.max_tasks:
+                self._condition.wait()
+            if not self._tasks:
+                self._first_buffered_at = time.monotonic()
+                self._condition.notify_all()
+            self._tasks.append(payload)
+            self._buffered += 1
+            if len(self._tasks) == self.max_tasks:
+                self._condition.notify_all()
         return True
 
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Sends the buffered tasks without waiting for the window to pass
+
+        Returns:
+            bool : True once every task buffered so far was sent, False
+                when timeout seconds passed first or when tasks could not
+                be sent since the last flush
+        """
+        with self._condition:
+            buffered = self._buffered
+            if self._sent + self._failed < buffered:
+                self._flush_requested = True
+                self._condition.notify_all()
+            done = self._condition.wait_for(
+                lambda: self._sent + self._failed >= buffered,
+                timeout,
+            )
+            failed = self._failed > self._failures_reported
+            self._failures_reported = self._failed
+            return done and not failed
+
+    def close(self) -> None:
+        """
+        Sends the buffered tasks and stops the sending thread
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        """
+        Waits for the window of the first buffered task to pass, for the
+        buffer to fill up or for a flush and takes every buffered task
+
+        Returns:
+            list : tasks to send, empty once the buffer is closed
+        """
+        with self._condition:
+            while not self._tasks and not self._closed:
+                self._condition.wait()
+            while not (
+                self._closed
+                or self._flush_requested
+                or len(self._tasks) >= self.max_tasks
+            ):
+                remaining = self._first_buffered_at + self.window - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            tasks, self._tasks = self._tasks, []
+            self._flush_requested = False
+            self._condition.notify_all()
+            return tasks
+
+    def _send_batches(self) -> None:
+        while True:
+            tasks = self._take_batch()
+            if not tasks:
+                return
+            sent = False
+            try:
+                self.get_publisher(self.queue).send(
+                    tasks[0] if len(tasks) == 1 else {"batch": tasks},
+                )
+                sent = True
+            except Exception:
+                logger.exception(f"could not send {len(tasks)} buffered tasks")
+            with self._condition:
+                if sent:
+                    self._sent += len(tasks)
+                else:
+                    self._failed += len(tasks)
+                self._condition.notify_all()
+
+
+class PublisherPool:
+    """
+    Process wide pool of publishers.
+
+    A single zmq context is shared by the whole process and every thread
+    gets its own socket per queue, since zmq sockets must not be used from
+    several threads at once. A socket is connected to every worker node
+    the queue's tasks are spread over and follows nodes as they come and
+    go. The pool is dropped in a forked child so it never touches sockets
+    owned by the parent.
+    """
+
+    def __init__(self) -> None:
+        self._reset()
+
+    def _reset(self) -> None:
+        """
+        Forgets every context and socket created so far
+        """
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._context: Optional[zmq.Context] = None
+        self._local = threading.local()
+        self._publishers: Dict[
+            Tuple[threading.Thread, Optional[str]],
+            TaskPublisher,
+        ] = {}
+        self._buffers: Dict[Optional[str], TaskBuffer] = {}
+        self.window = get_publish_window()
+
+    def get_buffer(self, queue: Optional[str] = None) -> Optional[TaskBuffer]:
+        """
+        Returns the process wide buffer of a queue, None unless tasks
+        are buffered for window seconds
+        """
+        if not self.window:
+            return None
+        if self._pid != os.getpid():
+            self._reset()
+        buffer = self._buffers.get(queue)
+        if buffer is None:
+            with self._lock:
+                buffer = self._buffers.get(queue)
+                if buffer is None:
+                    buffer = TaskBuffer(
+                        queue,
+                        self.window,
+                        get_batch_size(),
+                        self.get_publisher,
+                    )
+                    self._buffers[queue] = buffer
+        buffer.window = self.window
+        return buffer
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Sends the tasks waiting in every buffer
+
+        Returns:
+            bool : True once all of them were sent, False when some
+                could not be sent or timeout seconds passed first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        flushed = True
+        for buffer in list(self._buffers.values()):
+            remaining = (
+                None if deadline is None else max(0.0, deadline - time.monotonic())
+            )
+            flushed = buffer.flush(remaining) and flushed
+        return flushed
+
+    def get_publisher(self, queue: Optional[str] = None) -> TaskPublisher:
+        """
+        Returns the calling thread's publisher for the configured worker
+        queue, the default queue when queue is None, creating it on first use
+        """
+        if self._pid != os.getpid():
+            self._reset()
+        endpoints = get_queue_endpoints(queue)
+        publishers = getattr(self._local, "publishers", None)
+        if publishers is None:
+            publishers = self._local.publishers = {}
+        publisher = publishers.get(queue)
+        if publisher is None:
+            publisher = publishers[queue] = self._create_publisher(queue, endpoints)
+        elif publisher.endpoints != endpoints:
+            publisher.update_endpoints(endpoints)
+        return publisher
+
+    def _create_publisher(
+        self,
+        queue: Optional[str],
+        endpoints: Tuple[Endpoint, ...],
+    ) -> TaskPublisher:
+        """
+        Connects a new publisher on the shared context
+        """
+        with self._lock:
+            if self._context is None:
+                self._context = zmq.Context()
+            self._discard_dead_threads()
+            host, port = endpoints[0]
+            settings = (
+                SocketType.ZmqPush,
+                host,
+                port,
+                self._context,
+                get_publisher_socket_options(),
+            )
+            connection = ConnectionFactory.create_connection(
+                ConnectionType.zmq_connect,
+                *settings,
+            )
+            publisher = TaskPublisher(connection)
+            publisher.endpoints = endpoints[:1]
+            publisher.update_endpoints(endpoints)
+            self._publishers[(threading.current_thread(), queue)] = publisher
+            return publisher
+
+    def _discard_dead_threads(self) -> None:
+        """
+        Closes publishers whose owning thread has exited, keyed by the
+        thread object since the OS reuses the ident of an exited thread
+        """
+        for key in [key for key in self._publishers if not key[0].is_alive()]:
+            self._publishers.pop(key).connection.close()
+
+    def close(self) -> None:
+        """
+        Sends buffered tasks, closes all pooled sockets
+        and terminates the shared context
+        """
+        if self._pid == os.getpid():
+            for buffer in list(self._buffers.values()):
+                buffer.close()
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+                return
+            for publisher in self._publishers.values():
+                publisher.connection.close()
+            if self._context is not None:
+                self._context.term()
+            self._reset()
+
+
+publisher_pool = PublisherPool()
+atexit.register(publisher_pool.close)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=publisher_pool._reset)
+
+
+@contextlib.contextmanager
+def buffered_publishing(window: float = 0.001) -> Iterator[None]:
+    """
+    Buffers tasks published with run from every thread for at most
+    window seconds while the block runs, so they are sent in batch
+    messages. Every task buffered is sent by the time the block exits,
+    tasks which could not be sent are logged.
+    """
+    previous, publisher_pool.window = publisher_pool.window, window
+    try:
+        yield
+    finally:
+        publisher_pool.window = previous
+        publisher_pool.flush()
+
+
+class AsyncTaskPublisher:
+    """
+    Handles pushing of tasks to task queue from asyncio code
+    without blocking the event loop
+    """
+
+    def __init__(
+        self,
+        connection: Optional[BaseSocketConnection] = None,
+        serializer: Optional[BaseSerializer] = None,
+    ) -> None:
+        if connection is None:
+            port, host = get_worker_port_and_host()
+            settings = (
+                SocketType.ZmqPush,
+                host,
+                port,
+                zmq.asyncio.Context(),
+                {zmq.SNDHWM: get_high_water_mark()},
+            )
+            connection = ConnectionFactory.create_connection(
+                ConnectionType.zmq_connect,
+                *settings,
+            )
+            connection.owns_context = True
+        self.connection = connection
+        self.socket = self.connection.socket
+        self.serializer = serializer or get_default_serializer()
+        self.compressor = get_default_compressor()
+        self.endpoints: Tuple[Endpoint, ...] = ()
+
+    async def __aenter__(self) -> "AsyncTaskPublisher":
+        return self
+
+    def update_endpoints(self, endpoints: Tuple[Endpoint, ...]) -> None:
+        """
+        Connects the publisher to exactly the given worker endpoints
+        """
+        reconnect(self.socket, self.endpoints, endpoints)
+        self.endpoints = endpoints
+
+    async def __aexit__(self, type: Any, value: Any, traceback: Any) -> None:
+        self.connection.close()
+
+    async def publish_task(
+        self,
+        task: Callable[..., Any],
+        *args: Tuple,
+        **kwargs: Dict,
+    ) -> bool:
+        payload = make_payload(task, kwargs, args=args)
+        await self.send(payload)
+        return True
+
+    async def publish_task_for_result(
+        self,
+        task: Callable[..., Any],
+        *args: Tuple,
+        **kwargs: Dict,
+    ) -> AsyncResult:
+        """
+        Publishes a task asking the worker to send its value back
+
+        Returns:
+            AsyncResult : resolved with the task's value
+        """
+        result = result_backend.create_result()
+        await self.send(make_payload(task, kwargs, result, args))
+        return result
+
+    async def publish_task_at(
+        self,
+        task: Callable[..., Any],
+        eta: Optional[float],
+        kwargs: Dict,
+        result: bool = False,
+        args: Sequence[Any] = (),
+        key: Optional[str] = None,
+    ) -> Union[bool, AsyncResult]:
+        """
+        Publishes a task the worker holds until eta, in seconds since the
+        epoch, or runs as it arrives when eta is None. Workers drop the
+        task when one with the same idempotency key arrived before it.
+
+        Returns:
+            AsyncResult : resolved with the task's value when result is set
+        """
+        if key is not None:
+            check_key(key)
+        async_result = result_backend.create_result() if result else None
+        await self.send(make_payload(task, kwargs, async_result, args), eta, key)
+        return async_result if async_result is not None else True
+
+    async def publish_batch(
+        self,
+        task: Callable[..., Any],
+        iterable_of_kwargs: Iterable[Dict],
+        batch_size: Optional[int] = None,
+    ) -> int:
+        """
+        Packs many invocations of a task into batch messages
+
+        Returns:
+            int : number of tasks published
+        """
+        published = 0
+        for batch in pack_batches(task, iterable_of_kwargs, batch_size):
+            await self.send({"batch": batch})
+            published += len(batch)
+        return published
+
+    async def publish_batch_for_results(
+        self,
+        task: Callable[..., Any],
+        iterable_of_kwargs: Iterable[Dict],
+        batch_size: Optional[int] = None,
+    ) -> List[AsyncResult]:
+        """
+        Packs many invocations of a task into batch messages asking
+        the worker to send the value of each of them back
+
+        Returns:
+            list : results in the order of iterable_of_kwargs
+        """
+        results: List[AsyncResult] = []
+        for batch in pack_batches(task, iterable_of_kwargs, batch_size, results):
+            await self.send({"batch": batch})
+        return results
+
+    async def send(
+        self,
+        payload: Dict[str, Any],
+        eta: Optional[float] = None,
+        key: Optional[str] = None,
+    ) -> None:
+        """
+        Serializes and sends a payload as one multipart message,
+        delayed until eta and carrying an idempotency key when given
+        """
+        frames = encode_message(payload, self.serializer, eta, key, self.compressor)
+        await self.socket.send_multipart(frames, copy=False)
+
+
+class AsyncPublisherPool:
+    """
+    Process wide pool of asyncio publishers.
+
+    zmq.asyncio sockets belong to the event loop they are used on, so the
+    pool keeps one publisher per running loop and queue on a shared
+    asyncio context. Like PublisherPool it is dropped after a fork.
+    """
+
+    def __init__(self) -> None:
+        self._reset()
+
+    def _reset(self) -> None:
+        """
+        Forgets every context and socket created so far
+        """
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._context: Optional[zmq.asyncio.Context] = None
+        self._publishers: "weakref.WeakKeyDictionary[Any, Dict]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def get_publisher(self, queue: Optional[str] = None) -> AsyncTaskPublisher:
+        """
+        Returns the running event loop's publisher for the configured
+        worker queue, the default queue when queue is None, creating
+        it on first use
+        """
+        if self._pid != os.getpid():
+            self._reset()
+        endpoints = get_queue_endpoints(queue)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._context is None:
+                self._context = zmq.asyncio.Context()
+            publishers = self._publishers.setdefault(loop, {})
+            publisher = publishers.get(queue)
+            if publisher is None:
+                host, port = endpoints[0]
+                settings = (
+                    SocketType.ZmqPush,
+                    host,
+                    port,
+                    self._context,
+                    get_publisher_socket_options(),
+                )
+                connection = ConnectionFactory.create_connection(
+                    ConnectionType.zmq_connect,
+                    *settings,
+                )
+                publisher = publishers[queue] = AsyncTaskPublisher(connection)
+                publisher.endpoints = endpoints[:1]
+            if publisher.endpoints != endpoints:
+                publisher.update_endpoints(endpoints)
+            return publisher
+
+    def close(self) -> None:
+        """
+        Closes all pooled sockets and terminates the shared context
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+                return
+            for publishers in self._publishers.values():
+                for publisher in publishers.values():
+                    publisher.connection.close()
+            if self._context is not None:
+                self._context.term()
+            self._reset()
+
+
+async_publisher_pool = AsyncPublisherPool()
+atexit.register(async_publisher_pool.close)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=async_publisher_pool._reset)
+
 
 class Task:
     """
-    Extends the methods to be used with task queue
+    Extends the methods to be used with task queue.
+
+    Used as @Task or @Task(result=True), with result set run and
+    arun return an AsyncResult resolved with the task's value and
+    run_many and arun_many return one per invocation.
+
+    Workers retry a failed task up to retries times, waiting
+    retry_backoff seconds before the first retry and twice as long
+    before each next one, and fail it once it runs longer than timeout
+    seconds. Options left unset fall back to the worker's configuration.
+
+    queue names the queue tasks are published to, one of QUEUES,
+    the default queue when unset.
+
+    With cache set workers return the value of an earlier call with the
+    same arguments instead of running the task again, for tasks whose
+    value only depends on their arguments. cache=True caches values as
+    configured by TASK_CACHE_TTL, TASK_CACHE_MAX_ENTRIES and
+    TASK_CACHE_DIR, a BaseResultCache caches them in that cache.
+
+    With PUBLISH_WINDOW set, or inside buffered_publishing, run
+    buffers tasks due at once for up to that many seconds and sends
+    them with others published meanwhile in one batch message.
+
+    run and arun take countdown, seconds to wait before the task
+    runs, or eta, a datetime or timestamp it runs at, and
+    idempotency_key, a key workers drop repeated publishes of the same
+    invocation by, so tasks can not have arguments of those names.
     """
 
-    def __init__(self, arg: Callable[..., Any]) -> None:
+    def __init__(
+        self,
+        arg: Optional[Callable[..., Any]] = None,
+        result: bool = False,
+        retries: Optional[int] = None,
+        retry_backoff: Optional[float] = None,
+        timeout: Optional[float] = None,
+        queue: Optional[str] = None,
+        cache: Any = False,
+    ) -> None:
         self._arg = arg
+        self.result = result
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+        self.queue = queue
+        self.cache = cache
 
     def __call__(self, *args: Tuple, **kwargs: Dict):
-        return self._arg(**kwargs)
+        if self._arg is None:
+            # applied as a decorator with options
+            self._arg = args[0]
+            return self
+        return self._arg(*args, **kwargs)
 
     def get_task_object(self) -> Callable[..., Any]:
         return self._arg
 
-    def run(self, *args: Tuple, **kwargs: Dict) -> bool:
-        with TaskPublisher() as publisher:
-            return publisher.publish_task(self._arg, *args, **kwargs)
+    def run(self, *args: Tuple, **kwargs: Dict) -> Union[bool, AsyncResult]:
+        eta = resolve_eta(kwargs.pop("countdown", None), kwargs.pop("eta", None))
+        key = kwargs.pop("idempotency_key", None)
+        buffer = publisher_pool.get_buffer(self.queue)
+        if buffer is not None and eta is None and key is None:
+            result = result_backend.create_result() if self.result else None
+            buffer.add(make_payload(self._arg, kwargs, result, args))
+            return result if result is not None else True
+        publisher = publisher_pool.get_publisher(self.queue)
+        if eta is not None or key is not None:
+            return publisher.publish_task_at(
+                self._arg,
+                eta,
+                kwargs,
+                self.result,
+                args,
+                key,
+            )
+        if self.result:
+            return publisher.publish_task_for_result(self._arg, *args, **kwargs)
+        return publisher.publish_task(self._arg, *args, **kwargs)
+
+    def run_many(
+        self,
+        iterable_of_kwargs: Iterable[Dict],
+        batch_size: Optional[int] = None,
+    ) -> Union[int, List[AsyncResult]]:
+        publisher = publisher_pool.get_publisher(self.queue)
+        if self.result:
+            return publisher.publish_batch_for_results(
+                self._arg,
+                iterable_of_kwargs,
+                batch_size,
+            )
+        return publisher.publish_batch(self._arg, iterable_of_kwargs, batch_size)
+
+    async def arun(self, *args: Tuple, **kwargs: Dict) -> Union[bool, AsyncResult]:
+        eta = resolve_eta(kwargs.pop("countdown", None), kwargs.pop("eta", None))
+        key = kwargs.pop("idempotency_key", None)
+        publisher = async_publisher_pool.get_publisher(self.queue)
+        if eta is not None or key is not None:
+            return await publisher.publish_task_at(
+                self._arg,
+                eta,
+                kwargs,
+                self.result,
+                args,
+                key,
+            )
+        if self.result:
+            return await publisher.publish_task_for_result(self._arg, *args, **kwargs)
+        return await publisher.publish_task(self._arg, *args, **kwargs)
+
+    async def arun_many(
+        self,
+        iterable_of_kwargs: Iterable[Dict],
+        batch_size: Optional[int] = None,
+    ) -> Union[int, List[AsyncResult]]:
+        publisher = async_publisher_pool.get_publisher(self.queue)
+        if self.result:
+            return await publisher.publish_batch_for_results(
+                self._arg,
+                iterable_of_kwargs,
+                batch_size,
+            )
+        return await publisher.publish_batch(self._arg, iterable_of_kwargs, batch_size)
@@ -0,0 +1,261 @@
+import collections
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC
+from abc import abstractmethod
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from .logging import create_logger
+from .utils import get_task_cache_settings
+
+logger = create_logger(__name__)
+
+# returned by caches for keys they hold no value for, None is a valid value
+MISSING = object()
+# file the shared tier is kept in inside TASK_CACHE_DIR
+CACHE_FILE = "results.sqlite3"
+# writes between evictions of the shared tier
+EVICTION_INTERVAL = 256
+
+
+def make_cache_key(
+    task_name: str,
+    args: Sequence[Any],
+    kwargs: Dict[str, Any],
+) -> Optional[bytes]:
+    """
+    Stable hash of a task invocation, the same in every process. Arguments
+    are hashed as canonical json, pickles of equal values may differ
+    between processes so calls with arguments json can not encode
+    are not cached.
+
+    Returns:
+        bytes : key the invocation's value is cached under, None when
+            the arguments are not json
+    """
+    try:
+        encoded = json.dumps(
+            [task_name, args, kwargs],
+            sort_keys=True,
+            separators=(",", ":"),
+        ).encode()
+    except (TypeError, ValueError):
+        return None
+    return hashlib.blake2b(encoded, digest_size=16).digest()
+
+
+class BaseResultCache(ABC):
+    """
+    All result caches must inherit from this base class
+    """
+
+    @abstractmethod
+    def get(self, key: bytes) -> Any:
+        """
+        Returns the value cached under key, MISSING when there is none
+        """
+
+    @abstractmethod
+    def set(self, key: bytes, value: Any) -> None:
+        """
+        Caches a value under key
+        """
+
+
+class MemoryResultCache(BaseResultCache):
+    """
+    Values cached in the worker's memory for ttl seconds, evicting the
+    least recently used once more than max_entries are cached. Cached
+    values are returned as they are, callers must not change them.
+    """
+
+    def __init__(self, ttl: float, max_entries: int) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "collections.OrderedDict[bytes, Tuple[float, Any]]" = (
+            collections.OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: bytes) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: bytes, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SqliteResultCache(BaseResultCache):
+    """
+    Values pickled into a sqlite database every worker and slave process
+    of a host opening the same file shares. Each thread has a connection
+    of its own. Expired values are never returned and are deleted along
+    with the ones expiring first beyond max_entries every
+    EVICTION_INTERVAL writes. Errors of the database are logged and
+    treated as misses, so a task never fails because of its cache.
+    """
+
+    def __init__(self, path: str, ttl: float, max_entries: int) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Returns the calling thread's connection, opened on first use
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results"
+                " (key BLOB PRIMARY KEY, expires REAL NOT NULL, value BLOB NOT NULL)",
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_expires ON results (expires)",
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key: bytes) -> Any:
+        try:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT value FROM results WHERE key = ? AND expires > ?",
+                    (key, time.time()),
+                )
+                .fetchone()
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"could not read task cache: {e}")
+            return MISSING
+        return MISSING if row is None else pickle.loads(row[0])
+
+    def set(self, key: bytes, value: Any) -> None:
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # values which can not be pickled stay in the memory tier
+            return
+        try:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                (key, time.time() + self.ttl, data),
+            )
+            self._writes += 1
+            if self._writes % EVICTION_INTERVAL == 0:
+                self._evict(connection)
+        except sqlite3.Error as e:
+            logger.warning(f"could not write task cache: {e}")
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        """
+        Deletes expired values and those beyond max_entries
+        """
+        connection.execute("DELETE FROM results WHERE expires <= ?", (time.time(),))
+        connection.execute(
+            "DELETE FROM results WHERE key IN"
+            " (SELECT key FROM results ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+
+class TieredResultCache(BaseResultCache):
+    """
+    A memory cache in front of a cache shared between processes, values
+    found in the shared cache are kept in memory for the next lookups
+    """
+
+    def __init__(self, memory: BaseResultCache, shared: BaseResultCache) -> None:
+        self.memory = memory
+        self.shared = shared
+
+    def get(self, key: bytes) -> Any:
+        value = self.memory.get(key)
+        if value is MISSING:
+            value = self.shared.get(key)
+            if value is not MISSING:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key: bytes, value: Any) -> None:
+        self.memory.set(key, value)
+        self.shared.set(key, value)
+
+
+def create_result_cache(
+    ttl: float,
+    max_entries: int,
+    directory: Optional[str] = None,
+) -> BaseResultCache:
+    """
+    Creates a memory cache, in front of a cache shared by every
+    process of the host when a directory is given
+    """
+    memory = MemoryResultCache(ttl, max_entries)
+    if not directory:
+        return memory
+    os.makedirs(directory, exist_ok=True)
+    shared = SqliteResultCache(os.path.join(directory, CACHE_FILE), ttl, max_entries)
+    return TieredResultCache(memory, shared)
+
+
+_cache: Optional[BaseResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> BaseResultCache:
+    """
+    Returns the process wide cache of tasks declared with cache=True,
+    created from configuration on first use
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = create_result_cache(*get_task_cache_settings())
+    return _cache
+
+
+def _forget_cache_in_child() -> None:
+    """
+    A forked child starts a cache of its own, the shared tier
+    is still shared through its file
+    """
+    global _cache, _cache_lock
+    _cache = None
+    _cache_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_cache_in_child)
@@ -0,0 +1,207 @@
+import zlib
+from abc import ABC
+from abc import abstractmethod
+from typing import Any
+from typing import Dict
+from typing import Optional
+
+from .exceptions import ZebrokNotImplementedError
+from .exceptions import ZebrokSerializationError
+from .utils import get_compression_max_size
+from .utils import get_compression_settings
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - optional dependency
+    lz4_frame = None
+
+
+class BaseCompressor(ABC):
+    """
+    All compressor implementations must inherit from this base class
+
+    name = name used to select the compressor from configuration
+    flag = header flag set on messages compressed with it
+    threshold = fewest bytes of payload frames compressed
+    max_size = most bytes a message may decompress to, COMPRESSION_MAX_SIZE if None
+    """
+
+    name: str = ""
+    flag: int = 0
+
+    def __init__(self, threshold: int = 0, max_size: Optional[int] = None) -> None:
+        self.threshold = threshold
+        self.max_size = get_compression_max_size() if max_size is None else max_size
+
+    @abstractmethod
+    def compress(self, data: Any) -> bytes:
+        """
+        Compresses a frame of a message
+
+        Parameters:
+            data (bytes): content of the frame
+        """
+        raise ZebrokNotImplementedError
+
+    @abstractmethod
+    def decompress(self, data: Any, max_size: int) -> bytes:
+        """
+        Restores a frame compressed with compress, raising
+        ZebrokSerializationError for frames restored to more than
+        max_size bytes before more are produced
+
+        Parameters:
+            data (bytes): content of the compressed frame
+            max_size (int): most bytes the frame may be restored to
+        """
+        raise ZebrokNotImplementedError
+
+
+def check_decompressed_size(size: int, max_size: int) -> None:
+    """
+    Raises ZebrokSerializationError for frames decompressed to more than max_size bytes
+    """
+    if size > max_size:
+        raise ZebrokSerializationError(
+            f"compressed message exceeds {max_size} bytes once decompressed",
+        )
+
+
+class ZlibCompressor(BaseCompressor):
+    """
+    Compresses with zlib from the standard library, at the fastest
+    level since messages are compressed on every publish
+    """
+
+    name = "zlib"
+    flag = 0x04
+
+    def compress(self, data: Any) -> bytes:
+        return zlib.compress(data, 1)
+
+    def decompress(self, data: Any, max_size: int) -> bytes:
+        decompressor = zlib.decompressobj()
+        decompressed = decompressor.decompress(data, max_size + 1)
+        check_decompressed_size(len(decompressed), max_size)
+        if not decompressor.eof:
+            raise ZebrokSerializationError("compressed frame is truncated")
+        return decompressed
+
+
+class Lz4Compressor(BaseCompressor):
+    """
+    Compresses with lz4 frames, the fastest and least compact
+    """
+
+    name = "lz4"
+    flag = 0x08
+
+    def __init__(self, threshold: int = 0, max_size: Optional[int] = None) -> None:
+        if lz4_frame is None:
+            raise ZebrokSerializationError(
+                "lz4 compression requires the lz4 package to be installed",
+            )
+        super().__init__(threshold, max_size)
+
+    def compress(self, data: Any) -> bytes:
+        return lz4_frame.compress(data)
+
+    def decompress(self, data: Any, max_size: int) -> bytes:
+        decompressor = lz4_frame.LZ4FrameDecompressor()
+        decompressed = decompressor.decompress(data, max_size + 1)
+        check_decompressed_size(len(decompressed), max_size)
+        if not decompressor.eof:
+            raise ZebrokSerializationError("compressed frame is truncated")
+        return decompressed
+
+
+class ZstdCompressor(BaseCompressor):
+    """
+    Compresses with zstandard, compact at speeds close to lz4. Its
+    (de)compressor objects must not be shared between threads, so
+    one is made per frame, which costs little next to a large frame.
+    """
+
+    name = "zstd"
+    flag = 0x10
+
+    def __init__(self, threshold: int = 0, max_size: Optional[int] = None) -> None:
+        if zstandard is None:
+            raise ZebrokSerializationError(
+                "zstd compression requires the zstandard package to be installed",
+            )
+        super().__init__(threshold, max_size)
+
+    def compress(self, data: Any) -> bytes:
+        return zstandard.ZstdCompressor().compress(data)
+
+    def decompress(self, data: Any, max_size: int) -> bytes:
+        # frames tell their size unless it was unknown when compressing,
+        # output is then limited to one byte more than allowed
+        check_decompressed_size(zstandard.frame_content_size(data), max_size)
+        decompressed = zstandard.ZstdDecompressor().decompress(
+            data,
+            max_output_size=max_size + 1,
+        )
+        check_decompressed_size(len(decompressed), max_size)
+        return decompressed
+
+
+# from the most to the least preferred when compression is auto
+COMPRESSORS = (ZstdCompressor, Lz4Compressor, ZlibCompressor)
+# header flags of every compressor
+COMPRESSION_FLAGS = ZstdCompressor.flag | Lz4Compressor.flag | ZlibCompressor.flag
+
+_decompressors: Dict[int, BaseCompressor] = {}
+
+
+def create_compressor(name: str, threshold: int = 0) -> Optional[BaseCompressor]:
+    """
+    Creates a compressor by name, auto selecting the most preferred one
+    whose package is installed, zlib at the least
+
+    Returns:
+        BaseCompressor : created compressor, None when name is empty or none
+    """
+    name = name.strip().lower()
+    if name in ("", "none"):
+        return None
+    for compressor_class in COMPRESSORS:
+        if name == compressor_class.name:
+            return compressor_class(threshold)
+        if name == "auto":
+            try:
+                return compressor_class(threshold)
+            except ZebrokSerializationError:
+                continue
+    raise ZebrokSerializationError(f"Unknown compression: {name}")
+
+
+def get_compressor_by_flags(flags: int) -> BaseCompressor:
+    """
+    Returns a cached compressor able to restore a message
+    compressed as its header flags tell
+    """
+    flag = flags & COMPRESSION_FLAGS
+    compressor = _decompressors.get(flag)
+    if compressor is None:
+        for compressor_class in COMPRESSORS:
+            if compressor_class.flag == flag:
+                compressor = _decompressors[flag] = compressor_class()
+                break
+        else:
+            raise ZebrokSerializationError(f"Unknown compression flags: {flags:#x}")
+    return compressor
+
+
+def get_default_compressor() -> Optional[BaseCompressor]:
+    """
+    Creates the compressor selected in configuration,
+    None when messages are not compressed
+    """
+    return create_compressor(*get_compression_settings())
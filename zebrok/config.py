@@ -3,3 +3,44 @@
 WORKER_PORT = 5690
 WORKER_HOST = "localhost"
 TASK_TYPE = "zebrok.app.Task"
+BATCH_SIZE = 1000
+PUBLISH_WINDOW = 0
+SERIALIZER = "json"
+ACCEPTED_SERIALIZERS = "json,msgpack"
+COMPRESSION = ""
+COMPRESSION_THRESHOLD = 65536
+COMPRESSION_MAX_SIZE = 268435456
+SLAVE_PREFETCH = 2
+EXECUTION_MODE = "threads"
+ASYNC_CONCURRENCY = 100
+TASK_EXECUTOR = "inline"
+MAX_IN_FLIGHT = 4
+HIGH_WATER_MARK = 1000
+SLAVE_TRANSPORT = "auto"
+RESULT_HOST = "localhost"
+RESULT_TTL = 3600
+RESULT_MAX_PENDING = 10000
+TASK_MODULES = "tasks"
+TASK_MANIFEST = ""
+LOG_LEVEL = "INFO"
+LOG_FILE = ""
+LOG_AGGREGATE_INTERVAL = 1.0
+METRICS_HOST = "localhost"
+METRICS_PORT = 0
+JOURNAL_DIR = ""
+JOURNAL_SEGMENT_SIZE = 67108864
+JOURNAL_FSYNC_INTERVAL = 0.05
+TASK_RETRIES = 0
+TASK_RETRY_BACKOFF = 1.0
+TASK_RETRY_BACKOFF_MAX = 60.0
+TASK_TIMEOUT = 0
+QUEUES = ""
+WORKER_ENDPOINTS = ""
+DISCOVERY_PORT = 0
+DISCOVERY_ADDRESS = "255.255.255.255"
+DISCOVERY_INTERVAL = 1.0
+IDEMPOTENCY_TTL = 3600
+IDEMPOTENCY_MAX_KEYS = 100000
+TASK_CACHE_TTL = 300
+TASK_CACHE_MAX_ENTRIES = 10000
+TASK_CACHE_DIR = ""
@@ -1,6 +1,10 @@
 import enum
+import os
 import socket
+import tempfile
 from typing import Any
+from typing import Dict
+from typing import Optional
 
 import zmq
 
@@ -14,6 +18,20 @@ class SocketType(enum.Enum):
 
     ZmqPull = zmq.PULL
     ZmqPush = zmq.PUSH
+    ZmqRouter = zmq.ROUTER
+    ZmqDealer = zmq.DEALER
+
+
+class Transport:
+    """
+    Transport a connection's socket address is built for. tcp works
+    across hosts, ipc between processes on one host and inproc between
+    threads sharing a zmq context.
+    """
+
+    tcp: str = "tcp"
+    ipc: str = "ipc"
+    inproc: str = "inproc"
 
 
 def convert_hostname_to_ip(hostname: str) -> str:
@@ -35,15 +53,24 @@ class BaseSocketConnection:
 
     socket_type = type of connection created by factory
     host = name of the host on which connection is being created
-    port = socket connection port
-    socket_address = tcp address for establishing the connection
+    port = socket connection port, also names ipc and inproc endpoints
+    transport = transport used by the connection (tcp, ipc or inproc)
+    socket_address = address for establishing the connection
     context = current connection context
     socket =  created socket connectio
     """
 
-    def __init__(self, socket_type: Any, host: str, port: str, context: Any) -> None:
+    def __init__(
+        self,
+        socket_type: Any,
+        host: str,
+        port: str,
+        context: Any,
+        transport: str = Transport.tcp,
+    ) -> None:
         self.socket_type = socket_type.value
-        self.host = convert_hostname_to_ip(host)
+        self.transport = transport
+        self.host = convert_hostname_to_ip(host) if transport == Transport.tcp else host
         self.port = int(port)
         self.socket_address = self.get_socket_address()
         self.context = context
@@ -55,12 +82,27 @@ class BaseSocketConnection:
         """
         raise ZebrokNotImplementedError
 
+    def set_socket_options(self, socket_options: Optional[Dict[int, Any]]) -> None:
+        """
+        Applies zmq socket options, must be called before binding or connecting
+
+        Parameters:
+            socket_options (dict): zmq option mapped to its value
+        """
+        for option, value in (socket_options or {}).items():
+            self.socket.setsockopt(option, value)
+
     def get_socket_address(self) -> str:
         """
-        Constructs tcp adddress to be connected to
+        Constructs adddress to be connected to for the connection's transport
         Returns:
             (str): constructed socket address using host and port
         """
+        if self.transport == Transport.ipc:
+            path = os.path.join(tempfile.gettempdir(), f"zebrok-{self.port}.ipc")
+            return f"ipc://{path}"
+        if self.transport == Transport.inproc:
+            return f"inproc://zebrok-{self.port}"
         return f"tcp://{self.host}:{str(self.port)}"
 
 
@@ -75,6 +117,8 @@ class ZmqBindConnection(BaseSocketConnection):
         host: str,
         port: str,
         context: Any = None,
+        socket_options: Optional[Dict[int, Any]] = None,
+        transport: str = Transport.tcp,
     ) -> None:
         """
         Initializes Zmq Bind connection
@@ -83,16 +127,21 @@ class ZmqBindConnection(BaseSocketConnection):
             host (str): The host ip to use
             port (int): Port number to connect or listen on
             context (object): Zmq specific contexte object
+            socket_options (dict): Zmq socket options to set before use
+            transport (str): Transport to bind or connect over
         """
+        self.owns_context = not context
         if not context:
             context = zmq.Context()
-        super().__init__(socket_type, host, port, context)
+        super().__init__(socket_type, host, port, context, transport)
         self.socket = self.context.socket(self.socket_type)
+        self.set_socket_options(socket_options)
         self.socket.bind(self.socket_address)
 
     def close(self) -> None:
         self.socket.close()
-        self.context.term()
+        if self.owns_context:
+            self.context.term()
 
 
 class ZmqConnectTypeConnection(BaseSocketConnection):
@@ -106,6 +155,8 @@ class ZmqConnectTypeConnection(BaseSocketConnection):
         host: str,
         port: str,
         context: Any = None,
+        socket_options: Optional[Dict[int, Any]] = None,
+        transport: str = Transport.tcp,
     ) -> None:
         """
         Initializes Zmq Connect Type connection
@@ -114,16 +165,21 @@ class ZmqConnectTypeConnection(BaseSocketConnection):
             host (str): The host ip to use
             port (int): Port number to connect or listen on
             context (object): Zmq specific contexte object
+            socket_options (dict): Zmq socket options to set before use
+            transport (str): Transport to bind or connect over
         """
+        self.owns_context = not context
         if not context:
             context = zmq.Context()
-        super().__init__(socket_type, host, port, context)
+        super().__init__(socket_type, host, port, context, transport)
         self.socket = self.context.socket(self.socket_type)
+        self.set_socket_options(socket_options)
         self.socket.connect(self.socket_address)
 
     def close(self) -> None:
         self.socket.close()
-        self.context.term()
+        if self.owns_context:
+            self.context.term()
 
 
 class ConnectionType:
@@ -142,17 +198,29 @@ class ConnectionFactory:
     """
 
     @staticmethod
-    def create_connection(connection_type: str, *args: Any) -> BaseSocketConnection:
+    def create_connection(
+        connection_type: str,
+        *args: Any,
+        transport: str = Transport.tcp,
+    ) -> BaseSocketConnection:
         """
         Creates sockect connections
 
         parameters:
             connection_type (str): Type of connection to create
+            transport (str): Transport to bind or connect over
 
         Returns:
             BaseSocketConnection : created socket connection
         """
-        connection = globals()[connection_type](*args)
+        assert transport in (
+            Transport.tcp,
+            Transport.ipc,
+            Transport.inproc,
+        ), f"unknown transport: {transport}"
+        if transport == Transport.ipc:
+            assert zmq.has("ipc"), "ipc transport is not supported on this platform"
+        connection = globals()[connection_type](*args, transport=transport)
         assert issubclass(
             type(connection),
             BaseSocketConnection,
@@ -1,19 +1,219 @@
 import importlib
+import json
+import os
+import pkgutil
+import sys
+import threading
+from types import ModuleType
 from typing import Any
 from typing import Callable
+from typing import Dict
+from typing import Iterator
 from typing import Optional
+from typing import Sequence
 
 from zebrok.config import TASK_TYPE
 from zebrok.logging import create_logger
+from zebrok.utils import get_task_manifest
+from zebrok.utils import get_task_modules
 
 logger = create_logger(__name__)
 
 
-def get_import_module() -> Any:
+def get_import_module(module_name: str = "tasks") -> Any:
     """
     Used for dynamic import of tasks
     """
-    return importlib.import_module("tasks", package="zebrok")
+    return importlib.import_module(module_name, package="zebrok")
+
+
+def get_task_type() -> type:
+    """
+    Resolves the class configured as TASK_TYPE which tasks are instances of
+    """
+    module_name, _, class_name = TASK_TYPE.rpartition(".")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def iter_task_modules(module_names: Sequence[str]) -> Iterator[ModuleType]:
+    """
+    Imports task modules, packages are walked and every submodule imported
+    """
+    for module_name in module_names:
+        module = get_import_module(module_name)
+        yield module
+        if hasattr(module, "__path__"):
+            for info in pkgutil.walk_packages(module.__path__, f"{module.__name__}."):
+                yield get_import_module(info.name)
+
+
+def _get_mtime(path: str) -> float:
+    """
+    Modification time of a module's file, 0 when it cannot be read
+    """
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0.0
+
+
+class TaskIndex:
+    """
+    Maps task names to the tasks declared in task modules.
+
+    The index is built by importing the modules once, looking tasks up is
+    then a dictionary hit. A lookup missing the index rebuilds it when a
+    module's file changed since it was indexed, reloading the module,
+    and refresh rebuilds it explicitly.
+
+    module_names = modules or packages to index, TASK_MODULES if None
+    locations = module:attribute each indexed task was found at
+    """
+
+    def __init__(self, module_names: Optional[Sequence[str]] = None) -> None:
+        self.module_names = module_names
+        self.locations: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._tasks: Optional[Dict[str, Any]] = None
+        self._mtimes: Dict[str, float] = {}
+
+    @property
+    def tasks(self) -> Dict[str, Any]:
+        """
+        Indexed tasks keyed by name, built on first use
+        """
+        tasks = self._tasks
+        if tasks is None:
+            tasks = self.refresh()
+        return tasks
+
+    def get(self, task_name: str) -> Optional[Any]:
+        """
+        Finds an indexed task by name
+        """
+        task = self.tasks.get(task_name)
+        if task is None and self.is_stale():
+            task = self.refresh().get(task_name)
+        return task
+
+    def is_stale(self) -> bool:
+        """
+        Checks if any indexed module's file changed since it was indexed
+        """
+        return any(_get_mtime(path) != mtime for path, mtime in self._mtimes.items())
+
+    def refresh(self) -> Dict[str, Any]:
+        """
+        Imports task modules and rebuilds the index,
+        modules whose file changed are reloaded
+        """
+        with self._lock:
+            task_type = get_task_type()
+            tasks: Dict[str, Any] = {}
+            locations: Dict[str, str] = {}
+            mtimes: Dict[str, float] = {}
+            for module in iter_task_modules(self.module_names or get_task_modules()):
+                path = getattr(module, "__file__", None)
+                if path:
+                    mtime = _get_mtime(path)
+                    if self._mtimes.get(path, mtime) != mtime:
+                        module = importlib.reload(module)
+                    mtimes[path] = mtime
+                for attribute_name, attribute in list(vars(module).items()):
+                    if isinstance(attribute, task_type):
+                        task_name = attribute.get_task_object().__name__
+                        tasks.setdefault(task_name, attribute)
+                        locations.setdefault(
+                            task_name,
+                            f"{module.__name__}:{attribute_name}",
+                        )
+            self._tasks = tasks
+            self.locations = locations
+            self._mtimes = mtimes
+            return tasks
+
+
+class ManifestTaskIndex(TaskIndex):
+    """
+    Task index read from a manifest file mapping task names to
+    module:attribute, as written by write_task_manifest.
+
+    Reading the manifest imports nothing, so workers bind their sockets
+    straight away and a task's module is only imported the first time
+    the task is looked up. The manifest is read again when a lookup
+    misses it after the file changed.
+
+    path = manifest file
+    """
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+
+    def get(self, task_name: str) -> Optional[Any]:
+        """
+        Finds a task by name, importing its module on first use
+        """
+        task = self.tasks.get(task_name)
+        if task is not None:
+            return task
+        if task_name not in self.locations and self.is_stale():
+            self.refresh()
+        location = self.locations.get(task_name)
+        if location is None:
+            return None
+        module_name, _, attribute_name = location.partition(":")
+        task = getattr(get_import_module(module_name), attribute_name, None)
+        if task is not None:
+            self.tasks[task_name] = task
+        return task
+
+    def refresh(self) -> Dict[str, Any]:
+        """
+        Reads the manifest and forgets tasks imported so far
+        """
+        with self._lock:
+            with open(self.path) as f:
+                self.locations = json.load(f)
+            self._mtimes = {self.path: _get_mtime(self.path)}
+            self._tasks = {}
+            return self._tasks
+
+
+task_index = TaskIndex()
+_manifest_indexes: Dict[str, ManifestTaskIndex] = {}
+
+
+def get_task_index() -> TaskIndex:
+    """
+    Returns the manifest index when TASK_MANIFEST is configured,
+    else the index of the configured task modules
+    """
+    path = get_task_manifest()
+    if not path:
+        return task_index
+    index = _manifest_indexes.get(path)
+    if index is None:
+        index = _manifest_indexes[path] = ManifestTaskIndex(path)
+    return index
+
+
+def write_task_manifest(path: str, module_names: Optional[Sequence[str]] = None) -> int:
+    """
+    Indexes task modules and writes the manifest read by ManifestTaskIndex
+
+    Parameters:
+        path (str): manifest file to write
+        module_names (list): modules or packages to index, TASK_MODULES if None
+
+    Returns:
+        int : number of tasks written
+    """
+    index = TaskIndex(module_names)
+    index.refresh()
+    with open(path, "w") as f:
+        json.dump(index.locations, f, indent=2, sort_keys=True)
+    return len(index.locations)
 
 
 def get_discovered_task_by_name(task_name: str) -> Optional[Callable[..., Any]]:
@@ -22,21 +222,25 @@ def get_discovered_task_by_name(task_name: str) -> Optional[Callable[..., Any]]:
     """
     task = None
     try:
-        tasks = get_import_module()
-        task = getattr(tasks, task_name)
-    except (ModuleNotFoundError, AttributeError) as e:
+        task = get_task_index().get(task_name)
+    except ModuleNotFoundError as e:
         logger.error(e)
+    if task is None:
+        logger.error(f"task not discovered: {task_name}")
     return task
 
 
-# TODO: Improve this process to be efficient
 def discover_tasks() -> int:
-    tasks_module = get_import_module()
-    task_names = []
-    for task_name in dir(tasks_module):
-        task = getattr(tasks_module, task_name)
-        if str(task).startswith(f"<{TASK_TYPE}"):
-            task_names.append(f"\n  * {task_name} ")
+    """
+    Indexes tasks declared in the configured task modules, or reads
+    the configured manifest without importing them, and logs their names
+
+    Returns:
+        int : number of tasks discovered
+    """
+    index = get_task_index()
+    index.refresh()
+    task_names = [f"\n  * {task_name} " for task_name in sorted(index.locations)]
     no_of_tasks = len(task_names)
     line_separator = "\n====================================================="
     heading = f"** {no_of_tasks} ZEBROK TASKS DISCOVERED! {line_separator}"
@@ -44,3 +248,9 @@ def discover_tasks() -> int:
     task_names_str = "".join([heading] + task_names + [line_separator])
     logger.info(task_names_str)
     return no_of_tasks
+
+
+if __name__ == "__main__":
+    # python -m zebrok.discovery <manifest> [module ...]
+    number_of_tasks = write_task_manifest(sys.argv[1], sys.argv[2:] or None)
+    print(f"wrote {number_of_tasks} tasks to {sys.argv[1]}")
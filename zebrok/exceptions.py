@@ -5,3 +5,79 @@ class ZebrokNotImplementedError(NotImplementedError):
     """
 
     pass
+
+
+class ZebrokSerializationError(Exception):
+    """
+    Custom exception to be thrown when a message
+    cannot be serialized or deserialized
+    """
+
+    pass
+
+
+class ZebrokMalformedMessageError(ZebrokSerializationError):
+    """
+    Custom exception to be thrown when a decoded message
+    or one of its tasks is not of the expected shape
+    """
+
+    pass
+
+
+class ZebrokTaskNotFoundError(Exception):
+    """
+    Custom exception to be thrown when a task is
+    neither registered nor discovered
+    """
+
+    pass
+
+
+class ZebrokTaskError(Exception):
+    """
+    Custom exception to be thrown when waiting on the
+    result of a task which failed on the worker
+    """
+
+    pass
+
+
+class ZebrokInvalidArgumentsError(TypeError):
+    """
+    Custom exception to be thrown when a task is called
+    with arguments which do not match its signature
+    """
+
+    pass
+
+
+class ZebrokTaskTimeoutError(Exception):
+    """
+    Custom exception to be thrown when a task
+    runs for longer than its timeout
+    """
+
+    pass
+
+
+class ZebrokTaskRetry(Exception):
+    """
+    Custom exception to be thrown by a task runner leaving the
+    retry of a failed task to its worker, which runs the given
+    attempt of the task once delay seconds have passed
+    """
+
+    def __init__(self, task_name: str, attempt: int, delay: float) -> None:
+        super().__init__(f"task {task_name} retried in {delay:.2f}s")
+        self.attempt = attempt
+        self.delay = delay
+
+
+class ZebrokResultExpiredError(Exception):
+    """
+    Custom exception to be thrown when no result arrives
+    for a task before it is evicted from the result backend
+    """
+
+    pass
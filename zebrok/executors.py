@@ -0,0 +1,342 @@
+import asyncio
+import concurrent.futures
+import os
+import queue
+import threading
+from abc import ABC
+from abc import abstractmethod
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+from .exceptions import ZebrokNotImplementedError
+from .logging import create_logger
+from .supervisor import get_process_context
+from .task_runner import BaseTaskRunner
+
+logger = create_logger(__name__)
+
+_process_runner: Optional[BaseTaskRunner] = None
+
+
+def _install_process_runner(runner: BaseTaskRunner) -> None:
+    """
+    Keeps the runner inherited by a forked pool process
+    """
+    global _process_runner
+    _process_runner = runner
+
+
+def _execute_in_process(
+    task_name: str,
+    args: Sequence[Any],
+    kwargs: Dict,
+    returns_value: bool,
+) -> Any:
+    """
+    Executes a task with the runner installed in a pool process, the
+    task's value is only sent back to the worker when returns_value is set
+    """
+    assert _process_runner is not None, "no runner installed in process"
+    if returns_value:
+        return _process_runner.call(task_name, *args, **kwargs)
+    return _process_runner.execute(task_name, *args, **kwargs)
+
+
+class BaseTaskExecutor(ABC):
+    """
+    All task executors must inherit from this base class.
+
+    An executor runs tasks off the worker's receive loop with at most
+    max_in_flight tasks at once. submit blocks while every slot is taken,
+    so the worker stops reading and messages back up into zmq's queues
+    up to their high water mark. Completion tokens are collected so the
+    receive loop can report them, with a pipe signalling new completions
+    which can be registered with a zmq.Poller.
+
+    runner = runner used to execute tasks
+    max_in_flight = maximum number of tasks executing at once
+    """
+
+    def __init__(self, runner: BaseTaskRunner, max_in_flight: int) -> None:
+        self.runner = runner
+        self.max_in_flight = max(1, max_in_flight)
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+        self._completed: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._read_fd, self._write_fd = os.pipe()
+        os.set_blocking(self._read_fd, False)
+        os.set_blocking(self._write_fd, False)
+
+    @property
+    def fileno(self) -> int:
+        """
+        File descriptor readable whenever tasks submitted with a token complete
+        """
+        return self._read_fd
+
+    def has_capacity(self) -> bool:
+        """
+        Checks if a task can be submitted without blocking
+        """
+        return self.in_flight < self.max_in_flight
+
+    def submit(
+        self,
+        task_name: str,
+        kwargs: Dict,
+        token: Any = None,
+        callback: Optional[Callable[[concurrent.futures.Future], Any]] = None,
+        args: Sequence[Any] = (),
+    ) -> None:
+        """
+        Schedules a task, blocking until a slot is free
+
+        Parameters:
+            task_name (str): name of task
+            kwargs (dict): keyword arguments of the task
+            token (object): reported by pop_completed once the task is done
+            callback (callable): called with the future resolved with the
+                task's value, tasks without callback resolve with execute's outcome
+            args (sequence): positional arguments of the task
+        """
+        with self._slot_freed:
+            while self.in_flight >= self.max_in_flight:
+                self._slot_freed.wait()
+            self.in_flight += 1
+        try:
+            future = self._submit(task_name, args, kwargs, callback is not None)
+        except Exception:
+            with self._slot_freed:
+                self.in_flight -= 1
+                self._slot_freed.notify()
+            raise
+        future.add_done_callback(lambda future: self._on_done(future, token, callback))
+
+    def _on_done(
+        self,
+        future: concurrent.futures.Future,
+        token: Any,
+        callback: Optional[Callable[[concurrent.futures.Future], Any]],
+    ) -> None:
+        """
+        Frees the task's slot and records its completion
+        """
+        if future.exception() is not None:
+            logger.error(f"task failed: {future.exception()!r}")
+        if callback is not None:
+            try:
+                callback(future)
+            except Exception:
+                logger.exception("task callback failed")
+        if token is not None:
+            self._completed.put(token)
+            try:
+                os.write(self._write_fd, b"\0")
+            except BlockingIOError:
+                pass
+        with self._slot_freed:
+            self.in_flight -= 1
+            self._slot_freed.notify_all()
+
+    def pop_completed(self) -> List[Any]:
+        """
+        Returns tokens of tasks completed since the last call
+        """
+        try:
+            while os.read(self._read_fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        tokens = []
+        while not self._completed.empty():
+            tokens.append(self._completed.get())
+        return tokens
+
+    def join(self) -> None:
+        """
+        Blocks until no task is in flight
+        """
+        with self._slot_freed:
+            while self.in_flight:
+                self._slot_freed.wait()
+
+    @abstractmethod
+    def _submit(
+        self,
+        task_name: str,
+        args: Sequence[Any],
+        kwargs: Dict,
+        returns_value: bool,
+    ) -> concurrent.futures.Future:
+        """
+        Starts executing a task
+
+        Returns:
+            Future : resolved once the task is done, with the task's value
+                when returns_value is set
+        """
+        raise ZebrokNotImplementedError
+
+    def shutdown(self) -> None:
+        """
+        Waits for running tasks then releases the executor's resources
+        """
+        os.close(self._read_fd)
+        os.close(self._write_fd)
+
+
+class ThreadTaskExecutor(BaseTaskExecutor):
+    """
+    Executes tasks on a pool of threads, suited to I/O bound tasks
+    """
+
+    def __init__(self, runner: BaseTaskRunner, max_in_flight: int) -> None:
+        super().__init__(runner, max_in_flight)
+        self._pool = concurrent.futures.ThreadPoolExecutor(self.max_in_flight)
+
+    def _submit(
+        self,
+        task_name: str,
+        args: Sequence[Any],
+        kwargs: Dict,
+        returns_value: bool,
+    ) -> concurrent.futures.Future:
+        execute = self.runner.call if returns_value else self.runner.execute
+        return self._pool.submit(execute, task_name, *args, **kwargs)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown()
+        super().shutdown()
+
+
+class ProcessTaskExecutor(BaseTaskExecutor):
+    """
+    Executes tasks on a pool of processes, suited to CPU bound tasks.
+    Pool processes inherit the runner when forked, only task names
+    and arguments are pickled.
+    """
+
+    def __init__(self, runner: BaseTaskRunner, max_in_flight: int) -> None:
+        super().__init__(runner, max_in_flight)
+        self._pool = concurrent.futures.ProcessPoolExecutor(
+            self.max_in_flight,
+            mp_context=get_process_context(),
+            initializer=_install_process_runner,
+            initargs=(runner,),
+        )
+
+    def _submit(
+        self,
+        task_name: str,
+        args: Sequence[Any],
+        kwargs: Dict,
+        returns_value: bool,
+    ) -> concurrent.futures.Future:
+        return self._pool.submit(
+            _execute_in_process,
+            task_name,
+            args,
+            kwargs,
+            returns_value,
+        )
+
+    def shutdown(self) -> None:
+        self._pool.shutdown()
+        super().shutdown()
+
+
+class AsyncioTaskExecutor(BaseTaskExecutor):
+    """
+    Executes tasks with the runner's aexecute on an event loop
+    running in a background thread, suited to async def tasks
+    """
+
+    def __init__(self, runner: BaseTaskRunner, max_in_flight: int) -> None:
+        super().__init__(runner, max_in_flight)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever,
+            name="zebrok-asyncio-executor",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _submit(
+        self,
+        task_name: str,
+        args: Sequence[Any],
+        kwargs: Dict,
+        returns_value: bool,
+    ) -> concurrent.futures.Future:
+        execute = self.runner.acall if returns_value else self.runner.aexecute
+        coroutine = execute(task_name, *args, **kwargs)
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def shutdown(self) -> None:
+        self.join()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        super().shutdown()
+
+
+class ExecutorType:
+    """
+    ExecutorFactory dependent class for determining
+    which executor to create
+    """
+
+    threads: str = ThreadTaskExecutor.__name__
+    processes: str = ProcessTaskExecutor.__name__
+    asyncio: str = AsyncioTaskExecutor.__name__
+
+
+class ExecutorFactory:
+    """
+    Factory class for instantiating task executors
+    """
+
+    @staticmethod
+    def create_executor(
+        executor_type: str,
+        runner: BaseTaskRunner,
+        max_in_flight: int,
+    ) -> BaseTaskExecutor:
+        """
+        Creates task executors
+
+        parameters:
+            executor_type (str): type of executor to create
+            runner (BaseTaskRunner): runner used to execute tasks
+            max_in_flight (int): maximum number of tasks executing at once
+
+        Returns:
+            BaseTaskExecutor : created executor
+        """
+        executor = globals()[executor_type](runner, max_in_flight)
+        assert issubclass(
+            type(executor),
+            BaseTaskExecutor,
+        ), f"{type(executor)} must inherit from {str(BaseTaskExecutor)}"
+        return executor
+
+
+def create_task_executor(
+    name: str,
+    runner: BaseTaskRunner,
+    max_in_flight: int,
+) -> Optional[BaseTaskExecutor]:
+    """
+    Creates the executor configured by name (inline, threads, processes
+    or asyncio). Inline execution needs no executor and returns None.
+    """
+    if name == "inline":
+        return None
+    executor_type = getattr(ExecutorType, name, None)
+    assert executor_type is not None, f"unknown task executor: {name}"
+    return ExecutorFactory.create_executor(executor_type, runner, max_in_flight)
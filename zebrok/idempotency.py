@@ -0,0 +1,56 @@
+import collections
+import time
+from typing import Optional
+
+
+class IdempotencyCache:
+    """
+    Idempotency keys of the messages a worker received recently, used
+    to drop duplicates of a message before any of its tasks run.
+
+    A key is remembered for ttl seconds from when it was first seen and
+    at most max_keys keys are remembered, the oldest forgotten first.
+    Every key gets the same ttl, so insertion order is expiry order and
+    both limits are kept by popping from the front of an ordered dict.
+
+    ttl = seconds a key is remembered
+    max_keys = most keys remembered at once
+    """
+
+    def __init__(self, ttl: float, max_keys: int) -> None:
+        assert max_keys > 0, "idempotency cache must hold at least one key"
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._expiries: "collections.OrderedDict[bytes, float]" = (
+            collections.OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._expiries)
+
+    def add(self, key: bytes, now: Optional[float] = None) -> bool:
+        """
+        Remembers a key unless it was seen within its ttl
+
+        Returns:
+            bool : True when the key is new, False for a duplicate
+        """
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+        if key in self._expiries:
+            return False
+        self._expiries[key] = now + self.ttl
+        if len(self._expiries) > self.max_keys:
+            self._expiries.popitem(last=False)
+        return True
+
+    def _expire(self, now: float) -> None:
+        """
+        Forgets keys whose ttl has passed
+        """
+        expiries = self._expiries
+        while expiries:
+            key, expiry = next(iter(expiries.items()))
+            if expiry > now:
+                return
+            del expiries[key]
@@ -0,0 +1,308 @@
+import mmap
+import os
+import struct
+import threading
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from .logging import create_logger
+
+logger = create_logger(__name__)
+
+# record kind, message sequence number, payload length
+RECORD = struct.Struct("!BQI")
+FRAME_LENGTH = struct.Struct("!I")
+TASK_RECORD = 1
+DONE_RECORD = 2
+
+
+def encode_frames(frames: Sequence[Any]) -> List[Any]:
+    """
+    Lays out frames as length prefixed buffers
+    """
+    parts = []
+    for frame in frames:
+        buffer = memoryview(getattr(frame, "buffer", frame))
+        parts.append(FRAME_LENGTH.pack(buffer.nbytes))
+        parts.append(buffer)
+    return parts
+
+
+def decode_frames(payload: bytes) -> List[bytes]:
+    """
+    Splits a payload written by encode_frames back into frames
+    """
+    frames = []
+    offset = 0
+    while offset < len(payload):
+        (length,) = FRAME_LENGTH.unpack_from(payload, offset)
+        offset += FRAME_LENGTH.size
+        frames.append(payload[offset : offset + length])
+        offset += length
+    return frames
+
+
+class JournalSegment:
+    """
+    Preallocated file of the journal mapped into memory, records
+    are appended until it is full
+
+    path = file of the segment
+    index = position of the segment in the journal
+    """
+
+    def __init__(self, path: str, index: int, size: int) -> None:
+        self.path = path
+        self.index = index
+        self.outstanding = 0
+        with open(path, "a+b") as f:
+            if os.fstat(f.fileno()).st_size < size:
+                f.truncate(size)
+            self.map = mmap.mmap(f.fileno(), 0)
+        self.offset = 0
+
+    def scan(self) -> List[Tuple[int, int, bytes]]:
+        """
+        Reads records up to the first unwritten one
+
+        Returns:
+            list : kind, sequence number and payload of every record
+        """
+        records = []
+        while self.offset + RECORD.size <= len(self.map):
+            kind, sequence, length = RECORD.unpack_from(self.map, self.offset)
+            end = self.offset + RECORD.size + length
+            if kind not in (TASK_RECORD, DONE_RECORD) or end > len(self.map):
+                break
+            records.append((kind, sequence, self.map[self.offset + RECORD.size : end]))
+            self.offset = end
+        return records
+
+    def has_room(self, length: int) -> bool:
+        return self.offset + RECORD.size + length <= len(self.map)
+
+    def write(
+        self,
+        kind: int,
+        sequence: int,
+        parts: Sequence[Any],
+        length: int,
+    ) -> None:
+        """
+        Appends a record, its header is written last so a record torn
+        by a crash is never read back as complete
+        """
+        position = self.offset + RECORD.size
+        for part in parts:
+            size = len(part) if isinstance(part, bytes) else part.nbytes
+            self.map[position : position + size] = part
+            position += size
+        self.map[self.offset : self.offset + RECORD.size] = RECORD.pack(
+            kind,
+            sequence,
+            length,
+        )
+        self.offset = position
+
+    def flush(self) -> None:
+        self.map.flush()
+
+    def close(self) -> None:
+        if not self.map.closed:
+            self.map.flush()
+            self.map.close()
+
+
+class TaskJournal:
+    """
+    Append-only journal of received messages kept in memory mapped
+    segment files, so messages a worker received but had not finished
+    are replayed when it restarts.
+
+    Every received message is appended with a sequence number and a done
+    record is appended once it completes. Segments are written to through
+    memory maps and synced to disk by a background thread every
+    fsync_interval seconds, so the cost of durability is shared by every
+    message written in between. Messages only survive a machine crash
+    once synced, a worker process crash loses nothing written. Segments
+    whose messages have all completed are deleted oldest first.
+
+    directory = directory segment files are kept in
+    segment_size = bytes preallocated per segment file
+    fsync_interval = seconds between syncs to disk
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int,
+        fsync_interval: float,
+    ) -> None:
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._segments: List[JournalSegment] = []
+        self._pending: Dict[int, Tuple[JournalSegment, Optional[List[bytes]]]] = {}
+        self._next_sequence = 1
+        self._dirty = False
+        self._closed = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+        self._flusher = threading.Thread(
+            target=self._flush_periodically,
+            name="zebrok-journal",
+            daemon=True,
+        )
+        self._flusher.start()
+
+    def _recover(self) -> None:
+        """
+        Reads existing segments to find messages never completed,
+        new records go to a fresh segment
+        """
+        names = sorted(
+            name for name in os.listdir(self.directory) if name.endswith(".journal")
+        )
+        for name in names:
+            path = os.path.join(self.directory, name)
+            if not os.path.getsize(path):
+                os.remove(path)
+                continue
+            segment = JournalSegment(path, int(name.split(".")[0]), 0)
+            self._segments.append(segment)
+            for kind, sequence, payload in segment.scan():
+                self._next_sequence = max(self._next_sequence, sequence + 1)
+                if kind == TASK_RECORD:
+                    self._pending[sequence] = (segment, decode_frames(payload))
+                    segment.outstanding += 1
+                else:
+                    entry = self._pending.pop(sequence, None)
+                    if entry is not None:
+                        entry[0].outstanding -= 1
+            segment.close()
+        index = self._segments[-1].index + 1 if self._segments else 0
+        self._add_segment(index, self.segment_size)
+        self._delete_completed_segments()
+        if self._pending:
+            logger.warning(
+                f"replaying {len(self._pending)} unfinished messages from journal",
+            )
+
+    def _add_segment(self, index: int, size: int) -> JournalSegment:
+        """
+        Starts a new segment records are appended to
+        """
+        path = os.path.join(self.directory, f"{index:010d}.journal")
+        segment = JournalSegment(path, index, size)
+        self._segments.append(segment)
+        return segment
+
+    def pending(self) -> List[Tuple[int, List[bytes]]]:
+        """
+        Messages recovered from disk which never completed, oldest first.
+        Each is returned once, they stay in the journal until completed.
+        """
+        with self._lock:
+            recovered = []
+            for sequence in sorted(self._pending):
+                segment, frames = self._pending[sequence]
+                if frames is not None:
+                    recovered.append((sequence, frames))
+                    self._pending[sequence] = (segment, None)
+            return recovered
+
+    @property
+    def number_pending(self) -> int:
+        """
+        Number of messages recorded and not completed yet
+        """
+        return len(self._pending)
+
+    def append(self, frames: Sequence[Any]) -> int:
+        """
+        Records a received message
+
+        Returns:
+            int : sequence number completing the message
+        """
+        parts = encode_frames(frames)
+        length = sum(
+            len(part) if isinstance(part, bytes) else part.nbytes for part in parts
+        )
+        with self._lock:
+            sequence = self._next_sequence
+            self._next_sequence += 1
+            segment = self._write(TASK_RECORD, sequence, parts, length)
+            segment.outstanding += 1
+            self._pending[sequence] = (segment, None)
+        return sequence
+
+    def complete(self, sequence: int) -> None:
+        """
+        Marks a message as done so it is not replayed
+        """
+        with self._lock:
+            entry = self._pending.pop(sequence, None)
+            if entry is None:
+                return
+            self._write(DONE_RECORD, sequence, (), 0)
+            entry[0].outstanding -= 1
+            self._delete_completed_segments()
+
+    def _write(
+        self,
+        kind: int,
+        sequence: int,
+        parts: Sequence[Any],
+        length: int,
+    ) -> JournalSegment:
+        """
+        Appends a record to the active segment, starting a new one when full
+        """
+        segment = self._segments[-1]
+        if not segment.has_room(length):
+            segment.close()
+            size = max(self.segment_size, RECORD.size + length)
+            segment = self._add_segment(segment.index + 1, size)
+        segment.write(kind, sequence, parts, length)
+        self._dirty = True
+        return segment
+
+    def _delete_completed_segments(self) -> None:
+        """
+        Deletes full segments without outstanding messages, oldest first
+        so done records are never lost before the messages they complete
+        """
+        while len(self._segments) > 1 and self._segments[0].outstanding == 0:
+            segment = self._segments.pop(0)
+            segment.close()
+            os.remove(segment.path)
+
+    def flush(self) -> None:
+        """
+        Syncs records written since the last flush to disk
+        """
+        with self._lock:
+            if self._dirty and not self._closed.is_set():
+                self._segments[-1].flush()
+                self._dirty = False
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self.fsync_interval):
+            self.flush()
+
+    def close(self) -> None:
+        """
+        Syncs and unmaps every segment
+        """
+        self.flush()
+        self._closed.set()
+        self._flusher.join()
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
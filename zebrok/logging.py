@@ -1,27 +1,161 @@
-import logging
+import atexit
+import collections
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from typing import List
+from typing import Optional
+
+from .config import LOG_AGGREGATE_INTERVAL
+from .config import LOG_FILE
+from .config import LOG_LEVEL
+
+_lock = threading.Lock()
+_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_queue_handlers: List[logging.handlers.QueueHandler] = []
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _create_output_handlers() -> List[logging.Handler]:
+    """
+    Creates the handlers the background listener writes records to
+    """
+    formatter = logging.Formatter(
+        "{asctime} - {name} - {levelname} - {message}",
+        style="{",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+    log_file = os.environ.get("LOG_FILE", LOG_FILE)
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def _start_listener() -> None:
+    """
+    Starts the thread writing queued records, once per process
+    """
+    global _listener
+    if _listener is None:
+        _listener = logging.handlers.QueueListener(_queue, *_create_output_handlers())
+        _listener.start()
+
+
+def _stop_listener() -> None:
+    """
+    Writes every queued record then stops the listener
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def _restart_listener_in_child() -> None:
+    """
+    The listener thread does not survive a fork, a forked child gets
+    a fresh queue, which no parent record can be stuck in, and a
+    listener of its own
+    """
+    global _lock, _queue, _listener
+    _lock = threading.Lock()
+    _queue = queue.SimpleQueue()
+    _listener = None
+    for handler in _queue_handlers:
+        handler.queue = _queue
+    if _queue_handlers:
+        _start_listener()
+
+
+atexit.register(_stop_listener)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listener_in_child)
 
 
 def create_logger(module_name: str) -> "logging.Logger":
     """
-    Initializes a new logger object
+    Initializes a new logger object. Records are put on a queue and
+    written by a background listener so logging never waits on the
+    console or disk, LOG_LEVEL sets the level.
+
     parameters:
         module_name (str): name of module importing the logger
     """
     logger = logging.getLogger(module_name)
-    logger.setLevel(logging.DEBUG)
+    logger.setLevel(os.environ.get("LOG_LEVEL", LOG_LEVEL).upper())
 
-    stream_handler = logging.StreamHandler()
-    file_handler = logging.FileHandler("zebrok.log")
+    with _lock:
+        _start_listener()
+        if not any(handler in _queue_handlers for handler in logger.handlers):
+            queue_handler = logging.handlers.QueueHandler(_queue)
+            _queue_handlers.append(queue_handler)
+            logger.addHandler(queue_handler)
+    return logger
 
-    logger.addHandler(stream_handler)
-    logger.addHandler(file_handler)
 
-    formatter = logging.Formatter(
-        "{asctime} - {name} - {levelname} - {message}",
-        style="{",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    )
+class AggregatedLog:
+    """
+    Counts per message events and logs one line per interval with the
+    number of events, and their count per key, instead of a line per
+    message, so logging cost no longer grows with the message rate.
+    Counts are logged by the first event after the interval elapsed
+    or by flush. An interval of 0 logs every event.
 
-    stream_handler.setFormatter(formatter)
-    file_handler.setFormatter(formatter)
-    return logger
+    logger = logger the summaries are written to
+    event = description of the counted events
+    interval = seconds between summaries, LOG_AGGREGATE_INTERVAL if None
+    """
+
+    def __init__(
+        self,
+        logger: "logging.Logger",
+        event: str,
+        interval: Optional[float] = None,
+    ) -> None:
+        self.logger = logger
+        self.event = event
+        if interval is None:
+            interval = float(
+                os.environ.get("LOG_AGGREGATE_INTERVAL", LOG_AGGREGATE_INTERVAL),
+            )
+        self.interval = interval
+        self.counts: "collections.Counter[str]" = collections.Counter()
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+
+    def record(self, key: str = "") -> None:
+        """
+        Counts an event, logging the counts when the interval elapsed
+        """
+        if self.interval <= 0:
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info(f"{self.event}: {key}" if key else self.event)
+            return
+        with self._lock:
+            self.counts[key] += 1
+            if time.monotonic() - self._started < self.interval:
+                return
+        self.flush()
+
+    def flush(self) -> None:
+        """
+        Logs and resets the counts recorded so far
+        """
+        with self._lock:
+            counts, self.counts = self.counts, collections.Counter()
+            started, self._started = self._started, time.monotonic()
+        if not counts:
+            return
+        elapsed = time.monotonic() - started
+        total = sum(counts.values())
+        details = ", ".join(
+            f"{key}: {count}" for key, count in counts.most_common() if key
+        )
+        message = f"{self.event}: {total} in {elapsed:.1f}s"
+        self.logger.info(f"{message} ({details})" if details else message)
@@ -0,0 +1,260 @@
+import bisect
+import http.server
+import os
+import threading
+import weakref
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from .logging import create_logger
+
+logger = create_logger(__name__)
+
+# seconds, from sub-millisecond tasks up to a minute
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class Counter:
+    """
+    Monotonically increasing count.
+
+    Updates take no lock so they cost an attribute increment, a rare update
+    lost to threads racing on the same counter is accepted for metrics.
+    """
+
+    kind = "counter"
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+    def reset(self) -> None:
+        self.value = 0
+
+    def samples(self, name: str, labels: Dict[str, str]) -> Iterator[Sample]:
+        yield name, labels, self.value
+
+
+class Histogram:
+    """
+    Distribution of observed values over fixed buckets, exposed with
+    cumulative bucket counts like Prometheus histograms. Updates take
+    no lock, as with Counter.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.reset()
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def reset(self) -> None:
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def samples(self, name: str, labels: Dict[str, str]) -> Iterator[Sample]:
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            yield f"{name}_bucket", {**labels, "le": le}, cumulative
+        yield f"{name}_sum", labels, self.sum
+        yield f"{name}_count", labels, self.count
+
+
+class MetricsRegistry:
+    """
+    Process wide registry of counters and histograms keyed by name and labels.
+
+    Callers look a metric up once and keep it, so the hot path only pays
+    for the update. Values owned by other objects, like messages in flight
+    per slave, are read when metrics are rendered from collectors, which
+    are held weakly. Values are zeroed in a forked child.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: Dict[Tuple[str, Labels], Any] = {}
+        self._collectors: List[
+            Callable[[], Optional[Callable[[], Iterable[Sample]]]]
+        ] = []
+
+    def _get(
+        self,
+        metric_type: Callable[..., Any],
+        name: str,
+        labels: Dict[str, Any],
+    ) -> Any:
+        """
+        Returns the metric of a name and labels, creating it on first use
+        """
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(key, metric_type())
+        return metric
+
+    def counter(self, name: str, **labels: Any) -> Counter:
+        return self._get(Counter, name, labels)
+
+    def histogram(self, name: str, **labels: Any) -> Histogram:
+        return self._get(Histogram, name, labels)
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """
+        Registers a bound method yielding (name, labels, value) gauge samples
+        """
+        with self._lock:
+            self._collectors.append(weakref.WeakMethod(collector))
+
+    def collect(self) -> Dict[str, Tuple[str, List[Sample]]]:
+        """
+        Gathers samples of every metric grouped by metric name
+        """
+        families: Dict[str, Tuple[str, List[Sample]]] = {}
+        with self._lock:
+            metrics = list(self._metrics.items())
+            self._collectors = [ref for ref in self._collectors if ref() is not None]
+            collectors = [ref() for ref in self._collectors]
+        for (name, labels), metric in metrics:
+            _, samples = families.setdefault(name, (metric.kind, []))
+            samples.extend(metric.samples(name, dict(labels)))
+        for collector in collectors:
+            if collector is None:
+                continue
+            for name, labels, value in collector():
+                _, samples = families.setdefault(name, ("gauge", []))
+                samples.append((name, labels, value))
+        return families
+
+    def render(self) -> str:
+        """
+        Renders every metric in the Prometheus text exposition format
+        """
+        lines = []
+        for name, (kind, samples) in sorted(self.collect().items()):
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                rendered = ",".join(
+                    f'{key}="{escape_label(val)}"' for key, val in labels.items()
+                )
+                lines.append(
+                    f"{sample_name}{{{rendered}}} {value}"
+                    if rendered
+                    else f"{sample_name} {value}",
+                )
+        return "\n".join(lines) + "\n"
+
+    def _reset_in_child(self) -> None:
+        """
+        Zeroes values inherited from the parent process
+        """
+        self._lock = threading.Lock()
+        self._collectors = []
+        for metric in self._metrics.values():
+            metric.reset()
+
+
+def escape_label(value: str) -> str:
+    """
+    Escapes a label value for the text exposition format
+    """
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+metrics = MetricsRegistry()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=metrics._reset_in_child)
+
+
+class TaskMetrics:
+    """
+    Metrics of a single task looked up once when the task is
+    compiled, running it then only pays for their updates
+    """
+
+    def __init__(self, task_name: str) -> None:
+        self.duration = metrics.histogram(
+            "zebrok_task_duration_seconds",
+            task=task_name,
+        )
+        self.failures = metrics.counter("zebrok_task_failures_total", task=task_name)
+        self.retries = metrics.counter("zebrok_task_retries_total", task=task_name)
+        self.cache_hits = metrics.counter("zebrok_cache_hits_total", task=task_name)
+        self.cache_misses = metrics.counter("zebrok_cache_misses_total", task=task_name)
+
+
+class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves the registry's metrics on every GET request
+    """
+
+    def do_GET(self) -> None:
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def start_metrics_server(host: str, port: int) -> http.server.ThreadingHTTPServer:
+    """
+    Serves metrics over http for Prometheus to scrape from a daemon thread
+
+    parameters:
+        host (str): address to listen on
+        port (int): port to listen on
+
+    Returns:
+        ThreadingHTTPServer : running server, stopped with shutdown
+    """
+    server = http.server.ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(
+        target=server.serve_forever,
+        name="zebrok-metrics",
+        daemon=True,
+    )
+    thread.start()
+    logger.info(f"serving metrics on: http://{host}:{port}/metrics")
+    return server
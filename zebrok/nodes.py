@@ -0,0 +1,221 @@
+import functools
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Dict
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from .logging import create_logger
+
+logger = create_logger(__name__)
+
+# magic and port of the announced worker
+BEACON = struct.Struct("!4sH")
+BEACON_MAGIC = b"ZBN1"
+# beacon intervals after which a silent node is dropped
+NODE_EXPIRY_INTERVALS = 3
+
+Endpoint = Tuple[str, int]
+
+
+@functools.lru_cache(maxsize=8)
+def parse_endpoints(spec: str) -> Tuple[Endpoint, ...]:
+    """
+    Parses worker endpoints configured as comma separated host:port,
+    e.g. "10.0.0.1:5690,10.0.0.2:5690"
+    """
+    endpoints = []
+    for entry in filter(None, (entry.strip() for entry in spec.split(","))):
+        host, _, port = entry.rpartition(":")
+        assert host and port, f"worker endpoint {entry} must be host:port"
+        endpoints.append((host, int(port)))
+    return tuple(endpoints)
+
+
+def get_tcp_address(endpoint: Endpoint) -> str:
+    """
+    Address a publisher connects to for a worker endpoint, formatted
+    as connections format their socket address
+    """
+    host, port = endpoint
+    return f"tcp://{socket.gethostbyname(host)}:{port}"
+
+
+class WorkerBeacon:
+    """
+    Announces a worker node by sending a udp datagram every interval
+    seconds, publishers listening on the discovery port connect to
+    the node from the address the beacon came from
+
+    port = port the worker receives tasks on
+    discovery_port = udp port beacons are sent to
+    address = address beacons are sent to, the broadcast address
+        reaches publishers on every host of the network
+    interval = seconds between beacons
+    """
+
+    def __init__(
+        self,
+        port: int,
+        discovery_port: int,
+        address: str,
+        interval: float,
+    ) -> None:
+        self.beacon = BEACON.pack(BEACON_MAGIC, port)
+        self.target = (address, discovery_port)
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        self._thread = threading.Thread(
+            target=self._announce,
+            name="zebrok-beacon",
+            daemon=True,
+        )
+
+    def start(self) -> None:
+        logger.info(f"announcing worker on udp port: {self.target[1]}")
+        self._thread.start()
+
+    def _announce(self) -> None:
+        while True:
+            try:
+                self._socket.sendto(self.beacon, self.target)
+            except OSError as e:
+                logger.warning(f"could not send worker beacon: {e}")
+            if self._stopped.wait(self.interval):
+                return
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+        self._socket.close()
+
+
+class NodeDirectory:
+    """
+    Worker nodes discovered from their beacons. A background thread
+    listens on the discovery port and drops nodes not heard from for
+    NODE_EXPIRY_INTERVALS intervals. endpoints is replaced as a whole
+    whenever nodes come or go, so readers take no lock.
+
+    discovery_port = udp port beacons are received on
+    interval = seconds between beacons of a node
+    """
+
+    def __init__(self, discovery_port: int, interval: float) -> None:
+        self.interval = interval
+        self.endpoints: Tuple[Endpoint, ...] = ()
+        self._last_seen: Dict[Endpoint, float] = {}
+        self._discovered = threading.Event()
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            # every publisher process of a host receives the beacons
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self._socket.bind(("", discovery_port))
+        self._socket.settimeout(interval)
+        self._thread = threading.Thread(
+            target=self._listen,
+            name="zebrok-discovery",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Waits for the first node to be discovered
+
+        Returns:
+            bool : True once some node was discovered
+        """
+        return self._discovered.wait(timeout)
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                data, (host, _) = self._socket.recvfrom(BEACON.size)
+            except socket.timeout:
+                data = b""
+            except OSError:
+                return
+            if len(data) == BEACON.size:
+                magic, port = BEACON.unpack(data)
+                if magic == BEACON_MAGIC:
+                    self._last_seen[(host, port)] = time.monotonic()
+            self._update_endpoints()
+
+    def _update_endpoints(self) -> None:
+        """
+        Forgets silent nodes and publishes the endpoints when they changed
+        """
+        expired = time.monotonic() - self.interval * NODE_EXPIRY_INTERVALS
+        for endpoint in [
+            endpoint for endpoint, seen in self._last_seen.items() if seen < expired
+        ]:
+            logger.warning(f"dropping silent worker node: {endpoint[0]}:{endpoint[1]}")
+            del self._last_seen[endpoint]
+        endpoints = tuple(sorted(self._last_seen))
+        if endpoints != self.endpoints:
+            if endpoints:
+                self._discovered.set()
+            self.endpoints = endpoints
+
+    def close(self) -> None:
+        self._socket.close()
+
+
+_directory: Optional[NodeDirectory] = None
+_directory_lock = threading.Lock()
+
+
+def get_node_directory(discovery_port: int, interval: float) -> NodeDirectory:
+    """
+    Returns the process wide node directory, started on first use and
+    given one beacon interval to discover the first nodes
+    """
+    global _directory
+    if _directory is None:
+        with _directory_lock:
+            if _directory is None:
+                directory = NodeDirectory(discovery_port, interval)
+                directory.wait(interval)
+                _directory = directory
+    return _directory
+
+
+def _forget_directory_in_child() -> None:
+    """
+    The listening thread does not survive a fork, a forked
+    child starts a directory of its own when it needs one
+    """
+    global _directory, _directory_lock
+    _directory = None
+    _directory_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_directory_in_child)
+
+
+def resolve_endpoints(
+    configured: Sequence[Endpoint],
+    discovered: Sequence[Endpoint],
+    port: Optional[int] = None,
+) -> Tuple[Endpoint, ...]:
+    """
+    Endpoints publishers spread a queue's tasks over: configured and
+    discovered worker nodes, with port replacing the worker's port for
+    queues bound to a port of their own
+    """
+    endpoints = tuple(configured) + tuple(
+        endpoint for endpoint in discovered if endpoint not in configured
+    )
+    if port is None:
+        return endpoints
+    hosts = dict.fromkeys(host for host, _ in endpoints)
+    return tuple((host, port) for host in hosts)
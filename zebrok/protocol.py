@@ -0,0 +1,265 @@
+import json
+import re
+import struct
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Set
+from typing import Tuple
+
+from .compression import BaseCompressor
+from .compression import COMPRESSION_FLAGS
+from .compression import get_compressor_by_flags
+from .exceptions import ZebrokMalformedMessageError
+from .exceptions import ZebrokSerializationError
+from .serializers import BaseSerializer
+from .serializers import SerializerFactory
+
+# magic, protocol version, serializer format id, flags
+HEADER = struct.Struct("!2sBBB")
+MAGIC = b"ZB"
+PROTOCOL_VERSION = 1
+# header flag set on delayed messages, their header is followed
+# by the time they are due at in seconds since the epoch
+FLAG_ETA = 0x01
+ETA = struct.Struct("!d")
+# header flag set on messages carrying an idempotency key, the key
+# fills the rest of the header frame after any eta
+FLAG_KEY = 0x02
+# most bytes of an idempotency key, workers remember every key they see
+MAX_KEY_SIZE = 255
+# address results of a task are sent back to, the publisher's result socket
+REPLY_TO = re.compile(r"tcp://[^\s/]+:[0-9]{1,5}")
+# flags 0x04, 0x08 and 0x10 name the compressor of compressed
+# messages, see COMPRESSION_FLAGS
+
+_serializers: Dict[int, BaseSerializer] = {}
+
+
+def as_bytes(frame: Any) -> bytes:
+    """
+    Returns the content of a frame received with or without copying
+    """
+    return frame if isinstance(frame, bytes) else frame.bytes
+
+
+def as_buffer(frame: Any) -> Any:
+    """
+    Returns a buffer over the content of a frame without copying it
+    """
+    return getattr(frame, "buffer", frame)
+
+
+def get_serializer_by_format_id(format_id: int) -> BaseSerializer:
+    """
+    Returns a cached serializer able to read the given message format
+    """
+    serializer = _serializers.get(format_id)
+    if serializer is None:
+        serializer_type = SerializerFactory.get_serializer_type_by_format_id(format_id)
+        serializer = SerializerFactory.create_serializer(serializer_type)
+        _serializers[format_id] = serializer
+    return serializer
+
+
+def check_key(key: Any) -> None:
+    """
+    Raises TypeError for idempotency keys which are not str and
+    ValueError for keys longer than MAX_KEY_SIZE bytes once encoded
+    """
+    if not isinstance(key, str):
+        raise TypeError(f"idempotency key must be str, not {type(key).__name__}")
+    if len(key.encode()) > MAX_KEY_SIZE:
+        raise ValueError(f"idempotency key is longer than {MAX_KEY_SIZE} bytes")
+
+
+def encode_message(
+    payload: Dict[str, Any],
+    serializer: BaseSerializer,
+    eta: Optional[float] = None,
+    key: Optional[str] = None,
+    compressor: Optional[BaseCompressor] = None,
+) -> List[Any]:
+    """
+    Serializes a payload into frames: a header naming the format
+    followed by the body and any out-of-band buffers. With a compressor,
+    frames of payloads of at least its threshold bytes are compressed
+    unless that does not make them smaller.
+
+    Parameters:
+        payload (dict): message to send
+        serializer (BaseSerializer): serializer used for the body
+        eta (float): seconds since the epoch the message is due at, now if None
+        key (str): idempotency key workers drop duplicates of the message by
+        compressor (BaseCompressor): compressor of large payloads, None if not compressed
+
+    Returns:
+        list : frames to be sent as one multipart message
+    """
+    flags = (0 if eta is None else FLAG_ETA) | (0 if key is None else FLAG_KEY)
+    frames = serializer.dumps(payload)
+    if compressor is not None:
+        size = sum(memoryview(frame).nbytes for frame in frames)
+        if size >= compressor.threshold:
+            compressed = [compressor.compress(frame) for frame in frames]
+            if sum(len(frame) for frame in compressed) < size:
+                frames = compressed
+                flags |= compressor.flag
+    header = HEADER.pack(MAGIC, PROTOCOL_VERSION, serializer.format_id, flags)
+    if eta is not None:
+        header += ETA.pack(eta)
+    if key is not None:
+        check_key(key)
+        header += key.encode()
+    return [header, *frames]
+
+
+def read_eta(frames: Sequence[Any]) -> Optional[float]:
+    """
+    Reads the time a delayed message is due at from its header
+    alone, without decoding the body
+
+    Returns:
+        float : seconds since the epoch, None for messages due immediately
+    """
+    first = frames[0]
+    if len(frames) == 1 or len(first) < HEADER.size + ETA.size:
+        return None
+    first = as_bytes(first)
+    magic, _, _, flags = HEADER.unpack_from(first)
+    if magic != MAGIC or not flags & FLAG_ETA:
+        return None
+    return ETA.unpack_from(first, HEADER.size)[0]
+
+
+def read_key(frames: Sequence[Any]) -> Optional[bytes]:
+    """
+    Reads the idempotency key of a message from its header alone,
+    without decoding the body
+
+    Returns:
+        bytes : key of the message, None for messages without one
+    """
+    first = frames[0]
+    if len(frames) == 1 or len(first) <= HEADER.size:
+        return None
+    first = as_bytes(first)
+    magic, _, _, flags = HEADER.unpack_from(first)
+    if magic != MAGIC or not flags & FLAG_KEY:
+        return None
+    return first[HEADER.size + ETA.size if flags & FLAG_ETA else HEADER.size :]
+
+
+def unpack_message(message: Any) -> List[Dict[str, Any]]:
+    """
+    Returns the tasks a decoded message carries, the message itself or
+    the tasks of its batch. Messages of the wrong shape raise
+    ZebrokMalformedMessageError, the fields of each task are checked
+    by unpack_task.
+    """
+    if not isinstance(message, dict):
+        raise ZebrokMalformedMessageError(f"malformed message: {message!r:.100}")
+    if "batch" not in message:
+        return [message]
+    batch = message["batch"]
+    if not isinstance(batch, list) or not all(isinstance(task, dict) for task in batch):
+        raise ZebrokMalformedMessageError(f"malformed batch: {batch!r:.100}")
+    return batch
+
+
+def unpack_task(task: Any) -> Tuple[str, Sequence[Any], Dict[str, Any]]:
+    """
+    Reads the name, positional and keyword arguments of a task from its
+    payload. Payloads of the wrong shape raise ZebrokMalformedMessageError
+    before the task is looked up or run, including those whose reply_to
+    is not a tcp endpoint or comes without a str id and those published
+    at a time which is not a number.
+    """
+    if not isinstance(task, dict):
+        raise ZebrokMalformedMessageError(f"malformed task: {task!r:.100}")
+    name = task.get("task")
+    args = task.get("args", ())
+    kwargs = task.get("kwargs", {})
+    reply_to = task.get("reply_to")
+    published_at = task.get("published_at")
+    valid = (
+        isinstance(name, str)
+        and isinstance(args, (list, tuple))
+        and isinstance(kwargs, dict)
+        and (
+            reply_to is None
+            or (
+                isinstance(reply_to, str)
+                and REPLY_TO.fullmatch(reply_to) is not None
+                and isinstance(task.get("id"), str)
+            )
+        )
+        and (
+            published_at is None
+            or (
+                isinstance(published_at, (int, float))
+                and not isinstance(published_at, bool)
+            )
+        )
+    )
+    if not valid:
+        raise ZebrokMalformedMessageError(f"malformed task: {task!r:.100}")
+    return name, args, kwargs
+
+
+def decompress_frames(frames: Sequence[Any], flags: int) -> List[bytes]:
+    """
+    Restores the body and buffer frames of a compressed message,
+    which may not exceed the compressor's max_size bytes altogether
+    """
+    compressor = get_compressor_by_flags(flags)
+    remaining = compressor.max_size
+    decompressed = []
+    try:
+        for frame in frames[1:]:
+            decompressed.append(compressor.decompress(as_buffer(frame), remaining))
+            remaining -= len(decompressed[-1])
+        return decompressed
+    except Exception as e:
+        raise ZebrokSerializationError(f"could not decompress message: {e}") from e
+
+
+def decode_message(
+    frames: Sequence[Any],
+    accepted_serializers: Optional[Set[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Deserializes frames produced by encode_message, decompressing them
+    first when compressed. A single frame without a header is read as
+    json sent by older publishers. Frames no serializer can read raise
+    ZebrokSerializationError whichever serializer failed.
+
+    Parameters:
+        frames (list): received frames
+        accepted_serializers (set): names of serializers allowed, all if None
+
+    Returns:
+        dict : decoded payload
+    """
+    first = as_bytes(frames[0])
+    if len(frames) == 1 or len(first) < HEADER.size or not first.startswith(MAGIC):
+        try:
+            return json.loads(first)
+        except ValueError as e:
+            raise ZebrokSerializationError(f"could not decode message: {e}") from e
+
+    _, _, format_id, flags = HEADER.unpack_from(first)
+    serializer = get_serializer_by_format_id(format_id)
+    if accepted_serializers is not None and serializer.name not in accepted_serializers:
+        raise ZebrokSerializationError(f"Serializer not accepted: {serializer.name}")
+    if flags & COMPRESSION_FLAGS:
+        body, *buffers = decompress_frames(frames, flags)
+    else:
+        body, buffers = as_bytes(frames[1]), [as_buffer(frame) for frame in frames[2:]]
+    try:
+        return serializer.loads(body, buffers)
+    except Exception as e:
+        # pickle, msgpack and json each raise errors of their own
+        raise ZebrokSerializationError(f"could not decode message: {e!r:.200}") from e
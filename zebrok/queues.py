@@ -0,0 +1,65 @@
+import functools
+from typing import List
+
+DEFAULT_QUEUE = "default"
+
+
+class TaskQueue:
+    """
+    Named queue tasks are published to. Every queue is a socket of its
+    own on the worker, so tasks of one queue never wait behind those
+    queued on another.
+
+    name = name tasks refer to the queue by
+    port = port the queue's socket is bound to
+    weight = most messages read from the queue in a round while other
+        queues have messages waiting too, queues with the highest weight
+        are read first
+    slaves = number of slave workers reserved for the queue's tasks
+    """
+
+    def __init__(self, name: str, port: int, weight: int = 1, slaves: int = 0) -> None:
+        assert weight > 0, f"weight of queue {name} must be positive"
+        self.name = name
+        self.port = port
+        self.weight = weight
+        self.slaves = slaves
+
+    def __repr__(self) -> str:
+        return f"TaskQueue({self.name!r}, {self.port}, weight={self.weight}, slaves={self.slaves})"
+
+
+@functools.lru_cache(maxsize=8)
+def parse_queues(spec: str, default_port: int) -> List[TaskQueue]:
+    """
+    Parses queues configured as comma separated name:port[:weight[:slaves]],
+    e.g. "high:5700:4:2,bulk:5702". Empty fields keep their default, so
+    "high:5700::2" reserves 2 slaves at the default weight. The default
+    queue is always included and bound to the worker's port, it may be
+    listed as default::weight[:slaves]. Malformed entries raise ValueError.
+
+    Returns:
+        list : queues ordered from the highest weight
+    """
+    queues = {DEFAULT_QUEUE: TaskQueue(DEFAULT_QUEUE, default_port)}
+    for entry in filter(None, (entry.strip() for entry in spec.split(","))):
+        name, *fields = entry.split(":")
+        if not name or not 1 <= len(fields) <= 3:
+            raise ValueError(f"queue {entry!r} is not name:port[:weight[:slaves]]")
+        if name == DEFAULT_QUEUE:
+            fields[0] = str(default_port)
+        if not fields[0]:
+            raise ValueError(f"queue {name} needs a port")
+        try:
+            port, weight, slaves = (
+                int(field) if field else default
+                for field, default in zip(fields + ["", ""], (0, 1, 0))
+            )
+        except ValueError:
+            raise ValueError(
+                f"queue {entry!r} has fields which are not integers",
+            ) from None
+        if weight <= 0:
+            raise ValueError(f"weight of queue {name} must be positive")
+        queues[name] = TaskQueue(name, port, weight, slaves)
+    return sorted(queues.values(), key=lambda queue: -queue.weight)
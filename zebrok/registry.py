@@ -1,8 +1,12 @@
 import inspect
-from abc import ABC, abstractmethod
+from abc import ABC
+from abc import abstractmethod
+from typing import Dict
+from typing import Optional
 
 from .app import Task
 from .exceptions import ZebrokNotImplementedError
+from .signatures import TaskSignature
 
 
 class BaseTaskRegistry(ABC):
@@ -31,24 +35,46 @@ class BaseTaskRegistry(ABC):
         """
         raise ZebrokNotImplementedError
 
+    def get_signature(self, name: str) -> Optional[TaskSignature]:
+        """
+        Returns the signature of a task compiled when it was registered,
+        None when the registry does not compile signatures
+
+        parameters:
+            name (str): name of the task
+        """
+        return None
+
 
 class InMemoryTaskRegistry(BaseTaskRegistry, dict):
     """
-    In-memory implementation of Task registry
+    In-memory implementation of Task registry, the signature of
+    each task is compiled as it is registered
     """
 
+    def __init__(self) -> None:
+        super().__init__()
+        self.signatures: Dict[str, TaskSignature] = {}
+
     def register(self, task: Task) -> None:
         """
         Adds a task to in-memory registry
         """
         task = inspect.isclass(task) and task() or task
-        self[task.get_task_object().__name__] = task
+        name = task.get_task_object().__name__
+        self[name] = task
+        self.signatures[name] = TaskSignature(task, name)
 
     def unregister(self, name: str) -> None:
         """
         Removes a task to in-memory registry
         """
-        self.pop(getattr(name, "name", name))
+        name = getattr(name, "name", name)
+        self.pop(name)
+        self.signatures.pop(name, None)
+
+    def get_signature(self, name: str) -> Optional[TaskSignature]:
+        return self.signatures.get(name)
 
 
 class RegistryType:
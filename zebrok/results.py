@@ -0,0 +1,426 @@
+import asyncio
+import atexit
+import collections
+import concurrent.futures
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+import zmq
+
+from .exceptions import ZebrokResultExpiredError
+from .exceptions import ZebrokSerializationError
+from .exceptions import ZebrokTaskError
+from .logging import create_logger
+from .protocol import decode_message
+from .protocol import encode_message
+from .serializers import BaseSerializer
+from .serializers import get_default_serializer
+from .utils import get_accepted_serializers
+from .utils import get_high_water_mark
+from .utils import get_result_host
+from .utils import get_result_max_pending
+from .utils import get_result_ttl
+
+logger = create_logger(__name__)
+
+# result sockets each thread of a worker keeps open at most
+MAX_RESULT_SOCKETS = 16
+# seconds a result socket is kept open without sending on it
+RESULT_SOCKET_IDLE = 60.0
+
+
+class AsyncResult:
+    """
+    Handle to the return value of a task executed by a worker
+
+    id = identifier of the task invocation
+    reply_to = address the worker sends the result to
+    future = resolved with the task's return value once it arrives
+    """
+
+    def __init__(
+        self,
+        task_id: str,
+        reply_to: str,
+        future: Optional[concurrent.futures.Future] = None,
+    ) -> None:
+        self.id = task_id
+        self.reply_to = reply_to
+        self.future = future or concurrent.futures.Future()
+
+    def ready(self) -> bool:
+        """
+        Checks if the result has arrived
+        """
+        return self.future.done()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """
+        Waits for the task's return value
+
+        Parameters:
+            timeout (float): seconds to wait, forever if None
+
+        Returns:
+            object : value returned by the task
+        """
+        return self.future.result(timeout)
+
+    async def aget(self, timeout: Optional[float] = None) -> Any:
+        """
+        Waits for the task's return value without blocking the event loop
+        """
+        return await asyncio.wait_for(asyncio.wrap_future(self.future), timeout)
+
+
+def gather_results(
+    results: Iterable[AsyncResult],
+    timeout: Optional[float] = None,
+) -> List[Any]:
+    """
+    Waits for many results at once, timeout applies to all of them
+
+    Returns:
+        list : values returned by the tasks, in the order of results
+    """
+    results = list(results)
+    _, not_done = concurrent.futures.wait(
+        [result.future for result in results],
+        timeout,
+    )
+    if not_done:
+        raise concurrent.futures.TimeoutError(f"{len(not_done)} results not ready")
+    return [result.get() for result in results]
+
+
+def _settle(
+    future: concurrent.futures.Future,
+    value: Any = None,
+    error: Optional[BaseException] = None,
+) -> None:
+    """
+    Resolves a future unless its owner already cancelled it
+    """
+    if future.cancelled():
+        return
+    if error is None:
+        future.set_result(value)
+    else:
+        future.set_exception(error)
+
+
+class ResultBackend:
+    """
+    Collects results workers send back for tasks published by this process.
+
+    A PULL socket is bound to a random port of the result host the first
+    time a result is requested and a daemon thread resolves waiting results
+    as they arrive. Results are waited for at most RESULT_TTL seconds and at
+    most RESULT_MAX_PENDING of them at once, the oldest expiring first, so
+    memory stays flat when workers never answer. Results arriving after
+    their task expired are dropped, as are results in a serializer not in
+    ACCEPTED_SERIALIZERS or of the wrong shape. Like the publisher pools
+    the backend is dropped in a forked child.
+    """
+
+    def __init__(self) -> None:
+        self._reset()
+
+    def _reset(self) -> None:
+        """
+        Forgets the socket and every waiting result
+        """
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._context: Optional[zmq.Context] = None
+        self._socket: Optional[zmq.Socket] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self.address: Optional[str] = None
+        self._accepted_serializers: Set[str] = set()
+        # insertion order is expiry order as every result gets the same ttl
+        self._pending: "collections.OrderedDict[str, Tuple[float, Any]]" = (
+            collections.OrderedDict()
+        )
+
+    def create_result(self) -> AsyncResult:
+        """
+        Registers a new result to be waited for, starting
+        the backend on first use
+        """
+        if self._pid != os.getpid():
+            self._reset()
+        expired = []
+        with self._lock:
+            if self._socket is None:
+                self._start()
+            result = AsyncResult(uuid.uuid4().hex, self.address)
+            self._pending[result.id] = (
+                time.monotonic() + get_result_ttl(),
+                result.future,
+            )
+            max_pending = get_result_max_pending()
+            while len(self._pending) > max_pending:
+                expired.append(self._pending.popitem(last=False))
+        self._expire(expired)
+        return result
+
+    def _start(self) -> None:
+        """
+        Binds the result socket and starts receiving results
+        """
+        host = socket.gethostbyname(get_result_host())
+        self._accepted_serializers = get_accepted_serializers()
+        self._context = zmq.Context()
+        self._socket = self._context.socket(zmq.PULL)
+        self._socket.setsockopt(zmq.RCVHWM, get_high_water_mark())
+        port = self._socket.bind_to_random_port(f"tcp://{host}")
+        self.address = f"tcp://{host}:{port}"
+        self._thread = threading.Thread(
+            target=self._receive,
+            name="zebrok-result-backend",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _receive(self) -> None:
+        """
+        Resolves results as they arrive and expires overdue ones, errors
+        are logged so they never stop the thread expiring results
+        """
+        while not self._stopped.is_set():
+            try:
+                if self._socket.poll(self._get_poll_timeout()):
+                    self._resolve(self._socket.recv_multipart(copy=False))
+                self._expire_overdue()
+            except Exception:
+                logger.exception("could not handle results")
+
+    def _get_poll_timeout(self) -> int:
+        """
+        Milliseconds until the oldest result expires, at most a second
+        """
+        with self._lock:
+            if not self._pending:
+                return 1000
+            deadline, _ = next(iter(self._pending.values()))
+        return int(min(max(deadline - time.monotonic(), 0), 1) * 1000)
+
+    def _resolve(self, frames: List[Any]) -> None:
+        """
+        Resolves the waiting result a received message belongs to
+        """
+        try:
+            message = decode_message(frames, self._accepted_serializers)
+            if not isinstance(message, dict) or not isinstance(message.get("id"), str):
+                raise ZebrokSerializationError(f"malformed result: {message!r:.100}")
+        except Exception as e:
+            logger.error(f"dropping undecodable result: {e!r}")
+            return
+        with self._lock:
+            pending = self._pending.pop(message["id"], None)
+        if pending is None:
+            return
+        _, future = pending
+        error = message.get("error")
+        if error is None:
+            _settle(future, message.get("value"))
+        else:
+            _settle(future, error=ZebrokTaskError(error))
+
+    def _expire_overdue(self) -> None:
+        """
+        Fails every result waited for longer than its ttl
+        """
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            while self._pending:
+                deadline, _ = next(iter(self._pending.values()))
+                if deadline > now:
+                    break
+                expired.append(self._pending.popitem(last=False))
+        self._expire(expired)
+
+    def _expire(self, expired: List[Tuple[str, Tuple[float, Any]]]) -> None:
+        """
+        Fails results evicted from the backend
+        """
+        for task_id, (_, future) in expired:
+            error = ZebrokResultExpiredError(f"no result received for task {task_id}")
+            _settle(future, error=error)
+
+    def close(self) -> None:
+        """
+        Stops receiving results, closes the socket and terminates the context
+        """
+        with self._lock:
+            if self._pid != os.getpid() or self._socket is None:
+                return
+        self._stopped.set()
+        self._thread.join()
+        self._socket.close(linger=0)
+        self._context.term()
+        self._reset()
+
+
+result_backend = ResultBackend()
+atexit.register(result_backend.close)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=result_backend._reset)
+
+
+class ResultSender:
+    """
+    Sends results of executed tasks back to the publishers which asked for them.
+
+    Every thread gets its own PUSH socket per reply address on a shared
+    context, closing the least recently used beyond MAX_RESULT_SOCKETS and
+    those idle for longer than RESULT_SOCKET_IDLE seconds. Results are
+    sent without blocking, a result is dropped rather than stalling the
+    worker when its publisher is gone or falling behind.
+    """
+
+    def __init__(self) -> None:
+        self._reset()
+
+    def _reset(self) -> None:
+        """
+        Forgets every context and socket created so far
+        """
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._context: Optional[zmq.Context] = None
+        self._local = threading.local()
+        self._sockets: Set[zmq.Socket] = set()
+        self._serializer: Optional[BaseSerializer] = None
+
+    def _get_socket(self, reply_to: str) -> zmq.Socket:
+        """
+        Returns the calling thread's socket connected to reply_to
+        """
+        if self._pid != os.getpid():
+            self._reset()
+        sockets: Optional["collections.OrderedDict[str, Tuple[zmq.Socket, float]]"] = (
+            getattr(self._local, "sockets", None)
+        )
+        if sockets is None:
+            sockets = self._local.sockets = collections.OrderedDict()
+        now = time.monotonic()
+        entry = sockets.pop(reply_to, None)
+        self._close_unused(sockets, now)
+        if entry is not None:
+            result_socket = entry[0]
+        else:
+            with self._lock:
+                if self._context is None:
+                    self._context = zmq.Context()
+                    self._serializer = get_default_serializer()
+                result_socket = self._context.socket(zmq.PUSH)
+                result_socket.setsockopt(zmq.SNDHWM, get_high_water_mark())
+                result_socket.setsockopt(zmq.LINGER, 1000)
+                result_socket.connect(reply_to)
+                self._sockets.add(result_socket)
+        sockets[reply_to] = (result_socket, now)
+        return result_socket
+
+    def _close_unused(
+        self,
+        sockets: "collections.OrderedDict[str, Tuple[zmq.Socket, float]]",
+        now: float,
+    ) -> None:
+        """
+        Closes the calling thread's sockets idle for too long and the least
+        recently used ones until there is room for one more
+        """
+        while sockets:
+            reply_to, (result_socket, used) = next(iter(sockets.items()))
+            if len(sockets) < MAX_RESULT_SOCKETS and now - used < RESULT_SOCKET_IDLE:
+                break
+            del sockets[reply_to]
+            with self._lock:
+                self._sockets.discard(result_socket)
+            result_socket.close()
+
+    def send(
+        self,
+        reply_to: str,
+        task_id: str,
+        value: Any = None,
+        error: Optional[BaseException] = None,
+    ) -> bool:
+        """
+        Sends the value a task returned, or the error it failed with
+
+        Returns:
+            bool : False when the result was dropped
+        """
+        try:
+            result_socket = self._get_socket(reply_to)
+        except zmq.ZMQError as e:
+            logger.error(f"dropping result of task {task_id}: {reply_to!r:.100}: {e}")
+            return False
+        payload = {"id": task_id, "value": value, "error": None}
+        if error is not None:
+            payload = {"id": task_id, "value": None, "error": repr(error)}
+        try:
+            frames = encode_message(payload, self._serializer)
+        except Exception as e:
+            # serializers raise their own errors for unsupported values
+            payload = {
+                "id": task_id,
+                "value": None,
+                "error": f"unserializable result: {e!r}",
+            }
+            frames = encode_message(payload, self._serializer)
+        try:
+            result_socket.send_multipart(frames, zmq.NOBLOCK, copy=False)
+        except zmq.Again:
+            logger.warning(
+                f"dropping result of task {task_id}: {reply_to} is not receiving",
+            )
+            return False
+        return True
+
+    def send_outcome(
+        self,
+        reply_to: str,
+        task_id: str,
+        future: concurrent.futures.Future,
+    ) -> bool:
+        """
+        Sends the value or error a completed future resolved with
+        """
+        error = future.exception()
+        if error is None:
+            return self.send(reply_to, task_id, future.result())
+        return self.send(reply_to, task_id, error=error)
+
+    def close(self) -> None:
+        """
+        Closes all result sockets and terminates the shared context
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+                return
+            for result_socket in self._sockets:
+                result_socket.close()
+            if self._context is not None:
+                self._context.term()
+            self._reset()
+
+
+result_sender = ResultSender()
+atexit.register(result_sender.close)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=result_sender._reset)
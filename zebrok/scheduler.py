@@ -0,0 +1,232 @@
+import collections
+from typing import Any
+from typing import Deque
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import zmq
+
+from .logging import create_logger
+from .metrics import Counter
+from .metrics import metrics
+from .metrics import Sample
+from .protocol import as_bytes
+from .queues import DEFAULT_QUEUE
+
+logger = create_logger(__name__)
+
+# control frames sent by slaves to the master
+READY = b"\x01"
+DONE = b"\x02"
+# bytes of the id a message is dispatched with
+MESSAGE_ID_SIZE = 8
+
+
+def format_identity(identity: bytes) -> str:
+    """
+    Renders a slave identity for logging
+    """
+    return identity.decode("utf-8", "backslashreplace")
+
+
+class SlaveScheduler:
+    """
+    Dispatches messages from a master worker to the least busy slave.
+
+    Slaves connect a DEALER socket to the master's ROUTER socket and
+    announce themselves with READY. Every message is sent with its id
+    prefixed to its first frame, which the slave reports back appended
+    to DONE once the message is finished. The scheduler counts messages in flight per slave and
+    never sends a slave more than prefetch messages at a time, so a slave
+    stuck on a long task stops receiving work until it reports back.
+
+    A slave executing several tasks at once announces its capacity with
+    READY and may then hold prefetch messages per unit of capacity.
+
+    Messages stay unacknowledged until the slave reports them done. When
+    a slave turns out to be gone, because it is unreachable or announces
+    readiness again after a restart, its unacknowledged messages are
+    queued in lost to be dispatched again.
+
+    Slaves may be reserved for the tasks of one queue, they are never
+    sent messages of other queues. Other slaves take messages of any queue.
+
+    socket = ROUTER socket slaves connect to, with ROUTER_MANDATORY set
+        so messages to disconnected slaves fail instead of being dropped
+    prefetch = maximum number of messages in flight per unit of capacity
+    in_flight = messages in flight keyed by slave identity
+    limits = maximum messages in flight keyed by slave identity
+    reserved = queue names keyed by identity of the slaves reserved for them
+    unacked = queue and frames of messages in flight keyed by slave
+        identity and message id
+    lost = ids, queues and frames of messages whose slave is gone
+    """
+
+    def __init__(
+        self,
+        socket: Any,
+        prefetch: int,
+        reserved: Optional[Dict[bytes, str]] = None,
+    ) -> None:
+        self.socket = socket
+        self.prefetch = max(1, prefetch)
+        self.reserved = reserved or {}
+        self.in_flight: Dict[bytes, int] = {}
+        self.limits: Dict[bytes, int] = {}
+        self.dispatched: Dict[bytes, Counter] = {}
+        self.unacked: Dict[bytes, Dict[bytes, Tuple[str, List[Any]]]] = {}
+        self.lost: Deque[Tuple[bytes, str, List[Any]]] = collections.deque()
+        self.redelivered = metrics.counter("zebrok_messages_redelivered_total")
+        metrics.register_collector(self.collect_metrics)
+
+    def get_limit(self, identity: bytes) -> int:
+        """
+        Maximum number of messages the slave may hold
+        """
+        return self.limits.get(identity, self.prefetch)
+
+    @property
+    def number_of_slaves(self) -> int:
+        """
+        Number of slaves which announced readiness
+        """
+        return len(self.in_flight)
+
+    def serves(self, identity: bytes, queue: str) -> bool:
+        """
+        Checks if a slave may be sent messages of a queue
+        """
+        return self.reserved.get(identity, queue) == queue
+
+    def has_capacity(self, queue: str = DEFAULT_QUEUE) -> bool:
+        """
+        Checks if any slave serving the queue can take another message
+        """
+        if not self.reserved:
+            return any(
+                count < self.get_limit(identity)
+                for identity, count in self.in_flight.items()
+            )
+        return any(
+            count < self.get_limit(identity)
+            for identity, count in self.in_flight.items()
+            if self.serves(identity, queue)
+        )
+
+    def get_available_slave(self, queue: str = DEFAULT_QUEUE) -> Optional[bytes]:
+        """
+        Returns the identity of the least busy slave serving the queue
+        below its prefetch limit, None when every such slave is saturated
+        """
+        candidates: Iterable[bytes] = self.in_flight
+        if self.reserved:
+            candidates = (
+                identity for identity in candidates if self.serves(identity, queue)
+            )
+        identity = min(candidates, key=self.get_load, default=None)
+        if identity is None or self.in_flight[identity] >= self.get_limit(identity):
+            return None
+        return identity
+
+    def get_load(self, identity: bytes) -> float:
+        """
+        Share of the slave's limit currently in flight
+        """
+        return self.in_flight[identity] / self.get_limit(identity)
+
+    def dispatch(
+        self,
+        message_id: bytes,
+        frames: List[Any],
+        queue: str = DEFAULT_QUEUE,
+    ) -> Optional[bytes]:
+        """
+        Sends frames of a queue's message to the least busy slave serving
+        the queue, the id the slave reports back once the message is done
+        is prefixed to the small header frame and the others are sent
+        without copying them.
+        Slaves found to be disconnected are forgotten until they
+        announce readiness again.
+
+        Returns:
+            bytes : identity of the slave the frames were sent to,
+                None when no slave could take them
+        """
+        first = message_id + as_bytes(frames[0])
+        while True:
+            identity = self.get_available_slave(queue)
+            if identity is None:
+                return None
+            try:
+                self.socket.send_multipart([identity, first, *frames[1:]], copy=False)
+            except zmq.ZMQError as e:
+                if e.errno != zmq.EHOSTUNREACH:
+                    raise
+                logger.warning(f"slave worker unreachable: {format_identity(identity)}")
+                self.forget_slave(identity)
+                continue
+            self.in_flight[identity] += 1
+            self.unacked.setdefault(identity, {})[message_id] = (queue, frames)
+            counter = self.dispatched.get(identity)
+            if counter is None:
+                counter = self.dispatched[identity] = metrics.counter(
+                    "zebrok_messages_dispatched_total",
+                    slave=format_identity(identity),
+                )
+            counter.inc()
+            return identity
+
+    def receive_reports(self) -> List[bytes]:
+        """
+        Processes every pending READY and DONE report from slaves
+
+        Returns:
+            list : ids of messages reported done
+        """
+        completed = []
+        while self.socket.poll(0):
+            identity, report, *details = self.socket.recv_multipart()
+            if report == READY:
+                capacity = int(details[0]) if details else 1
+                logger.info(
+                    f"slave worker ready: {format_identity(identity)} capacity: {capacity}",
+                )
+                self.forget_slave(identity)
+                self.in_flight[identity] = 0
+                self.limits[identity] = capacity * self.prefetch
+            elif report[:1] == DONE:
+                if identity in self.in_flight:
+                    self.in_flight[identity] = max(0, self.in_flight[identity] - 1)
+                message_id = report[1:]
+                if self.unacked.get(identity, {}).pop(message_id, None) is not None:
+                    completed.append(message_id)
+        return completed
+
+    def forget_slave(self, identity: bytes) -> None:
+        """
+        Stops dispatching to a slave until it announces readiness
+        again, messages it never reported done are queued in lost
+        """
+        self.in_flight.pop(identity, None)
+        self.limits.pop(identity, None)
+        unacked = self.unacked.pop(identity, None)
+        if unacked:
+            logger.warning(
+                f"redelivering {len(unacked)} messages of slave worker: {format_identity(identity)}",
+            )
+            self.redelivered.inc(len(unacked))
+            self.lost.extend(
+                (message_id, queue, frames)
+                for message_id, (queue, frames) in unacked.items()
+            )
+
+    def collect_metrics(self) -> Iterator[Sample]:
+        """
+        Messages in flight per slave, read when metrics are rendered
+        """
+        for identity, count in list(self.in_flight.items()):
+            yield "zebrok_slave_in_flight", {"slave": format_identity(identity)}, count
@@ -0,0 +1,197 @@
+import json
+import pickle
+from abc import ABC
+from abc import abstractmethod
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Sequence
+
+from .exceptions import ZebrokNotImplementedError
+from .exceptions import ZebrokSerializationError
+from .utils import get_serializer_name
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+
+class BaseSerializer(ABC):
+    """
+    All serializer implementations must inherit from this base class
+
+    name = name used to select the serializer from configuration
+    format_id = identifier written into every message header
+    """
+
+    name: str = ""
+    format_id: int = 0
+
+    @abstractmethod
+    def dumps(self, payload: Dict[str, Any]) -> List[Any]:
+        """
+        Serializes a payload
+
+        Parameters:
+            payload (dict): message to be serialized
+
+        Returns:
+            list : body frame followed by any out-of-band buffer frames
+        """
+        raise ZebrokNotImplementedError
+
+    @abstractmethod
+    def loads(self, body: bytes, buffers: Sequence[Any] = ()) -> Dict[str, Any]:
+        """
+        Deserializes a payload
+
+        Parameters:
+            body (bytes): serialized message body
+            buffers (list): out-of-band buffer frames sent with the body
+
+        Returns:
+            dict : deserialized message
+        """
+        raise ZebrokNotImplementedError
+
+
+class JsonSerializer(BaseSerializer):
+    """
+    Serializes payloads as utf-8 encoded json
+    """
+
+    name = "json"
+    format_id = 1
+
+    def dumps(self, payload: Dict[str, Any]) -> List[Any]:
+        return [json.dumps(payload, separators=(",", ":")).encode("utf-8")]
+
+    def loads(self, body: bytes, buffers: Sequence[Any] = ()) -> Dict[str, Any]:
+        return json.loads(body)
+
+
+class MsgpackSerializer(BaseSerializer):
+    """
+    Serializes payloads with msgpack, which carries bytes natively
+    """
+
+    name = "msgpack"
+    format_id = 2
+
+    def __init__(self) -> None:
+        if msgpack is None:
+            raise ZebrokSerializationError(
+                "msgpack serializer requires the msgpack package to be installed",
+            )
+
+    def dumps(self, payload: Dict[str, Any]) -> List[Any]:
+        return [msgpack.packb(payload, use_bin_type=True)]
+
+    def loads(self, body: bytes, buffers: Sequence[Any] = ()) -> Dict[str, Any]:
+        return msgpack.unpackb(body, raw=False)
+
+
+class PickleSerializer(BaseSerializer):
+    """
+    Serializes payloads with pickle protocol 5.
+
+    Buffers of at least out_of_band_threshold bytes exposed through
+    pickle.PickleBuffer (e.g. numpy arrays) are not copied into the pickle
+    stream but handed back as separate frames sent without copying.
+    Only accept pickle from publishers you trust.
+    """
+
+    name = "pickle"
+    format_id = 3
+    out_of_band_threshold = 64 * 1024
+
+    def dumps(self, payload: Dict[str, Any]) -> List[Any]:
+        buffers: List[Any] = []
+
+        def buffer_callback(buffer: pickle.PickleBuffer) -> bool:
+            try:
+                raw = buffer.raw()
+            except BufferError:
+                return True
+            if raw.nbytes < self.out_of_band_threshold:
+                return True
+            buffers.append(raw)
+            return False
+
+        body = pickle.dumps(payload, protocol=5, buffer_callback=buffer_callback)
+        return [body, *buffers]
+
+    def loads(self, body: bytes, buffers: Sequence[Any] = ()) -> Dict[str, Any]:
+        return pickle.loads(body, buffers=buffers)
+
+
+class SerializerType:
+    """
+    SerializerFactory dependent class for determining
+    which serializer to create
+    """
+
+    json: str = JsonSerializer.__name__
+    msgpack: str = MsgpackSerializer.__name__
+    pickle: str = PickleSerializer.__name__
+
+
+class SerializerFactory:
+    """
+    Factory class for instantiating serializers
+    """
+
+    _format_ids = {
+        JsonSerializer.format_id: SerializerType.json,
+        MsgpackSerializer.format_id: SerializerType.msgpack,
+        PickleSerializer.format_id: SerializerType.pickle,
+    }
+
+    @staticmethod
+    def create_serializer(serializer_type: str) -> BaseSerializer:
+        """
+        Creates serializers
+
+        parameters:
+            serializer_type (str): type of serializer to create
+
+        Returns:
+            BaseSerializer : created serializer
+        """
+        serializer = globals()[serializer_type]()
+        assert issubclass(
+            type(serializer),
+            BaseSerializer,
+        ), f"{type(serializer)} must inherit from {str(BaseSerializer)}"
+        return serializer
+
+    @staticmethod
+    def get_serializer_type(name: str) -> str:
+        """
+        Maps a configured serializer name (json, msgpack, pickle)
+        to its serializer type
+        """
+        serializer_type = getattr(SerializerType, name.strip().lower(), None)
+        if serializer_type is None:
+            raise ZebrokSerializationError(f"Unknown serializer: {name}")
+        return serializer_type
+
+    @staticmethod
+    def get_serializer_type_by_format_id(format_id: int) -> str:
+        """
+        Maps the format identifier found in a message header
+        to its serializer type
+        """
+        serializer_type = SerializerFactory._format_ids.get(format_id)
+        if serializer_type is None:
+            raise ZebrokSerializationError(f"Unknown message format: {format_id}")
+        return serializer_type
+
+
+def get_default_serializer() -> BaseSerializer:
+    """
+    Creates the serializer selected in configuration
+    """
+    serializer_type = SerializerFactory.get_serializer_type(get_serializer_name())
+    return SerializerFactory.create_serializer(serializer_type)
@@ -0,0 +1,103 @@
+import inspect
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from typing import Sequence
+
+from .app import Task
+from .exceptions import ZebrokInvalidArgumentsError
+from .metrics import TaskMetrics
+
+_POSITIONAL = (
+    inspect.Parameter.POSITIONAL_ONLY,
+    inspect.Parameter.POSITIONAL_OR_KEYWORD,
+)
+_KEYWORD = (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY)
+
+
+class TaskSignature:
+    """
+    Call plan of a task compiled once from its signature, so arguments
+    received with every message are checked with a few set lookups instead
+    of binding them through inspect, and the task's function is called
+    directly rather than through its Task wrapper.
+
+    task = registered task, a Task or a plain function
+    function = function called with the task's arguments
+    is_async = whether the function is declared with async def
+    metrics = metrics of the task, labelled with the name it is registered under
+    """
+
+    def __init__(self, task: Any, task_name: Optional[str] = None) -> None:
+        self.task = task
+        self.function = self._unwrap(task)
+        self.name = getattr(self.function, "__name__", repr(task))
+        self.is_async = inspect.iscoroutinefunction(self.function)
+        self.metrics = TaskMetrics(task_name or self.name)
+        try:
+            parameters = list(inspect.signature(self.function).parameters.values())
+        except (TypeError, ValueError):
+            # callables without a readable signature take any arguments
+            parameters = [
+                inspect.Parameter("args", inspect.Parameter.VAR_POSITIONAL),
+                inspect.Parameter("kwargs", inspect.Parameter.VAR_KEYWORD),
+            ]
+        kinds = {parameter.kind for parameter in parameters}
+        self.var_positional = inspect.Parameter.VAR_POSITIONAL in kinds
+        self.var_keyword = inspect.Parameter.VAR_KEYWORD in kinds
+        self.positional = tuple(p.name for p in parameters if p.kind in _POSITIONAL)
+        self.keywords = frozenset(p.name for p in parameters if p.kind in _KEYWORD)
+        self.required_positional = tuple(
+            (index, p.name, p.kind == inspect.Parameter.POSITIONAL_ONLY)
+            for index, p in enumerate(p for p in parameters if p.kind in _POSITIONAL)
+            if p.default is inspect.Parameter.empty
+        )
+        self.required_keywords = tuple(
+            p.name
+            for p in parameters
+            if p.kind == inspect.Parameter.KEYWORD_ONLY
+            and p.default is inspect.Parameter.empty
+        )
+
+    @staticmethod
+    def _unwrap(task: Any) -> Callable[..., Any]:
+        """
+        Function behind a Task, tasks overriding how they are
+        called are called through their wrapper
+        """
+        if isinstance(task, Task) and type(task).__call__ is Task.__call__:
+            return task.get_task_object()
+        return task
+
+    def check(self, args: Sequence[Any], kwargs: Dict[str, Any]) -> None:
+        """
+        Raises ZebrokInvalidArgumentsError unless the task can be called with
+        args and kwargs, as calling it would raise TypeError
+        """
+        if len(args) > len(self.positional) and not self.var_positional:
+            raise ZebrokInvalidArgumentsError(
+                f"{self.name}() takes {len(self.positional)} positional arguments"
+                f" but {len(args)} were given",
+            )
+        if not self.var_keyword:
+            for name in kwargs:
+                if name not in self.keywords:
+                    raise ZebrokInvalidArgumentsError(
+                        f"{self.name}() got an unexpected keyword argument '{name}'",
+                    )
+        for name in self.positional[: len(args)]:
+            if name in kwargs and name in self.keywords:
+                raise ZebrokInvalidArgumentsError(
+                    f"{self.name}() got multiple values for argument '{name}'",
+                )
+        for index, name, positional_only in self.required_positional:
+            if index >= len(args) and (positional_only or name not in kwargs):
+                raise ZebrokInvalidArgumentsError(
+                    f"{self.name}() missing required argument: '{name}'",
+                )
+        for name in self.required_keywords:
+            if name not in kwargs:
+                raise ZebrokInvalidArgumentsError(
+                    f"{self.name}() missing required keyword-only argument: '{name}'",
+                )
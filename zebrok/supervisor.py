@@ -0,0 +1,98 @@
+import multiprocessing
+import threading
+from typing import Any
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from .logging import create_logger
+
+logger = create_logger(__name__)
+
+
+def get_process_context() -> Any:
+    """
+    Prefers forking slave processes so registered tasks and runners
+    are inherited instead of pickled
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+class SlaveProcessSupervisor:
+    """
+    Runs slave workers as separate processes and restarts any that die
+
+    target = entry point run in each slave process
+    slave_arguments = arguments passed to target, one tuple per slave
+    check_interval = seconds between liveness checks
+    """
+
+    def __init__(
+        self,
+        target: Callable[..., Any],
+        slave_arguments: List[Tuple],
+        check_interval: float = 1.0,
+    ) -> None:
+        self.target = target
+        self.slave_arguments = slave_arguments
+        self.check_interval = check_interval
+        self.processes: List[Optional[Any]] = [None] * len(slave_arguments)
+        self._context = get_process_context()
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """
+        Spawns every slave process
+        """
+        for index in range(len(self.slave_arguments)):
+            self._spawn(index)
+
+    def _spawn(self, index: int) -> None:
+        """
+        Starts the slave process at the given index
+        """
+        process = self._context.Process(
+            target=self.target,
+            args=self.slave_arguments[index],
+            name=f"zebrok-slave-{index}",
+            daemon=True,
+        )
+        process.start()
+        self.processes[index] = process
+
+    def restart_dead_slaves(self) -> int:
+        """
+        Restarts slave processes which are no longer alive
+
+        Returns:
+            int : number of slaves restarted
+        """
+        restarted = 0
+        for index, process in enumerate(self.processes):
+            if process is not None and not process.is_alive():
+                logger.warning(
+                    f"slave worker {index} exited with code {process.exitcode}, restarting",
+                )
+                self._spawn(index)
+                restarted += 1
+        return restarted
+
+    def watch(self) -> None:
+        """
+        Checks slaves every check_interval seconds until stopped
+        """
+        while not self._stopped.wait(self.check_interval):
+            self.restart_dead_slaves()
+
+    def stop(self) -> None:
+        """
+        Stops supervising and terminates all slave processes
+        """
+        self._stopped.set()
+        for process in self.processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+                process.join()
@@ -1,11 +1,37 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import functools
+import inspect
+import itertools
+import os
+import queue
+import threading
+import time
 from abc import ABC
 from abc import abstractmethod
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
 
+from .cache import BaseResultCache
+from .cache import get_result_cache
+from .cache import make_cache_key
+from .cache import MISSING
 from .discovery import get_discovered_task_by_name
 from .exceptions import ZebrokNotImplementedError
+from .exceptions import ZebrokTaskNotFoundError
+from .exceptions import ZebrokTaskRetry
+from .exceptions import ZebrokTaskTimeoutError
 from .logging import create_logger
-
-from typing import Dict
+from .signatures import TaskSignature
+from .utils import get_task_retries
+from .utils import get_task_retry_backoff
+from .utils import get_task_timeout
 
 logger = create_logger(__name__)
 
@@ -16,7 +42,7 @@ class BaseTaskRunner(ABC):
     """
 
     @abstractmethod
-    def execute(self, task_name: str, **kwargs: Dict) -> bool:
+    def execute(self, task_name: str, *args: Any, **kwargs: Dict) -> bool:
         """
         Abstract method for executing tasks
 
@@ -25,39 +51,490 @@ class BaseTaskRunner(ABC):
         """
         raise ZebrokNotImplementedError
 
+    async def aexecute(self, task_name: str, *args: Any, **kwargs: Dict) -> bool:
+        """
+        Executes tasks from an asyncio worker. Runs execute in the
+        event loop's default executor unless overridden.
+
+        Parameters:
+            task_name (str): Name of task
+        """
+        loop = asyncio.get_running_loop()
+        execute = functools.partial(self.execute, task_name, *args, **kwargs)
+        return await loop.run_in_executor(None, execute)
+
+    def call(self, task_name: str, *args: Any, **kwargs: Dict) -> Any:
+        """
+        Executes tasks whose result was requested and returns the value
+        they returned. Defaults to the outcome of execute.
+
+        Parameters:
+            task_name (str): Name of task
+        """
+        return self.execute(task_name, *args, **kwargs)
+
+    async def acall(self, task_name: str, *args: Any, **kwargs: Dict) -> Any:
+        """
+        Executes tasks whose result was requested from an asyncio worker.
+        Runs call in the event loop's default executor unless overridden.
+
+        Parameters:
+            task_name (str): Name of task
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self.call, task_name, *args, **kwargs)
+        return await loop.run_in_executor(None, call)
+
+
+class TimedCallThreads:
+    """
+    Threads calls with a timeout run on, reused from one call to the next
+    so a timeout does not cost a new thread per task. A call which timed
+    out keeps its thread until it returns, a new thread is started
+    whenever none is idle. At most max_idle threads wait for calls.
+    """
+
+    def __init__(self, max_idle: int = 32) -> None:
+        self.max_idle = max_idle
+        self._reset()
+
+    def _reset(self) -> None:
+        """
+        Forgets every thread, none of them exist in a forked child
+        """
+        self._lock = threading.Lock()
+        self._idle = 0
+        self._calls: "queue.SimpleQueue[Callable[[], None]]" = queue.SimpleQueue()
+
+    def submit(self, call: Callable[[], None]) -> None:
+        """
+        Runs call on an idle thread, or on a new one when none is idle
+        """
+        with self._lock:
+            start = not self._idle
+            if not start:
+                self._idle -= 1
+        self._calls.put(call)
+        if start:
+            threading.Thread(
+                target=self._work,
+                name="zebrok-timed-task",
+                daemon=True,
+            ).start()
+
+    def _work(self) -> None:
+        while True:
+            self._calls.get()()
+            with self._lock:
+                if self._idle >= self.max_idle:
+                    return
+                self._idle += 1
+
+
+_timed_call_threads = TimedCallThreads()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_timed_call_threads._reset)
+
+
+def call_with_timeout(
+    func: Callable[..., Any],
+    args: Sequence[Any],
+    kwargs: Dict,
+    timeout: float,
+) -> Any:
+    """
+    Calls a function on a separate, reused thread and waits for at most
+    timeout seconds. A thread cannot be interrupted, a call which times
+    out keeps running in the background and its outcome is discarded.
+    """
+    future: concurrent.futures.Future = concurrent.futures.Future()
+
+    def run() -> None:
+        try:
+            result = func(*args, **kwargs)
+            if inspect.iscoroutine(result):
+                result = asyncio.run(result)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    _timed_call_threads.submit(run)
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        raise ZebrokTaskTimeoutError(f"task did not finish within {timeout}s") from None
+
 
 class DefaultTaskRunner(BaseTaskRunner):
     """
     Specialiazed task runner implementation
     for finding task in registry or through
-    auto discovery feature and then executes it
+    auto discovery feature and then executes it.
+
+    A failed task is retried up to its number of retries, waiting an
+    exponentially growing backoff in between, and fails once it runs for
+    longer than its timeout. Tasks set them as options, TASK_RETRIES and
+    TASK_TIMEOUT apply to tasks which do not. A sync task which timed out
+    is not retried, its thread can not be stopped and would run along
+    with the retry. With defer_retries, the runner raises ZebrokTaskRetry
+    instead of waiting out the backoff and its worker calls retry once due.
+
+    Arguments are checked against the task's signature, compiled when it
+    was registered, before the first attempt. Calls which could never
+    succeed fail at once with ZebrokInvalidArgumentsError and are not retried.
+
+    Tasks declared with cache return the value cached for an earlier
+    call with the same arguments, only successful values are cached.
     """
 
     def __init__(self, task_registry, auto_discover=False) -> None:
         self.auto_discover = auto_discover
         self.registry = task_registry
+        self.signatures: Dict[str, TaskSignature] = {}
+        self.retries = get_task_retries()
+        self.retry_backoff, self.retry_backoff_max = get_task_retry_backoff()
+        self.timeout = get_task_timeout()
+        self.defer_retries = False
 
-    def execute(self, task_name: str, **kwargs: Dict) -> bool:
+    def execute(self, task_name: str, *args: Any, **kwargs: Dict) -> bool:
         """
-        Executes provided task name with provided keyword
-        arguments
+        Executes provided task name with provided positional
+        and keyword arguments
         """
-        return self._find_and_execute_task(task_name, **kwargs)
+        return self._find_and_execute_task(task_name, *args, **kwargs)
 
-    def _find_and_execute_task(self, task_name: str, **kwargs: Dict) -> bool:
+    def call(self, task_name: str, *args: Any, **kwargs: Dict) -> Any:
         """
-        Finds and execute tasks
+        Executes provided task name and returns its value, raises
+        ZebrokTaskNotFoundError for unknown tasks
+        """
+        signature = self.get_signature(task_name)
+        if signature is None:
+            raise ZebrokTaskNotFoundError(task_name)
+        return self._run_task(task_name, signature, args, kwargs)
+
+    def retry(
+        self,
+        task_name: str,
+        attempt: int,
+        args: Sequence[Any],
+        kwargs: Dict,
+    ) -> Any:
+        """
+        Runs the attempt of a task whose retry was deferred with
+        ZebrokTaskRetry and returns its value
+        """
+        signature = self.get_signature(task_name)
+        if signature is None:
+            raise ZebrokTaskNotFoundError(task_name)
+        return self._run_task(task_name, signature, args, kwargs, attempt)
+
+    async def acall(self, task_name: str, *args: Any, **kwargs: Dict) -> Any:
+        """
+        Awaits tasks declared with async def and returns their value,
+        other tasks run in the loop's default executor
+        """
+        signature = self.get_signature(task_name)
+        if signature is None:
+            raise ZebrokTaskNotFoundError(task_name)
+        return await self._arun_task(task_name, signature, args, kwargs)
+
+    async def aexecute(self, task_name: str, *args: Any, **kwargs: Dict) -> bool:
+        """
+        Awaits tasks declared with async def on the running event loop,
+        other tasks run in the loop's default executor
+        """
+        signature = self.get_signature(task_name)
+        if signature is None:
+            return False
+
+        await self._arun_task(task_name, signature, args, kwargs)
+        return True
+
+    def find_task(self, task_name: str) -> Optional[Callable[..., Any]]:
+        """
+        Finds a task in the registry or through auto discovery
         """
-        task_executed = False
         func = self.registry.get(task_name)
 
         if not func and self.auto_discover:
             func = get_discovered_task_by_name(task_name)
 
-        if func:
-            func(**kwargs)
-            task_executed = True
-        else:
+        if not func:
             logger.error("Task not found!")
+        return func
+
+    def get_signature(self, task_name: str) -> Optional[TaskSignature]:
+        """
+        Finds a task and returns its compiled signature, the one compiled
+        by the registry when the task was registered or, for discovered
+        tasks, one compiled on first use
+        """
+        func = self.find_task(task_name)
+        if not func:
+            return None
+        signature = self.signatures.get(task_name)
+        if signature is None or signature.task is not func:
+            get_registered = getattr(self.registry, "get_signature", None)
+            signature = get_registered(task_name) if get_registered else None
+            if signature is None or signature.task is not func:
+                signature = TaskSignature(func, task_name)
+            self.signatures[task_name] = signature
+        return signature
+
+    def _find_and_execute_task(
+        self,
+        task_name: str,
+        *args: Any,
+        **kwargs: Dict,
+    ) -> bool:
+        """
+        Finds and execute tasks, tasks declared with
+        async def are run to completion
+        """
+        task_executed = False
+        signature = self.get_signature(task_name)
+
+        if signature:
+            self._run_task(task_name, signature, args, kwargs)
+            task_executed = True
 
         return task_executed
+
+    @contextlib.contextmanager
+    def _measure(self, signature: TaskSignature) -> Iterator[None]:
+        """
+        Records the execution time of a task and counts its failures
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            signature.metrics.failures.inc()
+            raise
+        finally:
+            signature.metrics.duration.observe(time.perf_counter() - started)
+
+    def get_task_options(self, func: Callable[..., Any]) -> Tuple[int, Optional[float]]:
+        """
+        Number of retries and timeout of a task, the runner's
+        own apply to options the task leaves unset
+        """
+        retries = getattr(func, "retries", None)
+        timeout = getattr(func, "timeout", None)
+        return (
+            self.retries if retries is None else retries,
+            self.timeout if timeout is None else timeout,
+        )
+
+    def get_cache(self, func: Callable[..., Any]) -> Optional[BaseResultCache]:
+        """
+        Cache values of a task are kept in, None for tasks without cache
+        """
+        cache = getattr(func, "cache", None)
+        if isinstance(cache, BaseResultCache):
+            return cache
+        return get_result_cache() if cache else None
+
+    def _get_cached(
+        self,
+        task_name: str,
+        signature: TaskSignature,
+        args: Sequence[Any],
+        kwargs: Dict,
+    ) -> Tuple[Optional[BaseResultCache], Optional[bytes], Any]:
+        """
+        Looks a call of a task up in the task's cache
+
+        Returns:
+            tuple : cache and key the call's value is kept under, None for
+                tasks without cache, and the cached value or MISSING
+        """
+        cache = self.get_cache(signature.task)
+        key = make_cache_key(task_name, args, kwargs) if cache is not None else None
+        if key is None:
+            return None, None, MISSING
+        value = cache.get(key)
+        if value is MISSING:
+            signature.metrics.cache_misses.inc()
+        else:
+            signature.metrics.cache_hits.inc()
+        return cache, key, value
+
+    def get_retry_delay(self, func: Callable[..., Any], attempt: int) -> float:
+        """
+        Seconds waited before retrying a task which failed attempt
+        times, doubling with every attempt up to the maximum backoff
+        """
+        backoff = getattr(func, "retry_backoff", None)
+        if backoff is None:
+            backoff = self.retry_backoff
+        return min(backoff * 2 ** (attempt - 1), self.retry_backoff_max)
+
+    def _should_retry(
+        self,
+        task_name: str,
+        signature: TaskSignature,
+        attempt: int,
+        retries: int,
+        error: Exception,
+    ) -> Optional[float]:
+        """
+        Decides if a failed attempt is retried, sync tasks which timed
+        out are not since their attempt may still be running
+
+        Returns:
+            float : seconds to wait before the next attempt,
+                None when the task has no retries left
+        """
+        if attempt > retries:
+            return None
+        if isinstance(error, ZebrokTaskTimeoutError) and not signature.is_async:
+            logger.error(f"task {task_name} timed out and is not retried: {error}")
+            return None
+        delay = self.get_retry_delay(signature.task, attempt)
+        signature.metrics.retries.inc()
+        logger.warning(
+            f"task {task_name} failed: {error!r}, retry {attempt} in {delay:.2f}s",
+        )
+        return delay
+
+    def _run_task(
+        self,
+        task_name: str,
+        signature: TaskSignature,
+        args: Sequence[Any],
+        kwargs: Dict,
+        attempt: int = 1,
+    ) -> Any:
+        """
+        Runs a task from the given attempt on, tasks declared
+        with async def are run to completion
+        """
+        signature.check(args, kwargs)
+        cache, key, value = self._get_cached(task_name, signature, args, kwargs)
+        if value is MISSING:
+            value = self._run_attempts(task_name, signature, args, kwargs, attempt)
+            if cache is not None:
+                cache.set(key, value)
+        return value
+
+    def _run_attempts(
+        self,
+        task_name: str,
+        signature: TaskSignature,
+        args: Sequence[Any],
+        kwargs: Dict,
+        first_attempt: int = 1,
+    ) -> Any:
+        """
+        Runs a task until it succeeds or has no retries left, raising
+        ZebrokTaskRetry instead of waiting when retries are deferred
+        """
+        retries, timeout = self.get_task_options(signature.task)
+        for attempt in itertools.count(first_attempt):
+            try:
+                with self._measure(signature):
+                    return self._run_once(signature, args, kwargs, timeout)
+            except Exception as e:
+                delay = self._should_retry(task_name, signature, attempt, retries, e)
+                if delay is None:
+                    raise
+                if self.defer_retries:
+                    raise ZebrokTaskRetry(task_name, attempt + 1, delay) from e
+            time.sleep(delay)
+
+    def _run_once(
+        self,
+        signature: TaskSignature,
+        args: Sequence[Any],
+        kwargs: Dict,
+        timeout: Optional[float],
+    ) -> Any:
+        """
+        Runs a single attempt of a task
+        """
+        func = signature.function
+        if timeout and signature.is_async:
+            return asyncio.run(self._await_with_timeout(func(*args, **kwargs), timeout))
+        if timeout:
+            return call_with_timeout(func, args, kwargs, timeout)
+        result = func(*args, **kwargs)
+        if inspect.iscoroutine(result):
+            result = asyncio.run(result)
+        return result
+
+    async def _arun_task(
+        self,
+        task_name: str,
+        signature: TaskSignature,
+        args: Sequence[Any],
+        kwargs: Dict,
+    ) -> Any:
+        """
+        Awaits tasks declared with async def, other tasks
+        run in the loop's default executor
+        """
+        signature.check(args, kwargs)
+        cache, key, value = self._get_cached(task_name, signature, args, kwargs)
+        if value is MISSING:
+            value = await self._arun_attempts(task_name, signature, args, kwargs)
+            if cache is not None:
+                cache.set(key, value)
+        return value
+
+    async def _arun_attempts(
+        self,
+        task_name: str,
+        signature: TaskSignature,
+        args: Sequence[Any],
+        kwargs: Dict,
+    ) -> Any:
+        """
+        Awaits a task until it succeeds or has no retries left
+        """
+        retries, timeout = self.get_task_options(signature.task)
+        for attempt in itertools.count(1):
+            try:
+                with self._measure(signature):
+                    return await self._arun_once(signature, args, kwargs, timeout)
+            except Exception as e:
+                delay = self._should_retry(task_name, signature, attempt, retries, e)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+
+    async def _arun_once(
+        self,
+        signature: TaskSignature,
+        args: Sequence[Any],
+        kwargs: Dict,
+        timeout: Optional[float],
+    ) -> Any:
+        """
+        Awaits a single attempt of a task
+        """
+        func = signature.function
+        if signature.is_async:
+            awaitable = func(*args, **kwargs)
+        else:
+            loop = asyncio.get_running_loop()
+            awaitable = loop.run_in_executor(
+                None,
+                functools.partial(func, *args, **kwargs),
+            )
+        if not timeout:
+            return await awaitable
+        return await self._await_with_timeout(awaitable, timeout)
+
+    async def _await_with_timeout(self, awaitable: Any, timeout: float) -> Any:
+        """
+        Awaits a task for at most timeout seconds, cancelling it after
+        """
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            raise ZebrokTaskTimeoutError(
+                f"task did not finish within {timeout}s",
+            ) from None
@@ -0,0 +1,148 @@
+import heapq
+import itertools
+import math
+import time
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from .app import make_payload
+from .protocol import encode_message
+from .queues import DEFAULT_QUEUE
+from .serializers import BaseSerializer
+from .serializers import get_default_serializer
+
+
+class TimerHeap:
+    """
+    Timers ordered by the time they are due at in a binary heap.
+
+    Every timer is a single tuple in one list, so millions of them are
+    held without a thread or callback object per timer, adding one and
+    popping the earliest both cost O(log n). The worker owning the heap
+    polls its sockets no longer than until the earliest timer is due.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, int, Any]] = []
+        # breaks ties between timers due at the same time in insertion order
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, due: float, item: Any) -> None:
+        """
+        Adds a timer due at seconds since the epoch
+        """
+        heapq.heappush(self._heap, (due, next(self._sequence), item))
+
+    def get_timeout(self, now: Optional[float] = None) -> Optional[int]:
+        """
+        Milliseconds until the earliest timer is due
+
+        Returns:
+            int : timeout to poll with, None when there are no timers
+        """
+        if not self._heap:
+            return None
+        now = time.time() if now is None else now
+        return max(0, math.ceil((self._heap[0][0] - now) * 1000))
+
+    def pop_due(self, now: Optional[float] = None) -> List[Tuple[float, Any]]:
+        """
+        Removes every timer due by now
+
+        Returns:
+            list : due time and item of each timer, earliest first
+        """
+        now = time.time() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due_at, _, item = heapq.heappop(self._heap)
+            due.append((due_at, item))
+        return due
+
+
+class TaskRetry:
+    """
+    Retry of a failed task the worker runs once its backoff has passed,
+    the message the task came in is reported done after the retry
+
+    task_name = name of the failed task
+    args = positional arguments the task is called with
+    kwargs = keyword arguments the task is called with
+    attempt = number of the attempt the retry is
+    token = token of the message the task came in, None if not reported
+    reply_to = address the value is sent back to, None if not requested
+    task_id = id the value is sent back with
+    """
+
+    def __init__(
+        self,
+        task_name: str,
+        args: Sequence[Any],
+        kwargs: Dict[str, Any],
+        attempt: int,
+        token: Any = None,
+        reply_to: Optional[str] = None,
+        task_id: Optional[str] = None,
+    ) -> None:
+        self.task_name = task_name
+        self.args = args
+        self.kwargs = kwargs
+        self.attempt = attempt
+        self.token = token
+        self.reply_to = reply_to
+        self.task_id = task_id
+
+
+class PeriodicTask:
+    """
+    Task the worker publishes to itself every interval seconds,
+    the first run is due one interval after the worker starts.
+    Runs missed while the worker was busy are skipped.
+
+    task = function of the registered task
+    interval = seconds between runs
+    kwargs = arguments every run is called with
+    queue = queue runs are handled on
+    serializer = serializer runs are encoded with, the configured one if None
+    """
+
+    def __init__(
+        self,
+        task: Callable[..., Any],
+        interval: float,
+        kwargs: Optional[Dict[str, Any]] = None,
+        queue: str = DEFAULT_QUEUE,
+        serializer: Optional[BaseSerializer] = None,
+    ) -> None:
+        assert (
+            interval > 0
+        ), f"interval of periodic task {task.__name__} must be positive"
+        self.task = task
+        self.interval = interval
+        self.kwargs = kwargs or {}
+        self.queue = queue
+        self.serializer = serializer or get_default_serializer()
+
+    def __repr__(self) -> str:
+        return f"PeriodicTask({self.task.__name__!r}, {self.interval}, queue={self.queue!r})"
+
+    def create_message(self) -> List[Any]:
+        """
+        Encodes the message of a run as a publisher would
+        """
+        return encode_message(make_payload(self.task, self.kwargs), self.serializer)
+
+    def get_next_run(self, due: float, now: float) -> float:
+        """
+        Time the run after the one due at due is due at
+        """
+        next_run = due + self.interval
+        return next_run if next_run > now else now + self.interval
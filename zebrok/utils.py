@@ -1,9 +1,57 @@
 import os
+from typing import List
+from typing import Optional
+from typing import Set
 from typing import Tuple
 
+from .config import ACCEPTED_SERIALIZERS
+from .config import ASYNC_CONCURRENCY
+from .config import BATCH_SIZE
+from .config import COMPRESSION
+from .config import COMPRESSION_MAX_SIZE
+from .config import COMPRESSION_THRESHOLD
+from .config import DISCOVERY_ADDRESS
+from .config import DISCOVERY_INTERVAL
+from .config import DISCOVERY_PORT
+from .config import EXECUTION_MODE
+from .config import HIGH_WATER_MARK
+from .config import IDEMPOTENCY_MAX_KEYS
+from .config import IDEMPOTENCY_TTL
+from .config import JOURNAL_DIR
+from .config import JOURNAL_FSYNC_INTERVAL
+from .config import JOURNAL_SEGMENT_SIZE
+from .config import MAX_IN_FLIGHT
+from .config import METRICS_HOST
+from .config import METRICS_PORT
+from .config import PUBLISH_WINDOW
+from .config import QUEUES
+from .config import RESULT_HOST
+from .config import RESULT_MAX_PENDING
+from .config import RESULT_TTL
+from .config import SERIALIZER
+from .config import SLAVE_PREFETCH
+from .config import SLAVE_TRANSPORT
+from .config import TASK_CACHE_DIR
+from .config import TASK_CACHE_MAX_ENTRIES
+from .config import TASK_CACHE_TTL
+from .config import TASK_EXECUTOR
+from .config import TASK_MANIFEST
+from .config import TASK_MODULES
+from .config import TASK_RETRIES
+from .config import TASK_RETRY_BACKOFF
+from .config import TASK_RETRY_BACKOFF_MAX
+from .config import TASK_TIMEOUT
+from .config import WORKER_ENDPOINTS
 from .config import WORKER_HOST
 from .config import WORKER_PORT
 from .logging import create_logger
+from .nodes import Endpoint
+from .nodes import get_node_directory
+from .nodes import parse_endpoints
+from .nodes import resolve_endpoints
+from .queues import DEFAULT_QUEUE
+from .queues import parse_queues
+from .queues import TaskQueue
 
 logger = create_logger(__name__)
 
@@ -17,3 +65,306 @@ def get_worker_port_and_host() -> Tuple[int, str]:
     host = os.environ.get("WORKER_HOST", WORKER_HOST)
 
     return int(port), host
+
+
+def get_queues() -> List[TaskQueue]:
+    """
+    Retrieves the queues workers consume, ordered from the
+    highest weight, the default queue is on the worker's port
+    """
+    port, _ = get_worker_port_and_host()
+
+    return parse_queues(os.environ.get("QUEUES", QUEUES), port)
+
+
+def get_queue_port_and_host(queue: Optional[str] = None) -> Tuple[int, str]:
+    """
+    Retrieves port number and host of the worker socket
+    of a queue, the default queue when queue is None
+    """
+    port, host = get_worker_port_and_host()
+    if queue is None or queue == DEFAULT_QUEUE:
+        return port, host
+    queues = {task_queue.name: task_queue for task_queue in get_queues()}
+    if queue not in queues:
+        raise ValueError(
+            f"unknown queue: {queue}, configured in QUEUES are: {', '.join(queues)}",
+        )
+
+    return queues[queue].port, host
+
+
+def get_discovery_settings() -> Tuple[int, str, float]:
+    """
+    Retrieves the udp port worker nodes announce themselves on, a port of 0
+    disables discovery, the address beacons are sent to and the seconds
+    between beacons from configuration
+    """
+    port = os.environ.get("DISCOVERY_PORT", DISCOVERY_PORT)
+    address = os.environ.get("DISCOVERY_ADDRESS", DISCOVERY_ADDRESS)
+    interval = os.environ.get("DISCOVERY_INTERVAL", DISCOVERY_INTERVAL)
+
+    return int(port), address, float(interval)
+
+
+def uses_multiple_nodes() -> bool:
+    """
+    Whether publishers may spread tasks over several worker nodes
+    """
+    port, _, _ = get_discovery_settings()
+    return bool(os.environ.get("WORKER_ENDPOINTS", WORKER_ENDPOINTS) or port)
+
+
+def get_queue_endpoints(queue: Optional[str] = None) -> Tuple[Endpoint, ...]:
+    """
+    Retrieves the host and port of every worker node a queue's tasks are
+    spread over: nodes listed in WORKER_ENDPOINTS and those discovered
+    when DISCOVERY_PORT is set, the worker's host when there are none
+    """
+    port, host = get_queue_port_and_host(queue)
+    spec = os.environ.get("WORKER_ENDPOINTS", WORKER_ENDPOINTS)
+    if not spec and not os.environ.get("DISCOVERY_PORT", DISCOVERY_PORT):
+        return ((host, port),)
+    configured = parse_endpoints(spec)
+    discovered: Tuple[Endpoint, ...] = ()
+    discovery_port, _, interval = get_discovery_settings()
+    if discovery_port:
+        discovered = get_node_directory(discovery_port, interval).endpoints
+    if not configured and not discovered:
+        return ((host, port),)
+    default = queue is None or queue == DEFAULT_QUEUE
+    return resolve_endpoints(configured, discovered, None if default else port)
+
+
+def get_batch_size() -> int:
+    """
+    Retrieves the maximum number of tasks packed
+    into a single batch message from configuration
+    """
+    return int(os.environ.get("BATCH_SIZE", BATCH_SIZE))
+
+
+def get_publish_window() -> float:
+    """
+    Retrieves the most seconds a published task waits to be sent
+    with others in one batch message, 0 when tasks are sent at once
+    """
+    return float(os.environ.get("PUBLISH_WINDOW", PUBLISH_WINDOW))
+
+
+def get_serializer_name() -> str:
+    """
+    Retrieves the name of the serializer publishers
+    encode messages with from configuration
+    """
+    return os.environ.get("SERIALIZER", SERIALIZER).strip().lower()
+
+
+def get_compression_settings() -> Tuple[str, int]:
+    """
+    Retrieves the name of the compression publishers compress
+    messages with and the fewest bytes of payload compressed
+    """
+    name = os.environ.get("COMPRESSION", COMPRESSION)
+    threshold = os.environ.get("COMPRESSION_THRESHOLD", COMPRESSION_THRESHOLD)
+
+    return name, int(threshold)
+
+
+def get_compression_max_size() -> int:
+    """
+    Retrieves the most bytes a compressed message may decompress to
+    """
+    return int(os.environ.get("COMPRESSION_MAX_SIZE", COMPRESSION_MAX_SIZE))
+
+
+def get_accepted_serializers() -> Set[str]:
+    """
+    Retrieves names of serializers workers will decode from configuration.
+    The configured serializer is always accepted.
+    """
+    names = os.environ.get("ACCEPTED_SERIALIZERS", ACCEPTED_SERIALIZERS)
+    accepted = {name.strip().lower() for name in names.split(",") if name.strip()}
+    return accepted | {get_serializer_name()}
+
+
+def get_slave_prefetch() -> int:
+    """
+    Retrieves the maximum number of messages a master
+    keeps in flight per slave worker from configuration
+    """
+    return int(os.environ.get("SLAVE_PREFETCH", SLAVE_PREFETCH))
+
+
+def get_execution_mode() -> str:
+    """
+    Retrieves whether slave workers run as threads
+    or processes from configuration
+    """
+    return os.environ.get("EXECUTION_MODE", EXECUTION_MODE).strip().lower()
+
+
+def get_async_concurrency() -> int:
+    """
+    Retrieves the maximum number of tasks an asyncio
+    worker runs at once from configuration
+    """
+    return int(os.environ.get("ASYNC_CONCURRENCY", ASYNC_CONCURRENCY))
+
+
+def get_task_executor() -> str:
+    """
+    Retrieves the executor workers run tasks on (inline,
+    threads, processes or asyncio) from configuration
+    """
+    return os.environ.get("TASK_EXECUTOR", TASK_EXECUTOR).strip().lower()
+
+
+def get_max_in_flight() -> int:
+    """
+    Retrieves the maximum number of tasks each worker's
+    executor runs at once from configuration
+    """
+    return int(os.environ.get("MAX_IN_FLIGHT", MAX_IN_FLIGHT))
+
+
+def get_high_water_mark() -> int:
+    """
+    Retrieves the number of messages zmq queues for a task
+    socket before publishers block from configuration
+    """
+    return int(os.environ.get("HIGH_WATER_MARK", HIGH_WATER_MARK))
+
+
+def get_slave_transport() -> str:
+    """
+    Retrieves the transport between master and slave workers
+    (auto, tcp, ipc or inproc) from configuration
+    """
+    return os.environ.get("SLAVE_TRANSPORT", SLAVE_TRANSPORT).strip().lower()
+
+
+def get_result_host() -> str:
+    """
+    Retrieves the host workers send task results back to
+    from configuration
+    """
+    return os.environ.get("RESULT_HOST", RESULT_HOST)
+
+
+def get_result_ttl() -> float:
+    """
+    Retrieves the number of seconds a publisher waits for
+    the result of a task from configuration
+    """
+    return float(os.environ.get("RESULT_TTL", RESULT_TTL))
+
+
+def get_result_max_pending() -> int:
+    """
+    Retrieves the maximum number of results a publisher
+    waits for at once from configuration
+    """
+    return int(os.environ.get("RESULT_MAX_PENDING", RESULT_MAX_PENDING))
+
+
+def get_task_modules() -> List[str]:
+    """
+    Retrieves names of the modules or packages tasks
+    are discovered in from configuration
+    """
+    names = os.environ.get("TASK_MODULES", TASK_MODULES)
+    return [name.strip() for name in names.split(",") if name.strip()]
+
+
+def get_task_manifest() -> Optional[str]:
+    """
+    Retrieves the path of the manifest tasks are lazily
+    loaded from, None when tasks are discovered by importing
+    """
+    return os.environ.get("TASK_MANIFEST", TASK_MANIFEST) or None
+
+
+def get_metrics_port_and_host() -> Tuple[int, str]:
+    """
+    Retrieves port number and host metrics are served on
+    from configuration, a port of 0 disables the endpoint
+    """
+    port = os.environ.get("METRICS_PORT", METRICS_PORT)
+    host = os.environ.get("METRICS_HOST", METRICS_HOST)
+
+    return int(port), host
+
+
+def get_journal_dir() -> Optional[str]:
+    """
+    Retrieves the directory workers journal received messages
+    in, None when messages are not journaled
+    """
+    return os.environ.get("JOURNAL_DIR", JOURNAL_DIR) or None
+
+
+def get_journal_segment_size() -> int:
+    """
+    Retrieves the number of bytes preallocated per journal segment
+    """
+    return int(os.environ.get("JOURNAL_SEGMENT_SIZE", JOURNAL_SEGMENT_SIZE))
+
+
+def get_journal_fsync_interval() -> float:
+    """
+    Retrieves the number of seconds between syncs of the journal to disk
+    """
+    return float(os.environ.get("JOURNAL_FSYNC_INTERVAL", JOURNAL_FSYNC_INTERVAL))
+
+
+def get_task_retries() -> int:
+    """
+    Retrieves how many times a failed task is retried
+    unless the task sets its own number of retries
+    """
+    return int(os.environ.get("TASK_RETRIES", TASK_RETRIES))
+
+
+def get_task_retry_backoff() -> Tuple[float, float]:
+    """
+    Retrieves the seconds waited before the first retry of a task,
+    doubled on every further retry, and the most ever waited
+    """
+    backoff = os.environ.get("TASK_RETRY_BACKOFF", TASK_RETRY_BACKOFF)
+    backoff_max = os.environ.get("TASK_RETRY_BACKOFF_MAX", TASK_RETRY_BACKOFF_MAX)
+
+    return float(backoff), float(backoff_max)
+
+
+def get_task_timeout() -> Optional[float]:
+    """
+    Retrieves the seconds a task may run before it fails,
+    None when tasks may run indefinitely
+    """
+    return float(os.environ.get("TASK_TIMEOUT", TASK_TIMEOUT)) or None
+
+
+def get_idempotency_settings() -> Tuple[float, int]:
+    """
+    Retrieves the seconds a worker remembers an idempotency key for
+    and the most keys it remembers at once
+    """
+    ttl = os.environ.get("IDEMPOTENCY_TTL", IDEMPOTENCY_TTL)
+    max_keys = os.environ.get("IDEMPOTENCY_MAX_KEYS", IDEMPOTENCY_MAX_KEYS)
+
+    return float(ttl), int(max_keys)
+
+
+def get_task_cache_settings() -> Tuple[float, int, Optional[str]]:
+    """
+    Retrieves the seconds values of tasks declared with cache are
+    cached for, the most values cached and the directory of the cache
+    shared by every process of the host, None when values are only
+    cached in each process's memory
+    """
+    ttl = os.environ.get("TASK_CACHE_TTL", TASK_CACHE_TTL)
+    max_entries = os.environ.get("TASK_CACHE_MAX_ENTRIES", TASK_CACHE_MAX_ENTRIES)
+    directory = os.environ.get("TASK_CACHE_DIR", TASK_CACHE_DIR) or None
+
+    return float(ttl), int(max_entries), directory
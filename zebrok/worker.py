@@ -1,20 +1,80 @@
+import asyncio
+import collections
 import concurrent.futures
+import functools
+import itertools
+import os
+import time
 from typing import Any
+from typing import Callable
+from typing import DefaultDict
+from typing import Deque
+from typing import Dict
+from typing import Iterator
 from typing import List
 from typing import Optional
+from typing import Sequence
+from typing import Set
 from typing import Tuple
 
+import zmq.asyncio
+
 from .connection import BaseSocketConnection
 from .connection import ConnectionFactory
 from .connection import ConnectionType
 from .connection import SocketType
+from .connection import Transport
 from .discovery import discover_tasks
+from .exceptions import ZebrokSerializationError
+from .exceptions import ZebrokTaskRetry
+from .executors import BaseTaskExecutor
+from .executors import create_task_executor
+from .idempotency import IdempotencyCache
+from .journal import TaskJournal
+from .logging import AggregatedLog
 from .logging import create_logger
+from .metrics import metrics
+from .metrics import Sample
+from .metrics import start_metrics_server
+from .nodes import WorkerBeacon
+from .protocol import as_bytes
+from .protocol import decode_message
+from .protocol import read_eta
+from .protocol import read_key
+from .protocol import unpack_message
+from .protocol import unpack_task
+from .queues import DEFAULT_QUEUE
+from .queues import TaskQueue
 from .registry import BaseTaskRegistry
 from .registry import RegistryFactory
 from .registry import RegistryType
+from .results import result_sender
+from .scheduler import DONE
+from .scheduler import format_identity
+from .scheduler import MESSAGE_ID_SIZE
+from .scheduler import READY
+from .scheduler import SlaveScheduler
+from .supervisor import SlaveProcessSupervisor
 from .task_runner import BaseTaskRunner
 from .task_runner import DefaultTaskRunner
+from .timers import PeriodicTask
+from .timers import TaskRetry
+from .timers import TimerHeap
+from .utils import get_accepted_serializers
+from .utils import get_async_concurrency
+from .utils import get_discovery_settings
+from .utils import get_execution_mode
+from .utils import get_high_water_mark
+from .utils import get_idempotency_settings
+from .utils import get_journal_dir
+from .utils import get_journal_fsync_interval
+from .utils import get_journal_segment_size
+from .utils import get_max_in_flight
+from .utils import get_metrics_port_and_host
+from .utils import get_queues
+from .utils import get_slave_prefetch
+from .utils import get_slave_transport
+from .utils import get_task_executor
 from .utils import get_worker_port_and_host
 
 
@@ -23,67 +83,815 @@ logger = create_logger(__name__)
 
 class TaskQueueWorker:
     """
-    Listens and receives tasks and uses a task runner to execute them
+    Listens and receives tasks and uses a task runner to execute them.
+
+    Every received message is identified by a token reported once all its
+    tasks are done. With a journal, messages are recorded as they arrive,
+    the token is their sequence number in the journal and messages never
+    reported done are replayed when the worker starts again.
+
+    Delayed messages are held on a timer heap until they are due, then
+    handled like a message just received. Periodic tasks are kept on
+    the same heap and published by the worker to itself as they fall due.
+
+    Messages published with an idempotency key are dropped when a message
+    with the same key was received within IDEMPOTENCY_TTL seconds. Keys
+    are read from the header, so a master drops duplicates before they
+    are decoded or dispatched to a slave.
     """
 
-    def __init__(self, connection, runner) -> None:
-        self.slaves: List[Any] = []
+    def __init__(
+        self,
+        connection,
+        runner,
+        scheduler: Optional[SlaveScheduler] = None,
+        executor: Optional[BaseTaskExecutor] = None,
+        journal: Optional[TaskJournal] = None,
+    ) -> None:
         self.connection = connection
         self.socket = self.connection.socket
         self.runner = runner
-        self.current_slave = 0
+        self.scheduler = scheduler
+        self.executor = executor
+        self.journal = journal
+        self.sequence = itertools.count(1)
+        self.remaining: Dict[Any, int] = {}
+        self.queues: List[Tuple[TaskQueue, Any]] = [
+            (TaskQueue(DEFAULT_QUEUE, 0), self.socket),
+        ]
+        self.queue_connections: List[Any] = []
+        # messages received earlier and ready to be handled before new ones
+        self.ready: Deque[Tuple[Any, str, List[Any]]] = collections.deque()
+        self.timers = TimerHeap()
+        self.idempotency = IdempotencyCache(*get_idempotency_settings())
+        self.undispatched: DefaultDict[str, Deque[Tuple[Any, List[Any]]]] = (
+            collections.defaultdict(collections.deque)
+        )
+        self.accepted_serializers = get_accepted_serializers()
+        self.received_log = AggregatedLog(logger, "received tasks")
+        self.forwarded_log = AggregatedLog(logger, "sent tasks to slave workers")
+        self.duplicate_log = AggregatedLog(logger, "dropped duplicate messages")
+        self.name = self.get_name()
+        self.received = metrics.counter(
+            "zebrok_messages_received_total",
+            worker=self.name,
+        )
+        self.idempotency_hits = metrics.counter(
+            "zebrok_idempotency_hits_total",
+            worker=self.name,
+        )
+        self.idempotency_misses = metrics.counter(
+            "zebrok_idempotency_misses_total",
+            worker=self.name,
+        )
+        self.queue_latency = metrics.histogram(
+            "zebrok_task_queue_seconds",
+            worker=self.name,
+        )
+        metrics.register_collector(self.collect_metrics)
+
+    def get_name(self) -> str:
+        """
+        Name the worker's metrics are labelled with
+        """
+        return "master"
+
+    def collect_metrics(self) -> Iterator[Sample]:
+        """
+        Messages waiting for a slave and tasks running on the
+        executor, read when metrics are rendered
+        """
+        labels = {"worker": self.name}
+        if self.scheduler is not None:
+            undispatched = sum(
+                len(messages) for messages in list(self.undispatched.values())
+            )
+            yield "zebrok_undispatched_messages", labels, undispatched
+        if self.executor is not None:
+            yield "zebrok_executor_in_flight", labels, self.executor.in_flight
+        if self.journal is not None:
+            yield "zebrok_journal_pending_messages", labels, self.journal.number_pending
+        yield "zebrok_timers_pending", labels, len(self.timers)
+
+    def add_queue(self, queue: TaskQueue, connection: Optional[Any] = None) -> None:
+        """
+        Consumes a named queue from its own connection, the default
+        queue is consumed from the worker's connection
+        """
+        if queue.name == DEFAULT_QUEUE:
+            socket = self.socket
+        else:
+            self.queue_connections.append(connection)
+            socket = connection.socket
+        queues = [entry for entry in self.queues if entry[0].name != queue.name]
+        self.queues = sorted(
+            queues + [(queue, socket)],
+            key=lambda entry: -entry[0].weight,
+        )
+
+    def add_periodic_task(self, periodic_task: PeriodicTask) -> None:
+        """
+        Schedules the first run of a periodic task
+        """
+        self.timers.push(time.time() + periodic_task.interval, periodic_task)
 
     def start(self) -> None:
         """
         Establishes a socket connection which listens for new tasks.
         Tasks are executed immediately if there are no slave workers available else
-        they are pushed to a slave worker using round robin scheduling.
+        they are dispatched to the least busy slave worker. Messages left
+        unfinished in the journal are handled before any new one.
         """
         logger.info(f"starting worker on: {self.connection.socket_address}")
+        self.load_journal()
         try:
-            while True:
-                message = self.socket.recv_json()
-                if self.number_of_slaves > 0:
-                    logger.info("sending task to slave worker")
-                    slave_push_socket = self.get_available_slave()
-                    slave_push_socket.send_json(message)
-                else:
-                    task_name = message.pop("task")
-                    kwargs = message.pop("kwargs")
-                    logger.info(f"received task: {task_name}")
-                    self.runner.execute(task_name, **kwargs)
+            if self.scheduler is not None:
+                self.dispatch_to_slaves()
+            elif self.executor is not None:
+                self.execute_concurrently()
+            else:
+                self.execute_serially()
         except KeyboardInterrupt:
             self.stop()
 
+    def load_journal(self) -> None:
+        """
+        Queues messages left unfinished in the journal to be replayed
+        """
+        if self.journal is not None:
+            for token, (queue, *frames) in self.journal.pending():
+                queue = bytes(queue).decode()
+                if not self.hold_message(token, queue, frames):
+                    self.ready.append((token, queue, frames))
+
+    def hold_message(self, token: Any, queue: str, frames: List[Any]) -> bool:
+        """
+        Takes a received message out of the way of those handled now,
+        dropping it when it is a duplicate and holding it when delayed
+
+        Returns:
+            bool : True when the message is not to be handled now
+        """
+        return self.drop_duplicate(token, frames) or self.hold_delayed(
+            token,
+            queue,
+            frames,
+        )
+
+    def drop_duplicate(self, token: Any, frames: List[Any]) -> bool:
+        """
+        Drops a message whose idempotency key was seen before,
+        reporting it done without running any of its tasks
+
+        Returns:
+            bool : True when the message was dropped
+        """
+        key = read_key(frames)
+        if key is None:
+            return False
+        if self.idempotency.add(key):
+            self.idempotency_misses.inc()
+            return False
+        self.idempotency_hits.inc()
+        self.duplicate_log.record()
+        self.report_done(token)
+        return True
+
+    def hold_delayed(self, token: Any, queue: str, frames: List[Any]) -> bool:
+        """
+        Puts a message which is not due yet on the timer heap, its frames
+        are copied out of zmq so a held message costs only its bytes
+
+        Returns:
+            bool : True when the message was held
+        """
+        eta = read_eta(frames)
+        if eta is None or eta <= time.time():
+            return False
+        self.timers.push(eta, (token, queue, [as_bytes(frame) for frame in frames]))
+        return True
+
+    def pop_due_messages(self) -> List[Tuple[Any, str, List[Any]]]:
+        """
+        Takes messages whose timer is due off the heap, recording a
+        new message for every periodic task due and scheduling its next
+        run. Retries of failed tasks which are due are run right away.
+
+        Returns:
+            list : token, queue name and frames of each message
+        """
+        if not self.timers:
+            return []
+        now = time.time()
+        messages = []
+        for due, item in self.timers.pop_due(now):
+            if isinstance(item, PeriodicTask):
+                frames = item.create_message()
+                messages.append(
+                    (self.record_message(item.queue, frames), item.queue, frames),
+                )
+                self.timers.push(item.get_next_run(due, now), item)
+            elif isinstance(item, TaskRetry):
+                self.run_retry(item)
+            else:
+                messages.append(item)
+        return messages
+
+    def record_message(self, queue: str, frames: List[Any]) -> Any:
+        """
+        Appends a received message to the journal along with its queue
+
+        Returns:
+            object : token reported once the message is done
+        """
+        if self.journal is not None:
+            return self.journal.append([queue.encode(), *frames])
+        return next(self.sequence)
+
+    def receive_from(
+        self,
+        queue: TaskQueue,
+        socket: Any,
+        flags: int = 0,
+    ) -> Tuple[Any, List[Any]]:
+        """
+        Reads the token and frames of a message from a queue's socket
+        """
+        frames = socket.recv_multipart(flags, copy=False)
+        return self.record_message(queue.name, frames), frames
+
+    def drain_queues(
+        self,
+        events: Dict[Any, int],
+        has_capacity: Callable[[str], bool],
+    ) -> Iterator[Tuple[Any, str, List[Any]]]:
+        """
+        Reads messages waiting on the queues ready in events with weighted
+        fair queueing: queues are visited from the highest weight and each
+        gives at most its weight in messages per round, so a busy queue
+        can not starve the others
+
+        Returns:
+            iterator : token, queue name and frames of each message
+        """
+        for queue, socket in self.queues:
+            if socket not in events:
+                continue
+            for _ in range(queue.weight):
+                if not has_capacity(queue.name):
+                    break
+                try:
+                    token, frames = self.receive_from(queue, socket, zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+                yield token, queue.name, frames
+
+    def report_done(self, token: Any) -> None:
+        """
+        Marks a message as done in the journal
+        """
+        if self.journal is not None:
+            self.journal.complete(token)
+
+    def task_done(self, token: Any) -> None:
+        """
+        Counts a completed task of a message, reporting the
+        message once every one of its tasks is done
+        """
+        self.remaining[token] -= 1
+        if not self.remaining[token]:
+            del self.remaining[token]
+            self.report_done(token)
+
+    def execute_serially(self) -> None:
+        """
+        Executes each message's tasks before receiving the next one,
+        a single queue is read without polling while no timer is pending.
+        Retries of failed tasks wait on the timer heap instead of
+        blocking the loop for their backoff.
+        """
+        if hasattr(self.runner, "defer_retries"):
+            self.runner.defer_retries = True
+        poller = zmq.Poller()
+        for _, socket in self.queues:
+            poller.register(socket, zmq.POLLIN)
+        while True:
+            self.ready.extend(self.pop_due_messages())
+            while self.ready:
+                token, _, frames = self.ready.popleft()
+                self.execute_frames(token, frames)
+            if len(self.queues) == 1 and not self.timers:
+                queue, socket = self.queues[0]
+                token, frames = self.receive_from(queue, socket)
+                received: Any = ((token, queue.name, frames),)
+            else:
+                events = dict(poller.poll(self.timers.get_timeout()))
+                received = self.drain_queues(events, lambda queue: True)
+            for token, queue_name, frames in received:
+                if not self.hold_message(token, queue_name, frames):
+                    self.execute_frames(token, frames)
+
+    def execute_concurrently(self) -> None:
+        """
+        Overlaps receiving with execution: messages are read while the
+        executor has a free slot and reported done once every task
+        of a message has completed
+        """
+        poller = zmq.Poller()
+        poller.register(self.executor.fileno, zmq.POLLIN)
+        accepting = False
+        while True:
+            self.ready.extend(self.pop_due_messages())
+            while self.ready and self.executor.has_capacity():
+                token, _, frames = self.ready.popleft()
+                self.execute_frames(token, frames)
+            if self.executor.has_capacity() != accepting:
+                accepting = not accepting
+                for _, socket in self.queues:
+                    poller.register(socket, zmq.POLLIN if accepting else 0)
+            events = dict(poller.poll(self.timers.get_timeout()))
+            if self.executor.fileno in events:
+                for token in self.executor.pop_completed():
+                    self.task_done(token)
+            for token, queue_name, frames in self.drain_queues(
+                events,
+                lambda queue: self.executor.has_capacity(),
+            ):
+                if not self.hold_message(token, queue_name, frames):
+                    self.execute_frames(token, frames)
+
+    def execute_frames(self, token: Any, frames: List[Any]) -> None:
+        """
+        Decodes a message and hands its tasks to the executor
+        """
+        tasks = self.decode_frames(frames)
+        if not tasks:
+            self.report_done(token)
+            return
+        self.remaining[token] = len(tasks)
+        self.execute_tasks(tasks, token)
+
+    def dispatch_to_slaves(self) -> None:
+        """
+        Polls slave reports and incoming tasks together. New tasks of a
+        queue are only read while some slave serving the queue is below
+        its prefetch limit, the rest wait in the queue socket's buffer.
+        Messages of slaves which are gone are dispatched again before
+        any other of their queue. Delayed messages are held by the master
+        and only dispatched once due.
+        """
+        poller = zmq.Poller()
+        poller.register(self.scheduler.socket, zmq.POLLIN)
+        accepting: Dict[str, bool] = {}
+        while True:
+            self.ready.extend(self.pop_due_messages())
+            while self.ready:
+                token, queue, frames = self.ready.popleft()
+                self.undispatched[queue].append((token, frames))
+            self.requeue_lost_messages()
+            for queue, socket in self.queues:
+                undispatched = self.undispatched[queue.name]
+                while undispatched and self.scheduler.has_capacity(queue.name):
+                    self.forward_frames(*undispatched.popleft(), queue.name)
+                has_capacity = self.scheduler.has_capacity(queue.name)
+                if has_capacity != accepting.get(queue.name, False):
+                    accepting[queue.name] = has_capacity
+                    poller.register(socket, zmq.POLLIN if has_capacity else 0)
+            events = dict(poller.poll(self.timers.get_timeout()))
+            if self.scheduler.socket in events:
+                for message_id in self.scheduler.receive_reports():
+                    self.report_done(int.from_bytes(message_id, "big"))
+            for token, queue_name, frames in self.drain_queues(
+                events,
+                self.scheduler.has_capacity,
+            ):
+                self.received.inc()
+                if not self.hold_message(token, queue_name, frames):
+                    self.forward_frames(token, frames, queue_name)
+
+    def requeue_lost_messages(self) -> None:
+        """
+        Queues messages the scheduler lost with their slave to be dispatched first
+        """
+        while self.scheduler.lost:
+            message_id, queue, frames = self.scheduler.lost.pop()
+            self.undispatched[queue].appendleft(
+                (int.from_bytes(message_id, "big"), frames),
+            )
+
+    def forward_frames(
+        self,
+        token: int,
+        frames: List[Any],
+        queue: str = DEFAULT_QUEUE,
+    ) -> None:
+        """
+        Passes received frames on to a slave worker untouched. The master
+        never deserializes messages, frames are forwarded without copying
+        and only the slave decodes them. Frames no slave could take are
+        kept and dispatched first once a slave becomes available.
+        """
+        self.forwarded_log.record()
+        message_id = token.to_bytes(MESSAGE_ID_SIZE, "big")
+        if self.scheduler.dispatch(message_id, frames, queue) is None:
+            self.undispatched[queue].appendleft((token, frames))
+
+    def decode_frames(self, frames: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Decodes a received message into its tasks, messages in an unknown
+        or unaccepted format or of the wrong shape are logged and dropped
+        """
+        self.received.inc()
+        try:
+            return unpack_message(decode_message(frames, self.accepted_serializers))
+        except ZebrokSerializationError as e:
+            logger.error(f"dropping undecodable message: {e}")
+            return []
+
+    def handle_frames(self, frames: List[Any]) -> None:
+        """
+        Decodes a received message and executes its tasks
+        """
+        self.execute_tasks(self.decode_frames(frames))
+
+    def execute_message(self, message: Dict[str, Any], token: Any = None) -> int:
+        """
+        Executes the task carried by a message, or every task packed
+        into it when the message is a batch, see execute_tasks.
+        Malformed messages are logged and dropped.
+
+        Returns:
+            int : number of tasks in the message
+        """
+        try:
+            tasks = unpack_message(message)
+        except ZebrokSerializationError as e:
+            logger.error(f"dropping message: {e}")
+            return 0
+        return self.execute_tasks(tasks, token)
+
+    def execute_tasks(self, tasks: List[Dict[str, Any]], token: Any = None) -> int:
+        """
+        Executes the tasks of a message. Tasks are handed to the
+        worker's executor when it has one, token is counted towards the
+        message's completion as each of them completes. Values of tasks whose
+        result was requested are sent back to their publisher.
+
+        Returns:
+            int : number of tasks in the message
+        """
+        for task in tasks:
+            try:
+                task_name, args, kwargs = unpack_task(task)
+            except ZebrokSerializationError as e:
+                logger.error(f"dropping task: {e}")
+                if token is not None:
+                    self.task_done(token)
+                continue
+            reply_to = task.get("reply_to")
+            self.received_log.record(task_name)
+            self.observe_queue_latency(task)
+            if self.executor is not None:
+                callback = None
+                if reply_to is not None:
+                    callback = functools.partial(
+                        result_sender.send_outcome,
+                        reply_to,
+                        task["id"],
+                    )
+                self.executor.submit(task_name, kwargs, token, callback, args)
+            elif reply_to is None:
+                self.execute_task(task_name, kwargs, args, token)
+            else:
+                self.execute_for_result(
+                    task_name,
+                    kwargs,
+                    reply_to,
+                    task["id"],
+                    args,
+                    token,
+                )
+        return len(tasks)
+
+    def execute_task(
+        self,
+        task_name: str,
+        kwargs: Dict[str, Any],
+        args: Sequence[Any] = (),
+        token: Any = None,
+        attempt: int = 1,
+    ) -> None:
+        """
+        Executes a task, a task failing after its retries is
+        logged without stopping the worker. Retries the runner
+        defers are put on the timer heap.
+        """
+        try:
+            if attempt == 1:
+                self.runner.execute(task_name, *args, **kwargs)
+            else:
+                self.runner.retry(task_name, attempt, args, kwargs)
+        except ZebrokTaskRetry as retry:
+            retried = TaskRetry(task_name, args, kwargs, retry.attempt, token)
+            self.timers.push(time.time() + retry.delay, retried)
+            return
+        except Exception:
+            logger.exception(f"task failed: {task_name}")
+        if token is not None:
+            self.task_done(token)
+
+    def run_retry(self, retry: TaskRetry) -> None:
+        """
+        Runs a due retry of a failed task
+        """
+        if retry.reply_to is None:
+            self.execute_task(
+                retry.task_name,
+                retry.kwargs,
+                retry.args,
+                retry.token,
+                retry.attempt,
+            )
+        else:
+            self.execute_for_result(
+                retry.task_name,
+                retry.kwargs,
+                retry.reply_to,
+                retry.task_id,
+                retry.args,
+                retry.token,
+                retry.attempt,
+            )
+
+    def observe_queue_latency(self, task: Dict[str, Any]) -> None:
+        """
+        Records the time a task waited between being published and starting.
+        Times which are not a number are skipped and a publisher's clock
+        running ahead counts as no wait, so metrics never fail a task.
+        """
+        published_at = task.get("published_at")
+        if isinstance(published_at, (int, float)) and not isinstance(
+            published_at,
+            bool,
+        ):
+            self.queue_latency.observe(max(0.0, time.time() - published_at))
+
+    def execute_for_result(
+        self,
+        task_name: str,
+        kwargs: Dict[str, Any],
+        reply_to: str,
+        task_id: str,
+        args: Sequence[Any] = (),
+        token: Any = None,
+        attempt: int = 1,
+    ) -> None:
+        """
+        Executes a task and sends its value, or the error it
+        failed with, back to the publisher. Retries the runner
+        defers are put on the timer heap.
+        """
+        try:
+            if attempt == 1:
+                value = self.runner.call(task_name, *args, **kwargs)
+            else:
+                value = self.runner.retry(task_name, attempt, args, kwargs)
+        except ZebrokTaskRetry as retry:
+            retried = TaskRetry(
+                task_name,
+                args,
+                kwargs,
+                retry.attempt,
+                token,
+                reply_to,
+                task_id,
+            )
+            self.timers.push(time.time() + retry.delay, retried)
+            return
+        except Exception as e:
+            logger.exception("task failed")
+            result_sender.send(reply_to, task_id, error=e)
+        else:
+            result_sender.send(reply_to, task_id, value)
+        if token is not None:
+            self.task_done(token)
+
     @property
     def number_of_slaves(self) -> int:
         """
-        Number of slave workers initialized
+        Number of slave workers ready to receive tasks
         """
-        return len(self.slaves)
+        return self.scheduler.number_of_slaves if self.scheduler else 0
 
-    def get_available_slave(self) -> Any:
+    def get_available_slave(self) -> Optional[bytes]:
         """
-        Uses round robin to cycle through and return available slave worker
+        Returns identity of the least busy slave worker
         """
-        slave_push_socket = self.slaves[self.current_slave]
-        self.current_slave += 1
-        if self.current_slave == self.number_of_slaves:
-            self.current_slave = 0
-        return slave_push_socket
+        return self.scheduler.get_available_slave() if self.scheduler else None
 
     def stop(self) -> None:
         """
         Closes socket connection
         """
-        self.current_slave = 0
+        self.received_log.flush()
+        self.forwarded_log.flush()
+        if self.executor is not None:
+            self.executor.shutdown()
+        if self.scheduler is not None:
+            self.scheduler.socket.close()
+        if self.journal is not None:
+            self.journal.close()
+        for connection in self.queue_connections:
+            connection.close()
         self.connection.close()
 
-    def add_slave(self, worker) -> None:
+
+class SlaveTaskQueueWorker(TaskQueueWorker):
+    """
+    Receives tasks from a master worker and reports back
+    to the master's scheduler once each message is done,
+    the token of a message is the id the master sent it with
+    """
+
+    def get_name(self) -> str:
+        identity = self.socket.getsockopt(zmq.IDENTITY)
+        return format_identity(identity) if identity else "slave"
+
+    def start(self) -> None:
+        """
+        Announces readiness to the master then executes
+        dispatched tasks as they arrive
+        """
+        logger.info(f"starting slave worker on: {self.connection.socket_address}")
+        try:
+            capacity = self.executor.max_in_flight if self.executor else 1
+            self.socket.send_multipart([READY, str(capacity).encode()])
+            if self.executor is None:
+                self.execute_serially()
+            else:
+                self.execute_concurrently()
+        except KeyboardInterrupt:
+            self.stop()
+
+    def receive_from(
+        self,
+        queue: TaskQueue,
+        socket: Any,
+        flags: int = 0,
+    ) -> Tuple[Any, List[Any]]:
+        first, *frames = socket.recv_multipart(flags, copy=False)
+        first = first.bytes
+        return first[:MESSAGE_ID_SIZE], [first[MESSAGE_ID_SIZE:], *frames]
+
+    def report_done(self, token: Any) -> None:
+        self.socket.send(DONE + token)
+
+    def hold_message(self, token: Any, queue: str, frames: List[Any]) -> bool:
+        # the master only dispatches messages once they are due and not duplicates
+        return False
+
+
+class AsyncTaskQueueWorker(TaskQueueWorker):
+    """
+    Receives tasks of the default queue on a zmq.asyncio socket and runs
+    up to concurrency of them at once on the event loop of a single thread
+    """
+
+    def __init__(
+        self,
+        connection,
+        runner,
+        concurrency: int,
+        journal: Optional[TaskJournal] = None,
+    ) -> None:
+        super().__init__(connection, runner, journal=journal)
+        self.concurrency = max(1, concurrency)
+        self.running: Set[asyncio.Task] = set()
+
+    def get_name(self) -> str:
+        return "async"
+
+    def collect_metrics(self) -> Iterator[Sample]:
+        yield "zebrok_executor_in_flight", {"worker": self.name}, len(self.running)
+        yield "zebrok_timers_pending", {"worker": self.name}, len(self.timers)
+
+    async def start(self) -> None:
         """
-        Adds a slave worker to a master worker
+        Listens for new tasks and schedules each one on the event loop,
+        no new message is read while concurrency tasks are running
         """
-        self.slaves.append(worker)
+        logger.info(f"starting async worker on: {self.connection.socket_address}")
+        self.load_journal()
+        slots = asyncio.Semaphore(self.concurrency)
+        try:
+            while True:
+                self.ready.extend(self.pop_due_messages())
+                if self.ready:
+                    token, _, frames = self.ready.popleft()
+                else:
+                    if self.timers and not await self.socket.poll(
+                        self.timers.get_timeout(),
+                    ):
+                        continue
+                    frames = await self.socket.recv_multipart(copy=False)
+                    token = self.record_message(DEFAULT_QUEUE, frames)
+                    if self.hold_message(token, DEFAULT_QUEUE, frames):
+                        continue
+                tasks = self.decode_frames(frames)
+                if not tasks:
+                    self.report_done(token)
+                    continue
+                self.remaining[token] = len(tasks)
+                for task in tasks:
+                    await slots.acquire()
+                    running = asyncio.ensure_future(
+                        self._execute_task(task, slots, token),
+                    )
+                    self.running.add(running)
+                    running.add_done_callback(self.running.discard)
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            for running in list(self.running):
+                running.cancel()
+            self.stop()
+            raise
+
+    async def _execute_task(
+        self,
+        task: Dict[str, Any],
+        slots: asyncio.Semaphore,
+        token: Any = None,
+    ) -> None:
+        """
+        Executes a single task, frees its concurrency slot and
+        counts it towards its message's completion
+        """
+        reply_to = None
+        try:
+            task_name, args, kwargs = unpack_task(task)
+            reply_to = task.get("reply_to")
+            self.received_log.record(task_name)
+            self.observe_queue_latency(task)
+            if reply_to is None:
+                await self.runner.aexecute(task_name, *args, **kwargs)
+            else:
+                value = await self.runner.acall(task_name, *args, **kwargs)
+                result_sender.send(reply_to, task["id"], value)
+        except Exception as e:
+            logger.exception("task failed")
+            if reply_to is not None:
+                result_sender.send(reply_to, task["id"], error=e)
+        finally:
+            slots.release()
+            if token is not None:
+                self.task_done(token)
+
+
+def start_slave_process(
+    settings: Tuple,
+    runner: BaseTaskRunner,
+    cpus: Optional[Set[int]] = None,
+    task_executor: str = "inline",
+    max_in_flight: int = 1,
+    transport: str = Transport.tcp,
+    metrics_port: int = 0,
+) -> None:
+    """
+    Entry point of a slave worker running in its own process
+
+    parameters:
+        settings (tuple): connection settings of the slave's dealer socket
+        runner (BaseTaskRunner): runner used to execute received tasks
+        cpus (set): cpus the process is pinned to, if any
+        task_executor (str): executor the slave runs tasks on
+        max_in_flight (int): maximum number of tasks the slave runs at once
+        transport (str): transport the slave connects to its master over
+        metrics_port (int): port the slave serves its metrics on, 0 for none
+    """
+    if metrics_port:
+        _, metrics_host = get_metrics_port_and_host()
+        start_metrics_server(metrics_host, metrics_port)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            logger.warning(f"could not pin slave worker to cpus {cpus}: {e}")
+    connection = ConnectionFactory.create_connection(
+        ConnectionType.zmq_connect,
+        *settings,
+        transport=transport,
+    )
+    executor = create_task_executor(task_executor, runner, max_in_flight)
+    SlaveTaskQueueWorker(connection, runner, executor=executor).start()
+
+
+class ExecutionMode:
+    """
+    Determines whether slave workers run as threads
+    of the master's process or as separate processes
+    """
+
+    threads: str = "threads"
+    processes: str = "processes"
 
 
 class WorkerInitializer:
@@ -96,11 +904,56 @@ class WorkerInitializer:
         number_of_slaves: int = 0,
         auto_discover: bool = False,
         task_registry: Optional[BaseTaskRegistry] = None,
+        prefetch: Optional[int] = None,
+        execution_mode: Optional[str] = None,
+        cpu_affinity: Optional[Sequence[int]] = None,
+        task_executor: Optional[str] = None,
+        max_in_flight: Optional[int] = None,
+        slave_transport: Optional[str] = None,
+        journal_dir: Optional[str] = None,
+        queues: Optional[Sequence[TaskQueue]] = None,
     ) -> None:
         self.tasks = self._initialize_registry(task_registry)
         self._runner: Optional[BaseTaskRunner] = None
         self.number_of_slaves = number_of_slaves
         self.auto_discover = auto_discover
+        self.prefetch = prefetch or get_slave_prefetch()
+        self.execution_mode = execution_mode or get_execution_mode()
+        assert self.execution_mode in (
+            ExecutionMode.threads,
+            ExecutionMode.processes,
+        ), f"unknown execution mode: {self.execution_mode}"
+        self.cpu_affinity = list(cpu_affinity or [])
+        self.supervisor: Optional[SlaveProcessSupervisor] = None
+        self.task_executor = task_executor or get_task_executor()
+        self.max_in_flight = max_in_flight or get_max_in_flight()
+        self.slave_transport = self._resolve_slave_transport(
+            slave_transport or get_slave_transport(),
+        )
+        self.journal_dir = journal_dir or get_journal_dir()
+        self.queues = list(queues or get_queues())
+        self.periodic_tasks: List[PeriodicTask] = []
+        self.beacon: Optional[WorkerBeacon] = None
+        reserved = sum(queue.slaves for queue in self.queues)
+        assert (
+            reserved <= number_of_slaves
+        ), f"{reserved} slave workers reserved for queues but only {number_of_slaves} started"
+
+    def _resolve_slave_transport(self, transport: str) -> str:
+        """
+        Picks the transport between master and slaves. auto uses inproc
+        for thread slaves, ipc for process slaves where available and
+        tcp otherwise.
+        """
+        processes = self.execution_mode == ExecutionMode.processes
+        if transport == "auto":
+            if not processes:
+                return Transport.inproc
+            return Transport.ipc if zmq.has("ipc") else Transport.tcp
+        assert not (
+            processes and transport == Transport.inproc
+        ), "inproc transport requires slave workers running as threads"
+        return transport
 
     def register_task(self, task: Any) -> None:
         """
@@ -108,6 +961,31 @@ class WorkerInitializer:
         """
         self.tasks.register(task)
 
+    def add_periodic_task(
+        self,
+        task: Any,
+        interval: float,
+        kwargs: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Registers a task and runs it every interval seconds on the task's
+        queue. Runs are started by the master worker, every worker started
+        with the same periodic task runs it.
+
+        parameters:
+            task (Task): task to run
+            interval (float): seconds between runs
+            kwargs (dict): arguments every run is called with
+        """
+        queue = getattr(task, "queue", None) or DEFAULT_QUEUE
+        assert queue in [
+            configured.name for configured in self.queues
+        ], f"unknown queue: {queue}"
+        self.register_task(task)
+        self.periodic_tasks.append(
+            PeriodicTask(task.get_task_object(), interval, kwargs, queue),
+        )
+
     def _initialize_registry(
         self,
         task_registry: Optional[BaseTaskRegistry],
@@ -149,8 +1027,27 @@ class WorkerInitializer:
             SocketType.ZmqPull,
             host,
             port,
+            None,
+            {zmq.RCVHWM: get_high_water_mark()},
         )
         master_socket, master_worker = self._create_master_worker(*master_settings)
+        for queue in self.queues:
+            queue_connection = None
+            if queue.name != DEFAULT_QUEUE:
+                queue_settings = (
+                    SocketType.ZmqPull,
+                    host,
+                    queue.port,
+                    master_socket.context,
+                    {zmq.RCVHWM: get_high_water_mark()},
+                )
+                queue_connection = self._create_socket_connection(
+                    ConnectionType.zmq_bind,
+                    *queue_settings,
+                )
+            master_worker.add_queue(queue, queue_connection)
+        for periodic_task in self.periodic_tasks:
+            master_worker.add_periodic_task(periodic_task)
         self._initialize_slave_workers(
             max_workers,
             host,
@@ -176,67 +1073,184 @@ class WorkerInitializer:
         master_worker: Any,
     ) -> None:
         """
-        Creates worker threads as slaves to be associated with the main worker
+        Creates worker threads or processes as slaves to be associated
+        with the main worker
         """
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            for i in range(self.number_of_slaves):
-                slave_port = port + i + 1
-
-                push_slave_settings = (
-                    SocketType.ZmqPush,
+            if self.number_of_slaves > 0:
+                slave_port = port + 1
+                router_settings = (
+                    SocketType.ZmqRouter,
                     host,
                     slave_port,
                     master_socket.context,
+                    {zmq.ROUTER_MANDATORY: 1, zmq.ROUTER_HANDOVER: 1},
+                )
+                router_connection = self._create_slave_router_connection(
+                    *router_settings,
+                    transport=self.slave_transport,
                 )
-                push_connection = self._create_slave_push_connection(
-                    *push_slave_settings,
+                master_worker.scheduler = SlaveScheduler(
+                    router_connection.socket,
+                    self.prefetch,
+                    self._get_reserved_slaves(),
                 )
-                master_worker.add_slave(push_connection.socket)
 
-                pull_slave_settings = (
-                    SocketType.ZmqPull,
-                    host,
-                    slave_port,
+                # inproc endpoints are only reachable through the binding context
+                slave_context = (
+                    master_socket.context
+                    if self.slave_transport == Transport.inproc
+                    else None
                 )
-                slave_worker = self._create_slave_worker(*pull_slave_settings)
-                executor.submit(slave_worker.start)
+                slave_settings = [
+                    (
+                        SocketType.ZmqDealer,
+                        host,
+                        slave_port,
+                        slave_context,
+                        {zmq.IDENTITY: self._get_slave_identity(index)},
+                    )
+                    for index in range(self.number_of_slaves)
+                ]
+                if self.execution_mode == ExecutionMode.processes:
+                    self.supervisor = SlaveProcessSupervisor(
+                        start_slave_process,
+                        [
+                            (
+                                settings,
+                                self.runner,
+                                self._get_slave_cpus(index),
+                                self.task_executor,
+                                self.max_in_flight,
+                                self.slave_transport,
+                                self._get_slave_metrics_port(index),
+                            )
+                            for index, settings in enumerate(slave_settings)
+                        ],
+                    )
+                    self.supervisor.start()
+                    executor.submit(self.supervisor.watch)
+                else:
+                    for settings in slave_settings:
+                        slave_worker = self._create_slave_worker(*settings)
+                        executor.submit(slave_worker.start)
 
             executor.submit(master_worker.start)
 
-    def _create_slave_push_connection(self, *settings: Any) -> BaseSocketConnection:
+    def _get_slave_identity(self, index: int) -> bytes:
+        """
+        Identity a slave connects to the master with, a restarted
+        slave reuses the identity of the one it replaces
+        """
+        return f"slave-{index}".encode()
+
+    def _get_reserved_slaves(self) -> Dict[bytes, str]:
+        """
+        Queues keyed by identity of the slaves reserved for them, the
+        first slaves are reserved for queues from the highest weight
+        """
+        reserved = {}
+        index = 0
+        for queue in self.queues:
+            for _ in range(queue.slaves):
+                reserved[self._get_slave_identity(index)] = queue.name
+                index += 1
+        return reserved
+
+    def _get_slave_metrics_port(self, index: int) -> int:
+        """
+        Slave processes keep their own metrics, slave i serves
+        them on the port after the master's metrics port plus i
+        """
+        metrics_port, _ = get_metrics_port_and_host()
+        return metrics_port + 1 + index if metrics_port else 0
+
+    def _get_slave_cpus(self, index: int) -> Optional[Set[int]]:
+        """
+        Cpu a slave process is pinned to when cpu affinity is configured
+        """
+        if not self.cpu_affinity:
+            return None
+        return {self.cpu_affinity[index % len(self.cpu_affinity)]}
+
+    def _create_slave_router_connection(
+        self,
+        *settings: Any,
+        transport: str = Transport.tcp,
+    ) -> BaseSocketConnection:
         """
-        Creates push connection type for sending tasks to slaves
+        Creates router connection type for dispatching tasks to slaves
         """
-        return self._create_socket_connection(ConnectionType.zmq_bind, *settings)
+        return self._create_socket_connection(
+            ConnectionType.zmq_bind,
+            *settings,
+            transport=transport,
+        )
 
-    def _create_slave_worker(self, *settings: Any) -> TaskQueueWorker:
+    def _create_slave_worker(self, *settings: Any) -> SlaveTaskQueueWorker:
         """
         Creates a slave task queue worker associated with the master
         """
-        pull_connection = self._create_socket_connection(
+        dealer_connection = self._create_socket_connection(
             ConnectionType.zmq_connect,
             *settings,
+            transport=self.slave_transport,
+        )
+        return SlaveTaskQueueWorker(
+            dealer_connection,
+            self.runner,
+            executor=self._create_executor(),
         )
-        return self._create_task_queue_worker(pull_connection)
 
     def _create_socket_connection(
         self,
         connection_type: str,
         *settings: Tuple,
+        transport: str = Transport.tcp,
     ) -> BaseSocketConnection:
         """
         Creates socket connections using the Connection Factory
         """
-        return ConnectionFactory.create_connection(connection_type, *settings)
+        return ConnectionFactory.create_connection(
+            connection_type,
+            *settings,
+            transport=transport,
+        )
 
     def _create_task_queue_worker(
         self,
         connection: BaseSocketConnection,
     ) -> TaskQueueWorker:
         """
-        Creates a new task queue
+        Creates a new task queue, a master with slaves leaves
+        execution to them and needs no executor
         """
-        return TaskQueueWorker(connection, self.runner)
+        executor = None if self.number_of_slaves > 0 else self._create_executor()
+        return TaskQueueWorker(
+            connection,
+            self.runner,
+            executor=executor,
+            journal=self._create_journal(),
+        )
+
+    def _create_executor(self) -> Optional[BaseTaskExecutor]:
+        """
+        Creates the executor a worker runs tasks on, None for inline execution
+        """
+        return create_task_executor(self.task_executor, self.runner, self.max_in_flight)
+
+    def _create_journal(self) -> Optional[TaskJournal]:
+        """
+        Creates the journal received messages are recorded in, None when
+        no journal directory is configured
+        """
+        if not self.journal_dir:
+            return None
+        return TaskJournal(
+            self.journal_dir,
+            get_journal_segment_size(),
+            get_journal_fsync_interval(),
+        )
 
     def start(self) -> None:
         """
@@ -245,4 +1259,53 @@ class WorkerInitializer:
         """
         if self.auto_discover:
             discover_tasks()
+        self._start_metrics_server()
+        self._start_beacon()
         self._initialize_workers()
+
+    def _start_metrics_server(self) -> None:
+        """
+        Serves metrics when a metrics port is configured
+        """
+        metrics_port, metrics_host = get_metrics_port_and_host()
+        if metrics_port:
+            start_metrics_server(metrics_host, metrics_port)
+
+    def _start_beacon(self) -> None:
+        """
+        Announces the worker to publishers when discovery is configured
+        """
+        discovery_port, address, interval = get_discovery_settings()
+        if discovery_port:
+            port, _ = get_worker_port_and_host()
+            self.beacon = WorkerBeacon(port, discovery_port, address, interval)
+            self.beacon.start()
+
+    async def start_async(self, concurrency: Optional[int] = None) -> None:
+        """
+        Scan for tasks if auto discover is set to True and run a single
+        asyncio worker executing up to concurrency tasks at once
+        """
+        assert self.number_of_slaves == 0, "asyncio workers do not use slave workers"
+        if self.auto_discover:
+            discover_tasks()
+        self._start_metrics_server()
+        self._start_beacon()
+        port, host = get_worker_port_and_host()
+        settings = (
+            SocketType.ZmqPull,
+            host,
+            port,
+            zmq.asyncio.Context(),
+        )
+        connection = self._create_socket_connection(ConnectionType.zmq_bind, *settings)
+        connection.owns_context = True
+        worker = AsyncTaskQueueWorker(
+            connection,
+            self.runner,
+            concurrency or get_async_concurrency(),
+            journal=self._create_journal(),
+        )
+        for periodic_task in self.periodic_tasks:
+            worker.add_periodic_task(periodic_task)
+        await worker.start()